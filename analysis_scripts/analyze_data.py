@@ -3,54 +3,43 @@
 Script d'analyse des données d'expérimentation GEO
 Génère des exports CSV pour RStudio et des analyses préliminaires en Python
 
-Usage: python analyze_data.py
+Usage: python analyze_data.py [--format csv|parquet|both] [--incremental] [--snapshot]
 """
 
+import argparse
 import pandas as pd
-import sqlite3
+import pyarrow as pa
+import pyarrow.dataset as ds
 import json
-import numpy as np
+import sys
+import uuid
 import matplotlib.pyplot as plt
 import seaborn as sns
 from pathlib import Path
 from datetime import datetime
-import sys
 
+from data_loader import (
+    DEFAULT_DB_PATH, get_max_rowid, iter_results, load_aggregates, load_results, process_sources_data,
+)
+from dataset_cache import load_dataset
+from source_overlap import LEVELS, compute_overlap, write_overlap
+from concentration_metrics import compute_concentration
 
-def load_data_from_db(db_path="experiment_results/experiment_data.db"):
-    """Charge les données depuis la base SQLite."""
-    if not Path(db_path).exists():
-        print(f"❌ Base de données {db_path} introuvable")
-        return None
-    
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from src.snapshots import refresh_snapshot
+
+
+def load_data_from_db(db_path=DEFAULT_DB_PATH, **filters):
+    """
+    Charge les données depuis la base SQLite (voir data_loader.load_results).
+
+    Args:
+        db_path: Chemin de la base
+        **filters: Projection et filtres transmis à load_results
+            (columns, experiment_id, model_name, start, end, min_rowid, max_rowid, ...)
+    """
     try:
-        conn = sqlite3.connect(db_path)
-        
-        # Requête principale avec toutes les colonnes
-        query = """
-        SELECT 
-            id,
-            experiment_id,
-            session_id,
-            query_id,
-            query_text,
-            query_category,
-            iteration,
-            model_name,
-            model_type,
-            response_raw,
-            sources_extracted,
-            chain_of_thought,
-            response_time_ms,
-            timestamp,
-            extra_metadata
-        FROM results
-        ORDER BY timestamp, iteration, query_id, model_name
-        """
-        
-        df = pd.read_sql_query(query, conn)
-        conn.close()
-        
+        df = load_results(db_path, **filters)
         print(f"✅ {len(df)} enregistrements chargés depuis {db_path}")
         return df
         
@@ -59,133 +48,91 @@ def load_data_from_db(db_path="experiment_results/experiment_data.db"):
         return None
 
 
-def process_sources_data(df):
-    """Traite et expanse les données de sources."""
-    processed_data = []
-    
-    for _, row in df.iterrows():
-        base_data = {
-            'id': row['id'],
-            'experiment_id': row['experiment_id'],
-            'session_id': row['session_id'],
-            'query_id': row['query_id'],
-            'query_text': row['query_text'],
-            'query_category': row['query_category'],
-            'iteration': row['iteration'],
-            'model_name': row['model_name'],
-            'model_type': row['model_type'],
-            'response_time_ms': row['response_time_ms'],
-            'timestamp': row['timestamp'],
-            'response_length': len(str(row['response_raw'])) if row['response_raw'] else 0,
-        }
-        
-        # Traitement des sources
-        sources = row['sources_extracted']
-        if sources and sources != '[]':
-            try:
-                if isinstance(sources, str):
-                    sources_list = json.loads(sources)
-                else:
-                    sources_list = sources
-                
-                if sources_list and len(sources_list) > 0:
-                    for i, source in enumerate(sources_list):
-                        source_data = base_data.copy()
-                        source_data.update({
-                            'source_rank': i + 1,
-                            'source_type': source.get('type', 'unknown'),
-                            'source_url': source.get('url', source.get('link', '')),
-                            'source_title': source.get('title', source.get('text', '')),
-                            'source_snippet': source.get('snippet', '')[:200],  # Tronquer
-                            'has_sources': True,
-                            'total_sources': len(sources_list)
-                        })
-                        processed_data.append(source_data)
-                else:
-                    # Pas de sources
-                    no_source_data = base_data.copy()
-                    no_source_data.update({
-                        'source_rank': 0,
-                        'source_type': 'none',
-                        'source_url': '',
-                        'source_title': '',
-                        'source_snippet': '',
-                        'has_sources': False,
-                        'total_sources': 0
-                    })
-                    processed_data.append(no_source_data)
-            except (json.JSONDecodeError, TypeError) as e:
-                print(f"⚠️  Erreur JSON pour {row['id']}: {e}")
-                no_source_data = base_data.copy()
-                no_source_data.update({
-                    'source_rank': 0,
-                    'source_type': 'error',
-                    'source_url': '',
-                    'source_title': '',
-                    'source_snippet': '',
-                    'has_sources': False,
-                    'total_sources': 0
-                })
-                processed_data.append(no_source_data)
-        else:
-            # Aucune source
-            no_source_data = base_data.copy()
-            no_source_data.update({
-                'source_rank': 0,
-                'source_type': 'none',
-                'source_url': '',
-                'source_title': '',
-                'source_snippet': '',
-                'has_sources': False,
-                'total_sources': 0
-            })
-            processed_data.append(no_source_data)
-    
-    return pd.DataFrame(processed_data)
-
-
-def generate_summary_stats(df, df_sources):
-    """Génère des statistiques descriptives."""
+def iter_sources_data(db_path=DEFAULT_DB_PATH, chunksize=5000, **load_kwargs):
+    """
+    Parcourt la base par blocs de `chunksize` résultats et produit les sources traitées.
+
+    La mémoire reste bornée par la taille d'un bloc, quelle que soit la taille de la table.
+
+    Yields:
+        (DataFrame des résultats du bloc, DataFrame des sources du bloc)
+    """
+    for chunk in iter_results(db_path, chunksize=chunksize, **load_kwargs):
+        yield chunk, process_sources_data(chunk)
+
+
+def generate_summary_stats(df, df_sources, db_path=None):
+    """
+    Génère des statistiques descriptives.
+
+    Avec `db_path`, les répartitions par modèle et par catégorie sont lues
+    dans les agrégats tenus à jour à l'écriture (result_aggregates) au lieu
+    d'être recalculées sur toutes les lignes.
+    """
     print("\n" + "="*60)
     print("📊 STATISTIQUES DESCRIPTIVES")
     print("="*60)
     
+    try:
+        by_model = load_aggregates(db_path, ['model_name']) if db_path else None
+        by_category = load_aggregates(db_path, ['query_category']) if db_path else None
+    except LookupError as e:
+        print(f"⚠️  {e}: statistiques recalculées sur les lignes")
+        by_model = by_category = None
+    
     # Vue d'ensemble
     print(f"🔢 Total d'enregistrements: {len(df)}")
     print(f"🔢 Total de sources individuelles: {len(df_sources)}")
     print(f"📅 Période: {df['timestamp'].min()} → {df['timestamp'].max()}")
     
-    # Par modèle
+    # Par modèle (mêmes colonnes avec ou sans agrégats; la médiane n'est pas agrégeable et vient des lignes)
     print(f"\n📈 RÉPARTITION PAR MODÈLE:")
-    model_stats = df.groupby('model_name').agg({
-        'id': 'count',
-        'response_time_ms': ['mean', 'median', 'std']
-    }).round(2)
+    # Latences en flottants (entiers nullables sinon): même affichage que les agrégats
+    latency = df[['model_name', 'query_category', 'id']].assign(latency=df['response_time_ms'].astype('float64'))
+    latency_median = latency.groupby('model_name', observed=True)['latency'].median().rename('latency_median')
+    if by_model is not None:
+        model_stats = by_model[['results', 'latency_mean']].join(latency_median).join(by_model['latency_std'])
+    else:
+        model_stats = latency.groupby('model_name', observed=True).agg(
+            results=('id', 'count'),
+            latency_mean=('latency', 'mean'),
+            latency_std=('latency', 'std'),
+        ).join(latency_median)[['results', 'latency_mean', 'latency_median', 'latency_std']]
+    model_stats = model_stats.round(2)
     print(model_stats)
     
     # Par catégorie de requête
     print(f"\n🎯 RÉPARTITION PAR CATÉGORIE:")
-    category_stats = df.groupby('query_category').agg({
-        'id': 'count',
-        'response_time_ms': 'mean'
-    }).round(2)
+    if by_category is not None:
+        category_stats = by_category[['results', 'latency_mean']].round(2)
+    else:
+        category_stats = latency.groupby('query_category', observed=True).agg(
+            results=('id', 'count'),
+            latency_mean=('latency', 'mean'),
+        ).round(2)
     print(category_stats)
     
     # Sources par modèle
     print(f"\n🔗 SOURCES PAR MODÈLE:")
-    source_stats = df_sources.groupby('model_name').agg({
+    source_stats = df_sources.groupby('model_name', observed=True).agg({
         'total_sources': 'mean',
         'has_sources': 'mean'
     }).round(3)
     print(source_stats)
     
+    # Concentration des domaines cités par modèle
+    print(f"\n🏛️  CONCENTRATION DES DOMAINES CITÉS (top 10):")
+    concentration_stats = compute_concentration(df_sources, ['model_name']).set_index('model_name')
+    print(concentration_stats[['citations', 'domains', 'top_k_share', 'hhi', 'gini']].round(3))
+    
     return {
         'total_records': len(df),
         'total_sources': len(df_sources),
         'date_range': (df['timestamp'].min(), df['timestamp'].max()),
         'model_stats': model_stats,
         'category_stats': category_stats,
-        'source_stats': source_stats
+        'source_stats': source_stats,
+        'concentration_stats': concentration_stats
     }
 
 
@@ -207,7 +154,7 @@ def export_to_csv(df, df_sources, output_dir="analysis_exports"):
     print(f"✅ Export sources: {sources_file}")
     
     # Export agrégé par requête/modèle
-    agg_data = df_sources.groupby(['query_id', 'query_category', 'model_name', 'iteration']).agg({
+    agg_data = df_sources.groupby(['query_id', 'query_category', 'model_name', 'iteration'], observed=True).agg({
         'total_sources': 'first',
         'has_sources': 'first',
         'response_time_ms': 'first',
@@ -219,7 +166,7 @@ def export_to_csv(df, df_sources, output_dir="analysis_exports"):
     print(f"✅ Export agrégé: {agg_file}")
     
     # Export pour analyse temporelle
-    temporal_data = df.groupby(['timestamp', 'model_name', 'query_category']).agg({
+    temporal_data = df.groupby(['timestamp', 'model_name', 'query_category'], observed=True).agg({
         'response_time_ms': 'mean',
         'id': 'count'
     }).reset_index()
@@ -237,10 +184,248 @@ def export_to_csv(df, df_sources, output_dir="analysis_exports"):
     }
 
 
+# Colonnes à faible cardinalité stockées en dictionnaire dans Parquet
+DICTIONARY_COLUMNS = ['session_id', 'query_id', 'query_text', 'query_category', 'model_type', 'source_type']
+PARTITION_COLUMNS = ['experiment_id', 'date', 'model_name']
+INTEGER_COLUMNS = ['iteration', 'response_time_ms', 'response_length', 'source_rank', 'total_sources', 'count']
+
+
+def _to_arrow_table(frame):
+    """Convertit un DataFrame en table Arrow typée (entiers, horodatages, dictionnaires)."""
+    frame = frame.copy()
+    frame['timestamp'] = pd.to_datetime(frame['timestamp'], errors='coerce')
+    for column in INTEGER_COLUMNS:
+        if column in frame.columns:
+            frame[column] = frame[column].astype('Int32')
+    for column in DICTIONARY_COLUMNS:
+        if column in frame.columns:
+            frame[column] = frame[column].astype('category')
+    for column in PARTITION_COLUMNS:
+        frame[column] = frame[column].astype(str)
+    table = pa.Table.from_pandas(frame, preserve_index=False)
+    # Largeur d'index fixe pour que tous les fichiers partagent le même schéma
+    schema = pa.schema([
+        field.with_type(pa.dictionary(pa.int32(), pa.string())) if pa.types.is_dictionary(field.type) else field
+        for field in table.schema
+    ])
+    return table.cast(schema)
+
+
+def _with_date(frame):
+    frame = frame.copy()
+    frame['date'] = pd.to_datetime(frame['timestamp'], errors='coerce').dt.strftime('%Y-%m-%d').fillna('unknown')
+    return frame
+
+
+def build_parquet_frames(df, df_sources):
+    """Prépare les quatre jeux de données exportés, avec la colonne de partition `date`."""
+    df = _with_date(df)
+    df_sources = _with_date(df_sources)
+
+    agg_data = df_sources.groupby(
+        ['experiment_id', 'date', 'query_id', 'query_category', 'model_name', 'iteration'], observed=True
+    ).agg({
+        'total_sources': 'first',
+        'has_sources': 'first',
+        'response_time_ms': 'first',
+        'response_length': 'first',
+        'timestamp': 'first'
+    }).reset_index()
+
+    temporal_data = df.groupby(
+        ['experiment_id', 'date', 'timestamp', 'model_name', 'query_category'], observed=True
+    ).agg({
+        'response_time_ms': 'mean',
+        'id': 'count'
+    }).reset_index()
+    temporal_data.columns = [
+        'experiment_id', 'date', 'timestamp', 'model_name', 'query_category', 'avg_response_time', 'count'
+    ]
+
+    return {
+        'main': ('experiment_data', df),
+        'sources': ('sources_detail', df_sources),
+        'aggregated': ('aggregated_data', agg_data),
+        'temporal': ('temporal_analysis', temporal_data),
+    }
+
+
+def write_parquet_dataset(frame, dataset_dir, existing_data_behavior="delete_matching",
+                          basename_template="part-{i}.parquet"):
+    """Écrit un DataFrame en jeu de données Parquet partitionné experiment_id/date/model_name."""
+    table = _to_arrow_table(frame)
+    partitioning = ds.partitioning(
+        pa.schema([(column, pa.string()) for column in PARTITION_COLUMNS]), flavor="hive"
+    )
+    ds.write_dataset(
+        table,
+        dataset_dir,
+        format="parquet",
+        partitioning=partitioning,
+        existing_data_behavior=existing_data_behavior,
+        basename_template=basename_template,
+    )
+    return table.num_rows
+
+
+def export_to_parquet(df, df_sources, output_dir="analysis_exports"):
+    """
+    Exporte les données en Parquet partitionné (hive) par expérience, date et modèle.
+
+    Chaque export remplace les partitions qu'il contient. Les jeux de données
+    se lisent directement avec arrow::open_dataset (R) ou pandas.read_parquet,
+    avec filtrage sur les partitions au lieu d'un parsing CSV complet.
+    """
+    output_path = Path(output_dir) / "parquet"
+    output_path.mkdir(parents=True, exist_ok=True)
+
+    exported = {}
+    for key, (name, frame) in build_parquet_frames(df, df_sources).items():
+        dataset_dir = output_path / name
+        rows = write_parquet_dataset(frame, dataset_dir)
+        exported[key] = dataset_dir
+        print(f"✅ Export Parquet {name}: {dataset_dir} ({rows} lignes)")
+
+    return exported
+
+
+WATERMARK_FILE = ".watermarks.json"
+AGGREGATED_KEYS = ['experiment_id', 'date', 'query_id', 'query_category', 'model_name', 'iteration']
+TEMPORAL_KEYS = ['experiment_id', 'date', 'timestamp', 'model_name', 'query_category']
+
+
+def load_watermarks(output_dir="analysis_exports"):
+    """Retourne les rowid déjà exportés, par cible d'export ('csv', 'parquet')."""
+    watermark_file = Path(output_dir) / WATERMARK_FILE
+    if not watermark_file.exists():
+        return {}
+    with open(watermark_file, 'r', encoding='utf-8') as f:
+        return {target: entry['rowid'] for target, entry in json.load(f).items()}
+
+
+def save_watermark(target, rowid, output_dir="analysis_exports"):
+    output_path = Path(output_dir)
+    output_path.mkdir(exist_ok=True)
+    watermark_file = output_path / WATERMARK_FILE
+    entries = {}
+    if watermark_file.exists():
+        with open(watermark_file, 'r', encoding='utf-8') as f:
+            entries = json.load(f)
+    entries[target] = {'rowid': int(rowid), 'updated_at': datetime.now().isoformat(timespec='seconds')}
+    with open(watermark_file, 'w', encoding='utf-8') as f:
+        json.dump(entries, f, indent=2)
+
+
+def _merge_aggregated(existing, new):
+    # 'first' conserve la valeur déjà exportée pour un groupe existant
+    merged = pd.concat([existing, new], ignore_index=True)
+    return merged.groupby(AGGREGATED_KEYS, observed=True, sort=False).first().reset_index()
+
+
+def _merge_temporal(existing, new):
+    merged = pd.concat([existing, new], ignore_index=True)
+    merged['weighted_time'] = merged['avg_response_time'] * merged['count']
+    merged = merged.groupby(TEMPORAL_KEYS, observed=True, sort=False).agg(
+        weighted_time=('weighted_time', 'sum'), count=('count', 'sum')
+    ).reset_index()
+    merged['avg_response_time'] = merged['weighted_time'] / merged['count']
+    return merged.drop(columns=['weighted_time'])[TEMPORAL_KEYS + ['avg_response_time', 'count']]
+
+
+def _read_partitions(dataset_dir, partitions):
+    """Lit les lignes existantes des partitions (experiment_id, date, model_name) données."""
+    if not Path(dataset_dir).exists():
+        return None
+    dataset = ds.dataset(dataset_dir, format="parquet", partitioning="hive")
+    expression = None
+    for experiment_id, date, model_name in partitions:
+        clause = (
+            (ds.field('experiment_id') == experiment_id)
+            & (ds.field('date') == date)
+            & (ds.field('model_name') == model_name)
+        )
+        expression = clause if expression is None else expression | clause
+    existing = dataset.to_table(filter=expression).to_pandas()
+    for column in existing.columns:
+        if isinstance(existing[column].dtype, pd.CategoricalDtype):
+            existing[column] = existing[column].astype(str)
+    return existing
+
+
+def export_incremental_parquet(df, df_sources, output_dir="analysis_exports"):
+    """
+    Ajoute les nouvelles lignes aux jeux Parquet partitionnés.
+
+    Les données détaillées sont ajoutées dans de nouveaux fichiers des
+    partitions concernées; les agrégats de ces seules partitions sont
+    fusionnés avec l'existant puis réécrits.
+    """
+    output_path = Path(output_dir) / "parquet"
+    output_path.mkdir(parents=True, exist_ok=True)
+    # Noms uniques à chaque appel: plusieurs blocs écrits dans la même seconde ne s'écrasent pas
+    run_id = f"{datetime.now().strftime('%Y%m%d_%H%M%S')}-{uuid.uuid4().hex[:12]}"
+
+    exported = {}
+    for key, (name, frame) in build_parquet_frames(df, df_sources).items():
+        dataset_dir = output_path / name
+        if key in ('main', 'sources'):
+            rows = write_parquet_dataset(
+                frame, dataset_dir,
+                existing_data_behavior="overwrite_or_ignore",
+                basename_template=f"part-{run_id}-{{i}}.parquet",
+            )
+        else:
+            partitions = set(frame[['experiment_id', 'date', 'model_name']].astype(str).itertuples(index=False, name=None))
+            existing = _read_partitions(dataset_dir, partitions)
+            if existing is not None and len(existing):
+                existing['timestamp'] = pd.to_datetime(existing['timestamp'])
+                frame = frame.copy()
+                frame['timestamp'] = pd.to_datetime(frame['timestamp'], errors='coerce')
+                merge = _merge_aggregated if key == 'aggregated' else _merge_temporal
+                frame = merge(existing[frame.columns], frame)
+            rows = write_parquet_dataset(frame, dataset_dir)
+        exported[key] = dataset_dir
+        print(f"✅ Parquet incrémental {name}: {rows} lignes écrites")
+    return exported
+
+
+def export_incremental_csv(df, df_sources, output_dir="analysis_exports"):
+    """
+    Complète des CSV à nom fixe au lieu de créer de nouveaux dumps horodatés.
+
+    Les données détaillées sont ajoutées en fin de fichier; les fichiers
+    agrégés sont fusionnés avec les nouvelles lignes puis réécrits.
+    """
+    output_path = Path(output_dir) / "incremental"
+    output_path.mkdir(parents=True, exist_ok=True)
+
+    frames = build_parquet_frames(df, df_sources)
+    exported = {}
+    for key, (name, frame) in frames.items():
+        csv_file = output_path / f"{name}.csv"
+        if key in ('main', 'sources'):
+            frame.to_csv(csv_file, mode='a', header=not csv_file.exists(), index=False, encoding='utf-8')
+        else:
+            if csv_file.exists():
+                existing = pd.read_csv(csv_file, encoding='utf-8')
+                frame = frame.copy()
+                for column in ('timestamp',):
+                    existing[column] = pd.to_datetime(existing[column])
+                    frame[column] = pd.to_datetime(frame[column], errors='coerce')
+                merge = _merge_aggregated if key == 'aggregated' else _merge_temporal
+                frame = merge(existing[frame.columns], frame)
+            frame.to_csv(csv_file, index=False, encoding='utf-8')
+        exported[key] = csv_file
+        print(f"✅ CSV incrémental {name}: {csv_file}")
+    return exported
+
+
 def create_visualizations(df_sources, output_dir="analysis_exports"):
     """Crée des visualisations préliminaires."""
     output_path = Path(output_dir)
     output_path.mkdir(exist_ok=True)
+    # matplotlib/seaborn ne gèrent pas pd.NA des entiers nullables
+    df_sources = df_sources.astype({'response_time_ms': 'float64'})
     
     plt.style.use('default')
     fig, axes = plt.subplots(2, 2, figsize=(15, 12))
@@ -248,7 +433,7 @@ def create_visualizations(df_sources, output_dir="analysis_exports"):
     
     # 1. Sources par modèle
     ax1 = axes[0, 0]
-    source_counts = df_sources.groupby('model_name')['total_sources'].mean()
+    source_counts = df_sources.groupby('model_name', observed=True)['total_sources'].mean()
     bars1 = ax1.bar(source_counts.index, source_counts.values)
     ax1.set_title('Nombre moyen de sources par modèle')
     ax1.set_ylabel('Nombre de sources')
@@ -269,7 +454,7 @@ def create_visualizations(df_sources, output_dir="analysis_exports"):
     
     # 3. Sources par catégorie
     ax3 = axes[1, 0]
-    category_sources = df_sources.groupby('query_category')['total_sources'].mean()
+    category_sources = df_sources.groupby('query_category', observed=True)['total_sources'].mean()
     bars3 = ax3.bar(category_sources.index, category_sources.values)
     ax3.set_title('Sources par catégorie de requête')
     ax3.set_ylabel('Nombre moyen de sources')
@@ -286,7 +471,8 @@ def create_visualizations(df_sources, output_dir="analysis_exports"):
         values='response_time_ms', 
         index='query_category', 
         columns='model_name', 
-        aggfunc='mean'
+        aggfunc='mean',
+        observed=True
     )
     sns.heatmap(correlation_data, annot=True, fmt='.0f', ax=ax4, cmap='YlOrRd')
     ax4.set_title('Temps de réponse moyen (ms)')
@@ -303,24 +489,45 @@ def create_visualizations(df_sources, output_dir="analysis_exports"):
     return plot_file
 
 
-def generate_r_analysis_script(csv_files, output_dir="analysis_exports"):
-    """Génère un script R prêt à utiliser pour l'analyse."""
+def generate_r_analysis_script(csv_files, output_dir="analysis_exports", data_format="csv"):
+    """Génère un script R prêt à utiliser pour l'analyse (sources CSV ou Parquet)."""
     output_path = Path(output_dir)
     
+    if data_format == "parquet":
+        loading_block = "\n".join(
+            f'{variable} <- open_dataset("{csv_files[key].relative_to(output_path).as_posix()}") %>% collect()'
+            for variable, key in (
+                ("main_data", "main"), ("sources_data", "sources"),
+                ("aggregated_data", "aggregated"), ("temporal_data", "temporal"),
+            )
+        )
+        reader_library = "library(arrow)"
+    else:
+        loading_block = f"""main_data <- read_csv("{csv_files['main'].name}")
+sources_data <- read_csv("{csv_files['sources'].name}")
+aggregated_data <- read_csv("{csv_files['aggregated'].name}")
+temporal_data <- read_csv("{csv_files['temporal'].name}")"""
+        reader_library = "library(readr)"
+    
+    # Recouvrement des sources entre modèles (absent des exports incrémentaux)
+    if 'overlap' in csv_files:
+        overlap_path = csv_files['overlap'].relative_to(output_path).as_posix()
+        reader = "read_parquet" if data_format == "parquet" else "read_csv"
+        loading_block += f'\noverlap_data <- {reader}("{overlap_path}")'
+    else:
+        loading_block += "\noverlap_data <- NULL"
+    
     r_script = f'''# Script R pour l'analyse des données GEO
 # Généré automatiquement le {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}
 
 library(tidyverse)
-library(readr)
+{reader_library}
 library(ggplot2)
 library(dplyr)
 library(corrplot)
 
 # Chargement des données
-main_data <- read_csv("{csv_files['main'].name}")
-sources_data <- read_csv("{csv_files['sources'].name}")
-aggregated_data <- read_csv("{csv_files['aggregated'].name}")
-temporal_data <- read_csv("{csv_files['temporal'].name}")
+{loading_block}
 
 # Vérification des données
 cat("=== RÉSUMÉ DES DONNÉES ===\\n")
@@ -362,6 +569,21 @@ if(length(unique(aggregated_data$model_name)) >= 2) {{
   }}
 }}
 
+# Hypothèse 2a : recouvrement des sources citées (Jaccard, rank-biased overlap)
+if(!is.null(overlap_data)) {{
+  cat("\\n=== HYPOTHÈSE 2a : RECOUVREMENT DES SOURCES ENTRE MODÈLES ===\\n")
+  overlap_summary <- overlap_data %>%
+    group_by(level, model_a, model_b) %>%
+    summarise(
+      n_pairs = n(),
+      mean_jaccard = mean(jaccard, na.rm = TRUE),
+      mean_rbo = mean(rbo, na.rm = TRUE),
+      .groups = "drop"
+    )
+  print(overlap_summary)
+  write_csv(overlap_summary, "source_overlap_by_model_pair.csv")
+}}
+
 # Analyse temporelle (Hypothèse 1)
 cat("\\n=== HYPOTHÈSE 1 : STABILITÉ TEMPORELLE ===\\n")
 temporal_stability <- aggregated_data %>%
@@ -418,25 +640,105 @@ cat("\\n✅ Analyse terminée. Graphiques et exports sauvegardés.\\n")
     return r_file
 
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Analyse des données d'expérimentation GEO")
+    parser.add_argument(
+        "--format", choices=["csv", "parquet", "both"], default="csv",
+        help="Format des exports (Parquet partitionné par expérience/date/modèle)"
+    )
+    parser.add_argument(
+        "--incremental", action="store_true",
+        help="Ne traiter que les lignes ajoutées depuis le dernier export (watermark par cible)"
+    )
+    parser.add_argument(
+        "--chunksize", type=int, default=5000,
+        help="Nombre de résultats lus et traités par bloc en mode incrémental"
+    )
+    parser.add_argument(
+        "--refresh-cache", action="store_true",
+        help="Reconstruire le cache des données analysées (experiment_results/.dataset_cache)"
+    )
+    parser.add_argument(
+        "--snapshot", action="store_true",
+        help="Analyser un instantané cohérent de la base (mis à jour avant lecture), sans gêner une campagne en cours"
+    )
+    return parser.parse_args()
+
+
+def run_incremental(args, db_path=DEFAULT_DB_PATH, output_dir="analysis_exports"):
+    """Exporte, bloc par bloc, uniquement les lignes postérieures au watermark de chaque cible."""
+    targets = ["csv", "parquet"] if args.format == "both" else [args.format]
+    watermarks = load_watermarks(output_dir)
+    upper = get_max_rowid(db_path)
+    lower = min(watermarks.get(target, 0) for target in targets)
+    if lower >= upper:
+        print("✅ Aucun nouvel enregistrement depuis le dernier export")
+        return
+
+    exported = {}
+    for chunk in iter_results(db_path, chunksize=args.chunksize, min_rowid=lower, max_rowid=upper,
+                              with_rowid=True):
+        for target in targets:
+            new_rows = chunk[chunk['row_id'] > watermarks.get(target, 0)].drop(columns=['row_id'])
+            if new_rows.empty:
+                continue
+            print(f"\n🔄 {target}: {len(new_rows)} nouveaux enregistrements")
+            new_sources = process_sources_data(new_rows)
+            if target == "csv":
+                exported[target] = export_incremental_csv(new_rows, new_sources, output_dir)
+            else:
+                exported[target] = export_incremental_parquet(new_rows, new_sources, output_dir)
+            # Le watermark n'avance qu'une fois le bloc écrit: une interruption reprend au bloc suivant
+            save_watermark(target, int(chunk['row_id'].max()), output_dir)
+
+    for target in targets:
+        save_watermark(target, upper, output_dir)
+
+    if exported:
+        target, exported_files = list(exported.items())[-1]
+        generate_r_analysis_script(exported_files, output_dir, data_format=target)
+
+
 def main():
+    args = parse_args()
     print("📊 ANALYSE DES DONNÉES D'EXPÉRIMENTATION GEO")
     print("=" * 60)
     
-    # 1. Chargement des données
-    df = load_data_from_db()
-    if df is None:
+    db_path = DEFAULT_DB_PATH
+    if args.snapshot:
+        report = refresh_snapshot(db_path)
+        db_path = report['path']
+        print(f"📸 Instantané {db_path} à jour ({report['mode']}, {report['seconds']:.2f} s)")
+
+    if args.incremental:
+        run_incremental(args, db_path)
         return
     
-    # 2. Traitement des sources
-    print("\n🔄 Traitement des données de sources...")
-    df_sources = process_sources_data(df)
+    # 1-2. Chargement des données et traitement des sources (cache si la base n'a pas changé)
+    try:
+        dataset = load_dataset(db_path, refresh=args.refresh_cache)
+    except Exception as e:
+        print(f"❌ Erreur lors du chargement: {e}")
+        return
+    df, df_sources, max_rowid = dataset.results, dataset.sources, dataset.max_rowid
+    origin = "cache" if dataset.from_cache else db_path
+    print(f"✅ {len(df)} enregistrements chargés depuis {origin} ({len(df_sources)} lignes de sources)")
     
     # 3. Statistiques descriptives
-    stats = generate_summary_stats(df, df_sources)
+    stats = generate_summary_stats(df, df_sources, db_path)
     
-    # 4. Exports CSV pour RStudio
+    # 4. Exports pour RStudio
     print(f"\n📤 Export des données...")
-    csv_files = export_to_csv(df, df_sources)
+    overlap = pd.concat([compute_overlap(df_sources, level) for level in LEVELS], ignore_index=True)
+    if args.format in ("csv", "both"):
+        exported_files = export_to_csv(df, df_sources)
+        exported_files['overlap'] = write_overlap(overlap, data_format="csv")
+    if args.format in ("parquet", "both"):
+        parquet_files = export_to_parquet(df, df_sources)
+        parquet_files['overlap'] = write_overlap(overlap, data_format="parquet")
+        save_watermark("parquet", max_rowid)
+        if args.format == "parquet":
+            exported_files = parquet_files
     
     # 5. Visualisations
     print(f"\n📈 Génération des graphiques...")
@@ -447,7 +749,7 @@ def main():
     
     # 6. Script R
     print(f"\n🔧 Génération du script R...")
-    r_file = generate_r_analysis_script(csv_files)
+    r_file = generate_r_analysis_script(exported_files, data_format="parquet" if args.format == "parquet" else "csv")
     
     print(f"\n" + "="*60)
     print("🎉 ANALYSE TERMINÉE")
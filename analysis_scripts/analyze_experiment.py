@@ -3,37 +3,23 @@
 Script d'analyse des résultats d'expérience
 """
 
-import sqlite3
 import pandas as pd
 import json
 from datetime import datetime
 
+from dataset_cache import load_dataset
+
+COLUMNS = [
+    'query_id', 'query_text', 'model_name', 'response_raw', 'sources_extracted',
+    'response_time_ms', 'timestamp', 'session_id', 'iteration', 'query_category'
+]
+
 def load_experiment_data():
-    """Charge les données de l'expérience depuis la base SQLite"""
-    db_path = "experiment_results/experiment_data.db"
-    
+    """Charge les données de l'expérience (cache des données analysées, sinon base SQLite)"""
     try:
-        conn = sqlite3.connect(db_path)
-        
-        # Récupérer toutes les données
-        query = """
-        SELECT 
-            query_id,
-            query_text,
-            model_name,
-            response_raw as response_text,
-            sources_extracted as sources_json,
-            response_time_ms,
-            timestamp,
-            session_id,
-            iteration,
-            query_category
-        FROM results 
-        ORDER BY timestamp DESC
-        """
-        
-        df = pd.read_sql_query(query, conn)
-        conn.close()
+        df = load_dataset().results[COLUMNS]
+        df = df.sort_values('timestamp', ascending=False, kind='stable').reset_index(drop=True)
+        df = df.rename(columns={'response_raw': 'response_text', 'sources_extracted': 'sources_json'})
         
         print(f"📊 {len(df)} enregistrements chargés depuis la base de données")
         return df
@@ -80,7 +66,7 @@ def analyze_response_quality(df):
     print("\n📝 ANALYSE DE LA QUALITÉ DES RÉPONSES")
     print("=" * 60)
     
-    response_stats = df.groupby('model_name').agg({
+    response_stats = df.groupby('model_name', observed=True).agg({
         'response_text': ['count', lambda x: x.str.len().mean(), lambda x: x.str.len().std()],
         'response_time_ms': ['mean', 'std']
     }).round(2)
@@ -0,0 +1,335 @@
+#!/usr/bin/env python3
+"""
+Concentration et visibilité des domaines cités, par modèle et catégorie.
+
+Indicateurs par groupe:
+- part des citations captée par les k premiers domaines (top_k_share)
+- indice de Herfindahl-Hirschman (hhi, somme des parts au carré)
+- coefficient de Gini des citations par domaine (domaines cités)
+- visibilité pondérée par la position: chaque citation au rang r vaut
+  1 / log2(r + 1); top_visibility_share = part de la visibilité captée
+  par les k domaines les plus visibles
+
+Les indicateurs sont calculés par un noyau NumPy sur les valeurs non
+nulles de chaque ligne d'une matrice creuse (groupes × domaines). Les
+intervalles de confiance bootstrap rééchantillonnent les réponses d'un
+groupe par tirages multinomiaux: les réplicats sont obtenus par produits
+de matrices creuses (poids × matrice réponses × domaines), par blocs de
+taille bornée.
+
+Avec --backend duckdb, les indicateurs et la visibilité sont calculés par
+le miroir DuckDB (duckdb_backend.py), mis à jour avant le calcul; le
+bootstrap reçoit de DuckDB les couples (réponse, domaine) agrégés, un
+groupe à la fois, sans charger les sources en pandas.
+
+Usage: python concentration_metrics.py [--group-by model_name query_category] [--top-k 10]
+       [--bootstrap 1000] [--confidence 0.95] [--level domain|url] [--format csv|parquet]
+       [--backend pandas|duckdb]
+"""
+
+import argparse
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from source_overlap import normalise_sources
+
+METRICS = ['citations', 'domains', 'top_k_share', 'hhi', 'gini', 'top_visibility_share']
+DEFAULT_GROUP_BY = ['model_name', 'query_category']
+# Valeurs (réplicats × couples réponse-domaine) calculées à la fois par le bootstrap
+BOOTSTRAP_CHUNK_ENTRIES = 2_000_000
+
+
+def position_weights(ranks):
+    """Poids de visibilité d'une citation au rang r (1 = première position)."""
+    return 1.0 / np.log2(np.asarray(ranks, dtype=np.float64) + 1.0)
+
+
+def _row_ids(matrix):
+    """Ligne de chaque valeur stockée d'une matrice CSR."""
+    return np.repeat(np.arange(matrix.shape[0]), np.diff(matrix.indptr))
+
+
+def _ranked_row_sum(matrix, rows, descending):
+    """
+    Valeurs de chaque ligne triées et leur rang dans la ligne (1 = première).
+
+    Le tri porte sur les seules valeurs stockées (indptr/data): les lignes
+    restent contiguës, le rang se déduit de la position moins indptr.
+    """
+    order = np.lexsort((-matrix.data if descending else matrix.data, rows))
+    ranks = np.arange(1, len(order) + 1) - matrix.indptr[rows[order]]
+    return order, ranks
+
+
+def _top_k_sum(matrix, rows, k):
+    order, ranks = _ranked_row_sum(matrix, rows, descending=True)
+    kept = order[ranks <= k]
+    return np.bincount(rows[kept], weights=matrix.data[kept], minlength=matrix.shape[0])
+
+
+def _csr(matrix):
+    matrix = sparse.csr_matrix(matrix, dtype=np.float64, copy=True)
+    matrix.sum_duplicates()
+    matrix.eliminate_zeros()
+    return matrix
+
+
+def concentration_kernel(counts, visibility, k=10):
+    """
+    Indicateurs de concentration pour chaque ligne d'une matrice (lignes × domaines).
+
+    Seules les valeurs non nulles de chaque ligne sont lues (indptr/data):
+    le coût et la mémoire sont proportionnels au nombre de couples
+    (ligne, domaine) cités, pas au nombre de domaines.
+
+    Args:
+        counts: Nombre de citations par domaine (creuse ou dense, lignes = groupes ou réplicats)
+        visibility: Visibilité pondérée par la position, même forme que counts
+        k: Nombre de domaines de tête
+
+    Returns:
+        Dict indicateur -> tableau d'une valeur par ligne
+    """
+    counts, visibility = _csr(counts), _csr(visibility)
+    n_rows = counts.shape[0]
+    rows, visibility_rows = _row_ids(counts), _row_ids(visibility)
+    totals = np.bincount(rows, weights=counts.data, minlength=n_rows)
+    safe_totals = np.where(totals > 0, totals, 1.0)
+    present = np.diff(counts.indptr)
+
+    # Gini sur les domaines cités: rang croissant des valeurs non nulles de chaque ligne
+    order, ranks = _ranked_row_sum(counts, rows, descending=False)
+    weighted = np.bincount(rows[order], weights=ranks * counts.data[order], minlength=n_rows)
+    safe_present = np.where(present > 0, present, 1)
+    gini = 2 * weighted / (safe_present * safe_totals) - (safe_present + 1) / safe_present
+
+    squares = np.bincount(rows, weights=counts.data ** 2, minlength=n_rows)
+    visibility_totals = np.bincount(visibility_rows, weights=visibility.data, minlength=n_rows)
+    empty = totals == 0
+    return {
+        'citations': totals,
+        'domains': present.astype(np.float64),
+        'top_k_share': np.where(empty, np.nan, _top_k_sum(counts, rows, k) / safe_totals),
+        'hhi': np.where(empty, np.nan, squares / safe_totals ** 2),
+        'gini': np.where(empty, np.nan, gini),
+        'top_visibility_share': np.where(
+            visibility_totals > 0,
+            _top_k_sum(visibility, visibility_rows, k) / np.where(visibility_totals > 0, visibility_totals, 1.0),
+            np.nan,
+        ),
+    }
+
+
+def _citations(df_sources, group_by, level):
+    # Toutes les citations comptent, y compris plusieurs résultats d'un même domaine
+    cited = normalise_sources(df_sources, level, group_by, dedupe=False)
+    cited['weight'] = position_weights(cited['source_rank'].to_numpy())
+    for column in group_by:
+        cited[column] = cited[column].astype(str)
+    return cited
+
+
+def _matrices(cited, rows, item_codes, n_items):
+    shape = (rows.max() + 1 if len(rows) else 0, n_items)
+    counts = sparse.csr_matrix((np.ones(len(rows)), (rows, item_codes)), shape=shape)
+    visibility = sparse.csr_matrix((cited['weight'].to_numpy(), (rows, item_codes)), shape=shape)
+    return counts, visibility
+
+
+def compute_concentration(df_sources, group_by=DEFAULT_GROUP_BY, k=10, level='domain'):
+    """
+    Indicateurs de concentration de chaque groupe (un seul appel du noyau).
+
+    Returns:
+        DataFrame: colonnes de groupe + responses + METRICS
+    """
+    group_by = list(group_by)
+    cited = _citations(df_sources, group_by, level)
+    if cited.empty:
+        return pd.DataFrame(columns=group_by + ['responses'] + METRICS)
+    group_codes, groups = pd.factorize(pd.MultiIndex.from_frame(cited[group_by]))
+    item_codes, items = pd.factorize(cited['item'])
+    counts, visibility = _matrices(cited, group_codes, item_codes, len(items))
+
+    metrics = concentration_kernel(counts, visibility, k)
+    table = pd.DataFrame(list(groups), columns=group_by)
+    table['responses'] = cited.groupby(group_codes)['id'].nunique().to_numpy()
+    for name in METRICS:
+        table[name] = metrics[name]
+    return table.astype({'citations': 'int64', 'domains': 'int64'})
+
+
+def response_items(df_sources, group_by=DEFAULT_GROUP_BY, level='domain'):
+    """
+    Citations et visibilité de chaque couple (réponse, domaine), par groupe: l'entrée du bootstrap.
+
+    Returns:
+        DataFrame: colonnes de groupe + id, item, citations, visibility (trié par groupe)
+    """
+    group_by = list(group_by)
+    cited = _citations(df_sources, group_by, level)
+    return cited.groupby(group_by + ['id', 'item'], sort=True).agg(
+        citations=('weight', 'size'), visibility=('weight', 'sum'),
+    ).reset_index()
+
+
+def bootstrap_groups(groups, group_by=DEFAULT_GROUP_BY, k=10, n_boot=1000, confidence=0.95, seed=0):
+    """
+    Intervalles de confiance bootstrap (percentiles) à partir des couples (réponse, domaine) de chaque groupe.
+
+    Les réponses d'un groupe sont rééchantillonnées avec remise: une
+    matrice creuse de poids multinomiaux (réplicats × réponses) multiplie
+    la matrice creuse réponses × domaines. Les réplicats sont traités par
+    blocs de BOOTSTRAP_CHUNK_ENTRIES valeurs au plus, la mémoire ne dépend
+    donc ni de B ni du nombre de domaines.
+
+    Args:
+        groups: Itérable (clé du groupe, DataFrame id/item/citations/visibility), groupes triés par clé
+        group_by: Colonnes de la clé
+
+    Returns:
+        DataFrame: colonnes de groupe + <indicateur>_low / <indicateur>_high
+    """
+    group_by = list(group_by)
+    rng = np.random.default_rng(seed)
+    alpha = (1 - confidence) / 2
+    rows = []
+    for key, frame in groups:
+        # Codes triés: les réplicats ne dépendent pas de l'ordre des lignes reçues
+        response_codes, responses = pd.factorize(frame['id'], sort=True)
+        item_codes, items = pd.factorize(frame['item'], sort=True)
+        shape = (len(responses), len(items))
+        counts = sparse.csr_matrix((frame['citations'].to_numpy(np.float64), (response_codes, item_codes)), shape=shape)
+        visibility = sparse.csr_matrix((frame['visibility'].to_numpy(np.float64), (response_codes, item_codes)), shape=shape)
+        n = len(responses)
+        row = dict(zip(group_by, key if isinstance(key, tuple) else (key,)))
+        replicates = {name: [] for name in METRICS}
+        chunk = max(1, BOOTSTRAP_CHUNK_ENTRIES // max(counts.nnz, n, 1))
+        for start in range(0, n_boot if n > 1 else 0, chunk):
+            size = min(chunk, n_boot - start)
+            weights = sparse.csr_matrix(rng.multinomial(n, np.full(n, 1.0 / n), size=size).astype(np.float64))
+            values = concentration_kernel(weights @ counts, weights @ visibility, k)
+            for name in METRICS:
+                replicates[name].append(values[name])
+        for name in METRICS:
+            low, high = np.nanquantile(np.concatenate(replicates[name]), [alpha, 1 - alpha]) if n > 1 else (np.nan, np.nan)
+            row[f'{name}_low'] = low
+            row[f'{name}_high'] = high
+        rows.append(row)
+    return pd.DataFrame(rows, columns=group_by + [f'{name}_{bound}' for name in METRICS for bound in ('low', 'high')])
+
+
+def bootstrap_concentration(df_sources, group_by=DEFAULT_GROUP_BY, k=10, level='domain',
+                            n_boot=1000, confidence=0.95, seed=0):
+    """
+    Intervalles de confiance bootstrap (percentiles) des indicateurs par groupe.
+
+    Returns:
+        DataFrame: colonnes de groupe + <indicateur>_low / <indicateur>_high
+    """
+    group_by = list(group_by)
+    items = response_items(df_sources, group_by, level)
+    return bootstrap_groups(items.groupby(group_by, sort=True), group_by, k, n_boot, confidence, seed)
+
+
+def domain_visibility(df_sources, group_by=DEFAULT_GROUP_BY, level='domain', top=20):
+    """
+    Visibilité de chaque domaine par groupe (somme des poids de position par réponse).
+
+    Returns:
+        DataFrame des `top` domaines les plus visibles de chaque groupe
+    """
+    group_by = list(group_by)
+    cited = _citations(df_sources, group_by, level)
+    responses = cited.groupby(group_by)['id'].nunique().rename('responses')
+    table = cited.groupby(group_by + ['item']).agg(
+        citations=('weight', 'size'),
+        weighted=('weight', 'sum'),
+        mean_rank=('source_rank', 'mean'),
+    ).reset_index().join(responses, on=group_by)
+    table['visibility'] = table['weighted'] / table['responses']
+    table = table.sort_values(group_by + ['visibility'], ascending=[True] * len(group_by) + [False])
+    table = table.groupby(group_by, sort=False).head(top).rename(columns={'item': level})
+    return table.drop(columns=['weighted']).reset_index(drop=True)
+
+
+def export_concentration(tables, output_dir="analysis_exports", data_format="csv"):
+    """Exporte les tables d'indicateurs (dict nom -> DataFrame)."""
+    output_path = Path(output_dir) / "parquet" if data_format == "parquet" else Path(output_dir)
+    output_path.mkdir(parents=True, exist_ok=True)
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    exported = {}
+    for name, table in tables.items():
+        if data_format == "parquet":
+            path = output_path / f"{name}.parquet"
+            table.to_parquet(path, index=False)
+        else:
+            path = output_path / f"{name}_{timestamp}.csv"
+            table.to_csv(path, index=False, encoding='utf-8')
+        exported[name] = path
+        print(f"✅ Export {name}: {path} ({len(table)} lignes)")
+    return exported
+
+
+def main():
+    from dataset_cache import load_dataset
+
+    parser = argparse.ArgumentParser(description="Concentration et visibilité des domaines cités")
+    parser.add_argument("--group-by", nargs="+", default=DEFAULT_GROUP_BY,
+                        choices=['experiment_id', 'model_name', 'model_type', 'query_category', 'query_id'],
+                        help="Colonnes définissant les groupes")
+    parser.add_argument("--level", choices=["domain", "url"], default="domain")
+    parser.add_argument("--top-k", type=int, default=10, help="Nombre de domaines de tête")
+    parser.add_argument("--bootstrap", type=int, default=1000, help="Nombre de réplicats (0 = sans IC)")
+    parser.add_argument("--confidence", type=float, default=0.95, help="Niveau des intervalles de confiance")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--top-domains", type=int, default=20, help="Domaines listés par groupe (visibilité)")
+    parser.add_argument("--format", choices=["csv", "parquet"], default="csv")
+    parser.add_argument("--output-dir", default="analysis_exports")
+    parser.add_argument("--backend", choices=["pandas", "duckdb"], default="pandas",
+                        help="Moteur de calcul (duckdb: miroir analytique, multi-thread et hors mémoire)")
+    args = parser.parse_args()
+
+    if args.top_k < 1:
+        parser.error("--top-k doit être au moins 1")
+    if not 0 < args.confidence < 1:
+        parser.error("--confidence doit être strictement compris entre 0 et 1")
+
+    if args.backend == "duckdb":
+        import duckdb_backend
+
+        try:
+            duckdb_backend.refresh_mirror()
+        except ImportError as e:
+            parser.error(str(e))
+        con = duckdb_backend.connect(read_only=True)
+        metrics = duckdb_backend.compute_concentration(con, args.group_by, args.top_k, args.level)
+        visibility = duckdb_backend.domain_visibility(con, args.group_by, args.level, args.top_domains)
+        groups = duckdb_backend.iter_response_items(con, args.group_by, args.level)
+    else:
+        sources = load_dataset().sources
+        metrics = compute_concentration(sources, args.group_by, args.top_k, args.level)
+        visibility = domain_visibility(sources, args.group_by, args.level, args.top_domains)
+        groups = response_items(sources, args.group_by, args.level).groupby(args.group_by, sort=True)
+    if args.bootstrap > 0:
+        intervals = bootstrap_groups(
+            groups, args.group_by, args.top_k, args.bootstrap, args.confidence, args.seed
+        )
+        metrics = metrics.merge(intervals, on=args.group_by, how='left')
+
+    export_concentration({'concentration_metrics': metrics, 'domain_visibility': visibility},
+                         args.output_dir, args.format)
+
+    print(f"\n📊 CONCENTRATION DES {'DOMAINES' if args.level == 'domain' else 'URLS'} CITÉS (top {args.top_k})")
+    columns = args.group_by + ['responses', 'citations', 'domains', 'top_k_share', 'hhi', 'gini']
+    if args.bootstrap > 0:
+        columns += ['hhi_low', 'hhi_high']
+    print(metrics[columns].round(3).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
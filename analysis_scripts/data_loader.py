@@ -0,0 +1,466 @@
+#!/usr/bin/env python3
+"""
+Chargement commun des résultats pour les scripts d'analyse.
+
+Un seul point d'accès à la table `results` :
+- projection de colonnes (les textes lourds ne sont lus que s'ils sont demandés)
+- filtres expérience / modèle / session / période / rowid exécutés en SQL
+- itération par blocs (pagination par rowid) pour borner la mémoire
+- types explicites (entiers, horodatages, catégories)
+- décodage des sources citées (une ligne par source, voir process_sources_data)
+
+Exemple:
+    from data_loader import load_results
+    df = load_results(columns=['model_name', 'response_time_ms', 'response_length'],
+                      model_name=['GPT-4o', 'Gemini-Pro'], start='2025-08-01')
+"""
+
+import json
+import sqlite3
+import sys
+from pathlib import Path
+from typing import Iterator, List, Optional, Sequence, Union
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from src.blob_store import prepare_sqlite_connection
+from src.fulltext import FTS_TABLE
+from src.partitions import attach_partitions
+from src.snapshots import BUSY_TIMEOUT_MS, read_only_uri
+
+DEFAULT_DB_PATH = "experiment_results/experiment_data.db"
+
+# Colonnes disponibles: nom logique -> expression SQL (None = colonne homonyme de results)
+COLUMNS = {
+    'id': None,
+    'experiment_id': None,
+    'session_id': None,
+    'query_id': None,
+    'query_text': None,
+    'query_category': None,
+    'iteration': None,
+    'model_name': None,
+    'model_type': None,
+    'response_raw': '{response}',
+    'sources_extracted': None,
+    'chain_of_thought': None,
+    'response_time_ms': None,
+    'timestamp': None,
+    'extra_metadata': None,
+    # Colonnes dérivées, calculées sans transférer les textes
+    # Longueur en caractères (comme result_summary): raw_size des blobs compte des octets UTF-8
+    'response_length': 'COALESCE(length({response}), 0)',
+    'has_sources': "(r.sources_extracted IS NOT NULL AND r.sources_extracted != '[]')",
+    # Colonnes de résumé remplies à l'écriture (src/result_summary.py), NULL sur une base non migrée
+    'sources_count': None,
+    'is_error': None,
+    'error_class': None,
+    'input_tokens': None,
+    'output_tokens': None,
+}
+SUMMARY_COLUMNS = ['sources_count', 'response_length', 'is_error', 'error_class', 'input_tokens', 'output_tokens']
+# Colonnes dérivées lues directement dans les colonnes de résumé quand elles existent
+SUMMARIZED_EXPRESSIONS = {
+    'response_length': 'r.response_length',
+    'has_sources': '(r.sources_count > 0)',
+}
+ALL_COLUMNS = [
+    'id', 'experiment_id', 'session_id', 'query_id', 'query_text', 'query_category', 'iteration',
+    'model_name', 'model_type', 'response_raw', 'sources_extracted', 'chain_of_thought',
+    'response_time_ms', 'timestamp', 'extra_metadata',
+]
+CATEGORY_COLUMNS = [
+    'experiment_id', 'session_id', 'query_id', 'query_category', 'model_name', 'model_type', 'error_class',
+]
+INTEGER_COLUMNS = ['iteration', 'response_time_ms', 'response_length', 'sources_count', 'input_tokens', 'output_tokens']
+DEFAULT_ORDER = "r.timestamp, r.iteration, r.query_id, r.model_name"
+
+Values = Optional[Union[str, Sequence[str]]]
+
+
+def _in_clause(column: str, values: Values, conditions: List[str], params: list):
+    if values is None:
+        return
+    if isinstance(values, str):
+        values = [values]
+    values = list(values)
+    conditions.append(f"{column} IN ({', '.join('?' for _ in values)})")
+    params.extend(values)
+
+
+def _timestamp_param(value) -> str:
+    return pd.Timestamp(value).isoformat(sep=' ')
+
+
+def _has_summary_columns(conn: sqlite3.Connection) -> bool:
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(results)")}
+    return set(SUMMARY_COLUMNS) <= columns
+
+
+def build_query(conn: sqlite3.Connection, columns: Optional[Sequence[str]] = None,
+                experiment_id: Values = None, model_name: Values = None, session_id: Values = None,
+                query_id: Values = None, start=None, end=None, min_rowid: Optional[int] = None,
+                max_rowid: Optional[int] = None, is_error: Optional[bool] = None, with_rowid: bool = False,
+                order_by: str = DEFAULT_ORDER, limit: Optional[int] = None):
+    """
+    Construit la requête SQL projetée et filtrée sur la table results.
+
+    Returns:
+        (requête SQL, paramètres)
+    """
+    columns = list(columns or ALL_COLUMNS)
+    unknown = set(columns) - set(COLUMNS)
+    if unknown:
+        raise ValueError(f"Colonnes inconnues: {sorted(unknown)}")
+
+    # Les colonnes de résumé, si elles existent, évitent de lire le JSON et les textes
+    summarized = _has_summary_columns(conn)
+    needs_blobs = 'response_raw' in columns or ('response_length' in columns and not summarized)
+    response_expr, response_joins = prepare_sqlite_connection(conn) if needs_blobs else ("r.response_raw", "")
+
+    select = ["r.rowid AS row_id"] if with_rowid else []
+    for column in columns:
+        expression = COLUMNS[column]
+        if summarized and column in SUMMARIZED_EXPRESSIONS:
+            expression = SUMMARIZED_EXPRESSIONS[column]
+        elif not summarized and column in SUMMARY_COLUMNS and column != 'response_length':
+            expression = "NULL"
+        if expression is None:
+            select.append(f"r.{column}")
+        else:
+            select.append(f"{expression.format(response=response_expr)} AS {column}")
+
+    conditions: List[str] = []
+    params: list = []
+    _in_clause("r.experiment_id", experiment_id, conditions, params)
+    _in_clause("r.model_name", model_name, conditions, params)
+    _in_clause("r.session_id", session_id, conditions, params)
+    _in_clause("r.query_id", query_id, conditions, params)
+    if start is not None:
+        conditions.append("r.timestamp >= ?")
+        params.append(_timestamp_param(start))
+    if end is not None:
+        conditions.append("r.timestamp < ?")
+        params.append(_timestamp_param(end))
+    if is_error is not None:
+        if not summarized:
+            raise ValueError("Filtre is_error indisponible: colonnes de résumé absentes (python -m src.manage migrate)")
+        conditions.append("r.is_error = ?")
+        params.append(int(is_error))
+    if min_rowid is not None:
+        conditions.append("r.rowid > ?")
+        params.append(min_rowid)
+    if max_rowid is not None:
+        conditions.append("r.rowid <= ?")
+        params.append(max_rowid)
+
+    query = f"SELECT {', '.join(select)} FROM results r {response_joins}"
+    if conditions:
+        query += f" WHERE {' AND '.join(conditions)}"
+    if order_by:
+        query += f" ORDER BY {order_by}"
+    if limit:
+        query += f" LIMIT {int(limit)}"
+    return query, params
+
+
+def apply_dtypes(df: pd.DataFrame) -> pd.DataFrame:
+    """Applique les types attendus (entiers nullables, horodatages, catégories)."""
+    for column in INTEGER_COLUMNS:
+        if column in df.columns:
+            df[column] = pd.to_numeric(df[column], errors='coerce').astype('Int64')
+    if 'timestamp' in df.columns:
+        df['timestamp'] = pd.to_datetime(df['timestamp'], errors='coerce')
+    for column in ('has_sources', 'is_error'):
+        if column in df.columns and df[column].notna().all():
+            df[column] = df[column].astype(bool)
+        elif column in df.columns:
+            df[column] = df[column].astype('boolean')
+    for column in CATEGORY_COLUMNS:
+        if column in df.columns:
+            df[column] = df[column].astype('category')
+    return df
+
+
+def _connect(db_path: Union[str, Path]) -> sqlite3.Connection:
+    if not Path(db_path).exists():
+        raise FileNotFoundError(f"Base de données {db_path} introuvable")
+    # Lecture seule: chaque requête lit une vue cohérente sans prendre de verrou d'écriture (mode WAL)
+    return sqlite3.connect(read_only_uri(db_path), uri=True, timeout=BUSY_TIMEOUT_MS / 1000)
+
+
+def get_max_rowid(db_path: Union[str, Path] = DEFAULT_DB_PATH) -> int:
+    """Retourne le rowid maximal de la table results (0 si vide)."""
+    conn = _connect(db_path)
+    try:
+        return conn.execute("SELECT COALESCE(MAX(rowid), 0) FROM results").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def load_results(db_path: Union[str, Path] = DEFAULT_DB_PATH, columns: Optional[Sequence[str]] = None,
+                 typed: bool = True, partitions: bool = True, **filters) -> pd.DataFrame:
+    """
+    Charge les résultats projetés et filtrés dans un DataFrame.
+
+    Args:
+        db_path: Chemin de la base SQLite
+        columns: Colonnes à charger (défaut: toutes les colonnes de results)
+        typed: Appliquer apply_dtypes au résultat
+        partitions: Inclure les mois archivés (seules les partitions couvrant
+            la période et les expériences demandées sont attachées)
+        **filters: experiment_id, model_name, session_id, query_id (str ou liste),
+            start/end (bornes de timestamp), min_rowid/max_rowid, is_error,
+            with_rowid, order_by, limit
+
+    Returns:
+        DataFrame des résultats
+    """
+    conn = _connect(db_path)
+    try:
+        if partitions:
+            attach_partitions(
+                conn, db_path, experiment_id=filters.get('experiment_id'),
+                start=_timestamp_param(filters['start']) if filters.get('start') is not None else None,
+                end=_timestamp_param(filters['end']) if filters.get('end') is not None else None,
+            )
+        query, params = build_query(conn, columns, **filters)
+        df = pd.read_sql_query(query, conn, params=params)
+    finally:
+        conn.close()
+    return apply_dtypes(df) if typed else df
+
+
+def iter_results(db_path: Union[str, Path] = DEFAULT_DB_PATH, columns: Optional[Sequence[str]] = None,
+                 chunksize: int = 5000, typed: bool = True, with_rowid: bool = False,
+                 min_rowid: Optional[int] = None, **filters) -> Iterator[pd.DataFrame]:
+    """
+    Parcourt les résultats par blocs de `chunksize` lignes, dans l'ordre des rowid.
+
+    Pagination par clé (rowid > dernier lu): chaque bloc est une requête
+    courte, sans verrou de lecture maintenu entre deux blocs. Seule la base
+    active est parcourue (les mois archivés ne changent plus).
+    """
+    conn = _connect(db_path)
+    try:
+        last_rowid = min_rowid
+        while True:
+            query, params = build_query(
+                conn, columns, min_rowid=last_rowid, with_rowid=True,
+                order_by="r.rowid", limit=chunksize, **filters
+            )
+            chunk = pd.read_sql_query(query, conn, params=params)
+            if chunk.empty:
+                return
+            last_rowid = int(chunk['row_id'].iloc[-1])
+            if not with_rowid:
+                chunk = chunk.drop(columns=['row_id'])
+            yield apply_dtypes(chunk) if typed else chunk
+    finally:
+        conn.close()
+
+
+def count_mentions(db_path: Union[str, Path] = DEFAULT_DB_PATH, match: str = "",
+                   experiment_id: Values = None) -> pd.DataFrame:
+    """
+    Nombre de réponses par modèle correspondant à une expression plein texte.
+
+    La recherche utilise l'index FTS5 (voir src/fulltext.py) au lieu de
+    relire le texte de chaque réponse.
+
+    Args:
+        match: Expression FTS5 (mot, phrase "selon les", préfixe sant*, OR / NOT)
+        experiment_id: Limiter à une ou plusieurs expériences
+
+    Returns:
+        DataFrame indexé par model_name: matches, total_responses
+    """
+    conn = _connect(db_path)
+    try:
+        if conn.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (FTS_TABLE,)).fetchone() is None:
+            raise LookupError(f"Index plein texte absent de {db_path} (python -m src.manage migrate)")
+        conditions, params = [], []
+        _in_clause("r.experiment_id", experiment_id, conditions, params)
+        where = "".join(f" AND {condition}" for condition in conditions)
+        matches = pd.read_sql_query(
+            f"SELECT r.model_name, COUNT(*) AS matches FROM {FTS_TABLE} f "
+            f"JOIN results r ON r.id = f.result_id WHERE {FTS_TABLE} MATCH ?{where} GROUP BY r.model_name",
+            conn, params=[match] + params, index_col='model_name',
+        )
+        totals = pd.read_sql_query(
+            f"SELECT r.model_name, COUNT(*) AS total_responses FROM results r WHERE 1 = 1{where} "
+            f"GROUP BY r.model_name",
+            conn, params=params, index_col='model_name',
+        )
+    finally:
+        conn.close()
+    return totals.join(matches).fillna({'matches': 0}).astype('int64')[['matches', 'total_responses']]
+
+
+AGGREGATE_GROUP_COLUMNS = ['experiment_id', 'model_name', 'query_category', 'day']
+
+
+def load_aggregates(db_path: Union[str, Path] = DEFAULT_DB_PATH, group_by: Sequence[str] = ('model_name',),
+                    experiment_id: Values = None) -> pd.DataFrame:
+    """
+    Statistiques de synthèse lues dans la table result_aggregates.
+
+    Les agrégats (voir src/aggregates.py) sont tenus à jour à chaque
+    écriture: la requête parcourt une ligne par (expérience, modèle,
+    catégorie, jour) au lieu de tous les résultats et de leurs textes.
+
+    Args:
+        group_by: Colonnes de regroupement (parmi AGGREGATE_GROUP_COLUMNS)
+        experiment_id: Limiter à une ou plusieurs expériences
+
+    Returns:
+        DataFrame indexé par group_by: results, with_sources, share_with_sources,
+        sources_mean, errors, latency_mean, latency_std, response_length_mean,
+        first_timestamp, last_timestamp
+    """
+    group_by = list(group_by)
+    unknown = set(group_by) - set(AGGREGATE_GROUP_COLUMNS)
+    if unknown:
+        raise ValueError(f"Colonnes de regroupement inconnues: {', '.join(sorted(unknown))}")
+    conn = _connect(db_path)
+    try:
+        if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'result_aggregates'").fetchone() is None:
+            raise LookupError(f"Table result_aggregates absente de {db_path} (python -m src.manage migrate)")
+        conditions, params = [], []
+        _in_clause("experiment_id", experiment_id, conditions, params)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        columns = ", ".join(group_by)
+        df = pd.read_sql_query(f"""
+            SELECT {columns}, SUM(results) AS results, SUM(with_sources) AS with_sources,
+                   SUM(sources_total) AS sources_total, SUM(errors) AS errors,
+                   SUM(latency_count) AS latency_count, SUM(latency_sum) AS latency_sum,
+                   SUM(latency_sum_sq) AS latency_sum_sq, SUM(response_length_sum) AS response_length_sum,
+                   MIN(first_timestamp) AS first_timestamp, MAX(last_timestamp) AS last_timestamp
+            FROM result_aggregates {where}
+            GROUP BY {columns} ORDER BY {columns}
+        """, conn, params=params, index_col=group_by)
+    finally:
+        conn.close()
+
+    latency_count = df['latency_count'].where(df['latency_count'] > 0)
+    df['share_with_sources'] = df['with_sources'] / df['results']
+    df['sources_mean'] = df['sources_total'] / df['results']
+    df['latency_mean'] = df['latency_sum'] / latency_count
+    df['latency_std'] = np.sqrt(
+        ((df['latency_sum_sq'] - df['latency_sum'] ** 2 / latency_count) / (latency_count - 1)).clip(lower=0)
+    ).where(df['latency_count'] > 1)
+    df['response_length_mean'] = df['response_length_sum'] / df['results']
+    for column in ('first_timestamp', 'last_timestamp'):
+        df[column] = pd.to_datetime(df[column], errors='coerce')
+    return df[[
+        'results', 'with_sources', 'share_with_sources', 'sources_mean', 'errors',
+        'latency_mean', 'latency_std', 'response_length_mean', 'first_timestamp', 'last_timestamp',
+    ]]
+
+
+SOURCES_BASE_COLUMNS = [
+    'id', 'experiment_id', 'session_id', 'query_id', 'query_text', 'query_category',
+    'iteration', 'model_name', 'model_type', 'response_time_ms', 'timestamp',
+]
+SOURCES_CATEGORY_COLUMNS = [
+    'experiment_id', 'session_id', 'query_id', 'query_text', 'query_category',
+    'model_name', 'model_type', 'source_type',
+]
+
+
+def _parse_sources_bulk(sources):
+    """
+    Décode la colonne sources_extracted en un seul appel json.loads.
+
+    Les documents JSON sont concaténés dans un tableau unique; en cas de
+    document invalide, on revient à un décodage ligne par ligne pour isoler
+    les lignes en erreur.
+
+    Returns:
+        (liste de listes de sources, masque booléen des lignes en erreur)
+    """
+    values = sources.tolist()
+    parsed = [None] * len(values)
+    errors = np.zeros(len(values), dtype=bool)
+    text_positions = []
+    for i, value in enumerate(values):
+        if isinstance(value, str):
+            if value and value != '[]':
+                text_positions.append(i)
+        elif isinstance(value, list):
+            parsed[i] = value
+
+    if text_positions:
+        try:
+            decoded = json.loads('[' + ','.join(values[i] for i in text_positions) + ']')
+        except json.JSONDecodeError:
+            decoded = []
+            for i in text_positions:
+                try:
+                    decoded.append(json.loads(values[i]))
+                except json.JSONDecodeError as e:
+                    print(f"⚠️  Erreur JSON ligne {i}: {e}")
+                    decoded.append(None)
+                    errors[i] = True
+        for i, value in zip(text_positions, decoded):
+            parsed[i] = value if isinstance(value, list) else None
+
+    return parsed, errors
+
+
+def process_sources_data(df):
+    """
+    Traite et expanse les données de sources (une ligne par source citée).
+
+    Implémentation vectorisée: décodage JSON groupé, explosion par
+    répétition d'index et colonnes catégorielles pour les identifiants.
+    """
+    base = df[SOURCES_BASE_COLUMNS].reset_index(drop=True)
+    responses = df['response_raw'].reset_index(drop=True)
+    base['response_length'] = responses.where(responses.notna() & (responses != ''), '').astype(str).str.len()
+
+    parsed, errors = _parse_sources_bulk(df['sources_extracted'].reset_index(drop=True))
+    lengths = np.fromiter((len(sources) if sources else 0 for sources in parsed), dtype=np.int64, count=len(parsed))
+
+    # Lignes avec sources: une ligne par source
+    owners = np.repeat(np.arange(len(base)), lengths)
+    flat = [
+        source if isinstance(source, dict) else {'url': str(source)}
+        for sources in parsed if sources for source in sources
+    ]
+    details = pd.DataFrame.from_records(flat, columns=None) if flat else pd.DataFrame(index=range(0))
+    for column in ('type', 'url', 'link', 'title', 'text', 'snippet'):
+        if column not in details.columns:
+            details[column] = None
+
+    with_sources = base.iloc[owners].reset_index(drop=True)
+    starts = np.cumsum(lengths) - lengths
+    with_sources['source_rank'] = np.arange(len(owners)) - np.repeat(starts, lengths) + 1
+    with_sources['source_type'] = details['type'].fillna('unknown').astype(str)
+    with_sources['source_url'] = details['url'].combine_first(details['link']).fillna('').astype(str)
+    with_sources['source_title'] = details['title'].combine_first(details['text']).fillna('').astype(str)
+    with_sources['source_snippet'] = details['snippet'].fillna('').astype(str).str[:200]  # Tronquer
+    with_sources['has_sources'] = True
+    with_sources['total_sources'] = np.repeat(lengths, lengths)
+    with_sources['_order'] = owners
+
+    # Lignes sans source (ou JSON invalide): une ligne unique
+    empty_mask = lengths == 0
+    without_sources = base[empty_mask].reset_index(drop=True)
+    without_sources['source_rank'] = 0
+    without_sources['source_type'] = np.where(errors[empty_mask], 'error', 'none')
+    without_sources['source_url'] = ''
+    without_sources['source_title'] = ''
+    without_sources['source_snippet'] = ''
+    without_sources['has_sources'] = False
+    without_sources['total_sources'] = 0
+    without_sources['_order'] = np.flatnonzero(empty_mask)
+
+    processed = pd.concat([with_sources, without_sources], ignore_index=True)
+    processed = processed.sort_values(['_order', 'source_rank'], kind='stable').drop(columns=['_order'])
+    processed = processed.reset_index(drop=True)
+    for column in SOURCES_CATEGORY_COLUMNS:
+        processed[column] = processed[column].astype('category')
+    return processed
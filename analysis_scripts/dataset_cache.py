@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Cache des jeux de données analysés (résultats typés + sources décodées).
+
+Le premier chargement lit SQLite, décode les sources et enregistre les deux
+DataFrames au format Arrow IPC non compressé. Les chargements suivants
+relisent ces fichiers par memory-mapping, sans requête SQL ni décodage JSON.
+
+La clé du cache combine l'identité du fichier de base (chemin, périphérique,
+inode) et le rowid maximal de la table results: tout ajout de résultats ou
+remplacement du fichier invalide l'entrée. Les entrées obsolètes d'une même
+base sont supprimées à chaque reconstruction.
+
+Exemple (notebook):
+    from dataset_cache import load_dataset
+    dataset = load_dataset()
+    dataset.sources.groupby('model_name', observed=True)['total_sources'].mean()
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+from typing import Dict, NamedTuple, Optional, Union
+
+import pandas as pd
+import pyarrow as pa
+
+from data_loader import DEFAULT_DB_PATH, get_max_rowid, load_results, process_sources_data
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from src.partitions import manifest_fingerprint
+
+CACHE_DIR_NAME = ".dataset_cache"
+# À incrémenter si le contenu des DataFrames mis en cache change
+CACHE_VERSION = 1
+MANIFEST_FILE = "manifest.json"
+FRAMES = ('results', 'sources')
+
+
+class ParsedDataset(NamedTuple):
+    results: pd.DataFrame
+    sources: pd.DataFrame
+    max_rowid: int
+    from_cache: bool
+
+
+def default_cache_dir(db_path: Union[str, Path]) -> Path:
+    """Répertoire de cache par défaut, à côté de la base."""
+    return Path(db_path).resolve().parent / CACHE_DIR_NAME
+
+
+def db_identity(db_path: Union[str, Path]) -> Dict[str, Union[str, int]]:
+    """Identité du fichier de base: chemin absolu, périphérique, inode et état des partitions archivées."""
+    path = Path(db_path).resolve()
+    stat = path.stat()
+    return {
+        'path': str(path), 'device': stat.st_dev, 'inode': stat.st_ino,
+        'partitions': manifest_fingerprint(path),
+    }
+
+
+def cache_key(identity: Dict[str, Union[str, int]], max_rowid: int) -> str:
+    payload = json.dumps({**identity, 'max_rowid': max_rowid, 'version': CACHE_VERSION}, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+
+
+def _write_frame(frame: pd.DataFrame, path: Path):
+    table = pa.Table.from_pandas(frame, preserve_index=False)
+    with pa.OSFile(str(path), 'wb') as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+
+
+def read_table(path: Union[str, Path], memory_map: bool = True) -> pa.Table:
+    """Lit un fichier Arrow IPC, par memory-mapping (sans copie) par défaut."""
+    source = pa.memory_map(str(path), 'r') if memory_map else pa.OSFile(str(path), 'rb')
+    return pa.ipc.open_file(source).read_all()
+
+
+def _prune(cache_dir: Path, identity: Dict[str, Union[str, int]], keep: str):
+    """Supprime les autres entrées du même fichier de base (quel que soit l'état des partitions)."""
+    for entry in cache_dir.iterdir():
+        if entry.name == keep or not entry.is_dir():
+            continue
+        try:
+            with open(entry / MANIFEST_FILE, encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            continue
+        cached = manifest.get('identity', {})
+        if all(cached.get(key) == identity[key] for key in ('path', 'device', 'inode')):
+            shutil.rmtree(entry, ignore_errors=True)
+
+
+def _build(db_path: Union[str, Path], entry_dir: Path, identity: Dict[str, Union[str, int]],
+           max_rowid: int) -> ParsedDataset:
+    results = load_results(db_path, max_rowid=max_rowid)
+    sources = process_sources_data(results)
+
+    # Écriture dans un répertoire temporaire puis renommage: une entrée visible est toujours complète
+    entry_dir.parent.mkdir(parents=True, exist_ok=True)
+    staging = Path(tempfile.mkdtemp(prefix=f".{entry_dir.name}-", dir=entry_dir.parent))
+    try:
+        _write_frame(results, staging / "results.arrow")
+        _write_frame(sources, staging / "sources.arrow")
+        with open(staging / MANIFEST_FILE, 'w', encoding='utf-8') as f:
+            json.dump({
+                'identity': identity,
+                'max_rowid': max_rowid,
+                'version': CACHE_VERSION,
+                'rows': {'results': len(results), 'sources': len(sources)},
+            }, f, indent=2)
+        os.replace(staging, entry_dir)
+    except OSError:
+        shutil.rmtree(staging, ignore_errors=True)
+        if not (entry_dir / MANIFEST_FILE).exists():
+            raise
+    return ParsedDataset(results, sources, max_rowid, False)
+
+
+def load_dataset(db_path: Union[str, Path] = DEFAULT_DB_PATH, cache_dir: Optional[Union[str, Path]] = None,
+                 refresh: bool = False, memory_map: bool = True) -> ParsedDataset:
+    """
+    Retourne les résultats typés et les sources décodées, depuis le cache si possible.
+
+    Args:
+        db_path: Chemin de la base SQLite
+        cache_dir: Répertoire du cache (défaut: .dataset_cache à côté de la base)
+        refresh: Reconstruire l'entrée même si elle existe
+        memory_map: Lire les fichiers Arrow par memory-mapping
+
+    Returns:
+        ParsedDataset(results, sources, max_rowid, from_cache)
+    """
+    if not Path(db_path).exists():
+        raise FileNotFoundError(f"Base de données {db_path} introuvable")
+
+    cache_dir = Path(cache_dir) if cache_dir else default_cache_dir(db_path)
+    identity = db_identity(db_path)
+    max_rowid = get_max_rowid(db_path)
+    key = cache_key(identity, max_rowid)
+    entry_dir = cache_dir / key
+
+    if not refresh and (entry_dir / MANIFEST_FILE).exists():
+        frames = [read_table(entry_dir / f"{name}.arrow", memory_map).to_pandas() for name in FRAMES]
+        return ParsedDataset(frames[0], frames[1], max_rowid, True)
+
+    if refresh and entry_dir.exists():
+        shutil.rmtree(entry_dir, ignore_errors=True)
+    dataset = _build(db_path, entry_dir, identity, max_rowid)
+    _prune(cache_dir, identity, keep=key)
+    return dataset
+
+
+def clear_cache(db_path: Union[str, Path] = DEFAULT_DB_PATH, cache_dir: Optional[Union[str, Path]] = None):
+    """Supprime tout le cache associé au répertoire de la base."""
+    shutil.rmtree(Path(cache_dir) if cache_dir else default_cache_dir(db_path), ignore_errors=True)
@@ -0,0 +1,387 @@
+#!/usr/bin/env python3
+"""
+Miroir analytique DuckDB des résultats et des sources (optionnel: pip install duckdb).
+
+Le miroir (fichier .duckdb à côté de la base) contient deux tables:
+- results: les résultats typés (mêmes colonnes que data_loader.load_results)
+- sources: une ligne par source citée (mêmes colonnes que
+  data_loader.process_sources_data), plus l'élément normalisé de chaque
+  source (item_domain, item_url) calculé une fois à l'ingestion
+
+Il est tenu à jour de façon incrémentale depuis SQLite: seules les lignes
+de rowid supérieur au dernier rowid copié sont lues, décodées et ajoutées,
+par blocs (mémoire bornée). Les mois archivés (partitions) sont copiés à
+la reconstruction, déclenchée par un changement de fichier, de partitions
+ou de version du miroir. Un miroir peut aussi être ouvert directement sur
+les exports Parquet de analyze_data.py (vues, sans copie).
+
+Les agrégations (concentration, visibilité, couples réponse × domaine du
+bootstrap) sont exécutées par DuckDB, en parallèle sur tous les cœurs et
+avec débordement sur disque au-delà de memory_limit; elles renvoient les
+mêmes tables que les fonctions pandas de concentration_metrics.py, et
+les sources ne sont jamais chargées entières en pandas.
+
+Exemple (notebook):
+    from duckdb_backend import connect, refresh_mirror, compute_concentration
+    refresh_mirror()
+    compute_concentration(connect(), ['model_name'])
+"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Union
+
+import numpy as np
+import pandas as pd
+
+try:
+    import duckdb
+    DUCKDB_AVAILABLE = True
+except ImportError:
+    duckdb = None
+    DUCKDB_AVAILABLE = False
+
+from concentration_metrics import DEFAULT_GROUP_BY, METRICS
+from data_loader import DEFAULT_DB_PATH, get_max_rowid, iter_results, process_sources_data
+from dataset_cache import db_identity
+from source_overlap import NORMALISERS
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from src.partitions import partition_dir, read_manifest
+
+MIRROR_SUFFIX = ".duckdb"
+# Répertoire de débordement sur disque, à côté du miroir
+TEMP_SUFFIX = ".tmp"
+# À incrémenter si le contenu des tables du miroir change
+MIRROR_VERSION = 1
+
+RESULTS_SCHEMA = {
+    'row_id': 'BIGINT', 'id': 'VARCHAR', 'experiment_id': 'VARCHAR', 'session_id': 'VARCHAR',
+    'query_id': 'VARCHAR', 'query_text': 'VARCHAR', 'query_category': 'VARCHAR', 'iteration': 'INTEGER',
+    'model_name': 'VARCHAR', 'model_type': 'VARCHAR', 'response_raw': 'VARCHAR', 'sources_extracted': 'VARCHAR',
+    'chain_of_thought': 'VARCHAR', 'response_time_ms': 'INTEGER', 'timestamp': 'TIMESTAMP',
+    'extra_metadata': 'VARCHAR',
+}
+SOURCES_SCHEMA = {
+    'id': 'VARCHAR', 'experiment_id': 'VARCHAR', 'session_id': 'VARCHAR', 'query_id': 'VARCHAR',
+    'query_text': 'VARCHAR', 'query_category': 'VARCHAR', 'iteration': 'INTEGER', 'model_name': 'VARCHAR',
+    'model_type': 'VARCHAR', 'response_time_ms': 'INTEGER', 'timestamp': 'TIMESTAMP', 'response_length': 'INTEGER',
+    'source_rank': 'INTEGER', 'source_type': 'VARCHAR', 'source_url': 'VARCHAR', 'source_title': 'VARCHAR',
+    'source_snippet': 'VARCHAR', 'has_sources': 'BOOLEAN', 'total_sources': 'INTEGER',
+    'item_domain': 'VARCHAR', 'item_url': 'VARCHAR',
+}
+
+
+def _require_duckdb():
+    if not DUCKDB_AVAILABLE:
+        raise ImportError("Backend DuckDB indisponible: pip install duckdb")
+
+
+def default_mirror_path(db_path: Union[str, Path] = DEFAULT_DB_PATH) -> Path:
+    """Fichier du miroir par défaut, à côté de la base."""
+    path = Path(db_path).resolve()
+    return path.with_name(path.stem + MIRROR_SUFFIX)
+
+
+def connect(mirror_path: Optional[Union[str, Path]] = None, threads: Optional[int] = None,
+            memory_limit: Optional[str] = None, read_only: bool = False):
+    """
+    Ouvre le miroir DuckDB.
+
+    Args:
+        threads: Nombre de threads (défaut DuckDB: tous les cœurs)
+        memory_limit: Mémoire maximale avant débordement sur disque (ex. '4GB')
+        read_only: Ouverture en lecture seule (plusieurs lecteurs simultanés)
+    """
+    _require_duckdb()
+    mirror_path = Path(mirror_path) if mirror_path else default_mirror_path()
+    con = duckdb.connect(str(mirror_path), read_only=read_only)
+    con.execute(f"SET temp_directory = '{mirror_path.with_name(mirror_path.name + TEMP_SUFFIX)}'")
+    if threads:
+        con.execute(f"SET threads = {int(threads)}")
+    if memory_limit:
+        con.execute(f"SET memory_limit = '{memory_limit}'")
+    return con
+
+
+def _create_table(con, name: str, schema: Dict[str, str]):
+    columns = ", ".join(f'"{column}" {column_type}' for column, column_type in schema.items())
+    con.execute(f"CREATE TABLE {name} ({columns})")
+
+
+def _read_state(con) -> Dict[str, Any]:
+    exists = con.execute(
+        "SELECT COUNT(*) FROM information_schema.tables WHERE table_name = 'mirror_state'"
+    ).fetchone()[0]
+    if not exists:
+        return {}
+    row = con.execute("SELECT state FROM mirror_state").fetchone()
+    return json.loads(row[0]) if row else {}
+
+
+def _write_state(con, state: Dict[str, Any]):
+    con.execute("DELETE FROM mirror_state")
+    con.execute("INSERT INTO mirror_state VALUES (?)", [json.dumps(state, sort_keys=True)])
+
+
+def _reset(con):
+    for table in ('results', 'sources', 'mirror_state'):
+        con.execute(f"DROP TABLE IF EXISTS {table}")
+    _create_table(con, 'results', RESULTS_SCHEMA)
+    _create_table(con, 'sources', SOURCES_SCHEMA)
+    con.execute("CREATE TABLE mirror_state (state VARCHAR)")
+
+
+def _normalised_items(urls: pd.Series, level: str) -> np.ndarray:
+    """Élément normalisé de chaque URL (une normalisation par URL distincte, comme normalise_sources)."""
+    codes, uniques = pd.factorize(urls)
+    normalised = np.array([NORMALISERS[level](url) if url else '' for url in uniques], dtype=object)
+    return normalised[codes] if len(codes) else np.array([], dtype=object)
+
+
+def _plain_types(frame: pd.DataFrame) -> pd.DataFrame:
+    """Catégories et types nullables pandas en objets Python (None pour les manquants): le schéma de la table fait foi."""
+    frame = frame.copy()
+    for column in frame.columns:
+        if pd.api.types.is_extension_array_dtype(frame[column].dtype):
+            values = frame[column].astype(object)
+            frame[column] = values.where(values.notna(), None)
+    return frame
+
+
+def _append(con, chunk: pd.DataFrame, default_rowid: Optional[int] = None) -> int:
+    """Ajoute un bloc de résultats et ses sources décodées au miroir."""
+    sources = process_sources_data(chunk)
+    for level in NORMALISERS:
+        sources[f'item_{level}'] = _normalised_items(sources['source_url'], level)
+    results = chunk.copy()
+    if default_rowid is not None:
+        results['row_id'] = default_rowid
+    for frame, table, schema in ((results, 'results', RESULTS_SCHEMA), (sources, 'sources', SOURCES_SCHEMA)):
+        con.register('mirror_chunk', _plain_types(frame[list(schema)]))
+        try:
+            con.execute(f"INSERT INTO {table} SELECT * FROM mirror_chunk")
+        finally:
+            con.unregister('mirror_chunk')
+    return len(chunk)
+
+
+def refresh_mirror(db_path: Union[str, Path] = DEFAULT_DB_PATH, mirror_path: Optional[Union[str, Path]] = None,
+                   chunksize: int = 5000, rebuild: bool = False) -> Dict[str, Any]:
+    """
+    Met à jour le miroir DuckDB depuis la base SQLite (ajout des nouveaux résultats).
+
+    Returns:
+        Dict (mode 'rebuild' ou 'incremental', rows ajoutés, max_rowid)
+    """
+    _require_duckdb()
+    mirror_path = Path(mirror_path) if mirror_path else default_mirror_path(db_path)
+    identity = {**db_identity(db_path), 'version': MIRROR_VERSION}
+    max_rowid = get_max_rowid(db_path)
+
+    con = connect(mirror_path)
+    try:
+        state = _read_state(con)
+        stale = state.get('identity') != identity or state.get('max_rowid', 0) > max_rowid
+        mode = 'rebuild' if rebuild or stale else 'incremental'
+        rows = 0
+        con.execute("BEGIN TRANSACTION")
+        if mode == 'rebuild':
+            _reset(con)
+            # Mois archivés: parcourus une fois à la reconstruction (rowid 0, comme dans load_results)
+            for entry in sorted(read_manifest(db_path)['partitions'].values(), key=lambda entry: entry['month']):
+                for chunk in iter_results(partition_dir(db_path) / entry['file'], chunksize=chunksize):
+                    rows += _append(con, chunk, default_rowid=0)
+            watermark = 0
+        else:
+            watermark = state['max_rowid']
+        for chunk in iter_results(db_path, chunksize=chunksize, min_rowid=watermark, max_rowid=max_rowid,
+                                  with_rowid=True):
+            rows += _append(con, chunk)
+        _write_state(con, {'identity': identity, 'max_rowid': max_rowid})
+        con.execute("COMMIT")
+    finally:
+        con.close()
+    return {'mode': mode, 'rows': rows, 'max_rowid': max_rowid, 'path': mirror_path}
+
+
+def _udf(normaliser):
+    def normalise(url):
+        return normaliser(url) if url else ''
+    return normalise
+
+
+def mirror_parquet(parquet_dir: Union[str, Path] = "analysis_exports/parquet",
+                   mirror_path: Optional[Union[str, Path]] = None):
+    """
+    Ouvre un miroir sur les exports Parquet partitionnés (vues results et sources, sans copie).
+
+    Les éléments normalisés des sources sont calculés à la lecture par des
+    fonctions Python enregistrées dans DuckDB (plus lent que le miroir SQLite).
+
+    Returns:
+        Connexion DuckDB (en mémoire si mirror_path est None)
+    """
+    _require_duckdb()
+    con = duckdb.connect(str(mirror_path) if mirror_path else ":memory:")
+    for level, normaliser in NORMALISERS.items():
+        con.create_function(f"normalise_{level}", _udf(normaliser), ['VARCHAR'], 'VARCHAR')
+    datasets = {'results': 'experiment_data', 'sources': 'sources_detail'}
+    for view, name in datasets.items():
+        pattern = str(Path(parquet_dir) / name / "**" / "*.parquet")
+        extra = ", normalise_domain(source_url) AS item_domain, normalise_url(source_url) AS item_url" \
+            if view == 'sources' else ""
+        con.execute(
+            f"CREATE OR REPLACE VIEW {view} AS SELECT * EXCLUDE (date){extra} "
+            f"FROM read_parquet('{pattern}', hive_partitioning = true)"
+        )
+    return con
+
+
+def _group_list(group_by: Sequence[str]) -> str:
+    return ", ".join(f'"{column}"' for column in group_by)
+
+
+def _cited(group_by: Sequence[str], level: str) -> str:
+    # Toutes les citations comptent (comme concentration_metrics._citations, sans dédoublonnage)
+    return (
+        f"SELECT id, {_group_list(group_by)}, source_rank, item_{level} AS item, "
+        f"1.0 / log2(source_rank + 1.0) AS weight FROM sources WHERE source_rank > 0 AND item_{level} != ''"
+    )
+
+
+def compute_concentration(con, group_by: Sequence[str] = DEFAULT_GROUP_BY, k: int = 10,
+                          level: str = 'domain') -> pd.DataFrame:
+    """
+    Indicateurs de concentration par groupe, calculés par DuckDB.
+
+    Returns:
+        Même table que concentration_metrics.compute_concentration
+    """
+    group_by = list(group_by)
+    groups = _group_list(group_by)
+    query = f"""
+        WITH cited AS ({_cited(group_by, level)}),
+        items AS (
+            SELECT {groups}, item, COUNT(*) AS citations, SUM(weight) AS visibility
+            FROM cited GROUP BY {groups}, item
+        ),
+        ranked AS (
+            SELECT *,
+                ROW_NUMBER() OVER (PARTITION BY {groups} ORDER BY citations DESC) AS count_rank,
+                ROW_NUMBER() OVER (PARTITION BY {groups} ORDER BY visibility DESC) AS visibility_rank,
+                ROW_NUMBER() OVER (PARTITION BY {groups} ORDER BY citations) AS position,
+                SUM(citations) OVER (PARTITION BY {groups}) AS total
+            FROM items
+        ),
+        metrics AS (
+            SELECT {groups},
+                SUM(citations) AS citations,
+                COUNT(*) AS domains,
+                SUM(citations) FILTER (WHERE count_rank <= {int(k)}) / SUM(citations) AS top_k_share,
+                SUM((citations / total) ^ 2) AS hhi,
+                2 * SUM(position * citations) / (COUNT(*) * SUM(citations)) - (COUNT(*) + 1.0) / COUNT(*) AS gini,
+                SUM(visibility) FILTER (WHERE visibility_rank <= {int(k)}) / NULLIF(SUM(visibility), 0)
+                    AS top_visibility_share
+            FROM ranked GROUP BY {groups}
+        ),
+        responses AS (SELECT {groups}, COUNT(DISTINCT id) AS responses FROM cited GROUP BY {groups})
+        SELECT {groups}, responses, {', '.join(METRICS)}
+        FROM metrics JOIN responses USING ({groups})
+        ORDER BY {groups}
+    """
+    table = con.execute(query).df()
+    return table.astype({'citations': 'int64', 'domains': 'int64', 'responses': 'int64'})
+
+
+def domain_visibility(con, group_by: Sequence[str] = DEFAULT_GROUP_BY, level: str = 'domain',
+                      top: int = 20) -> pd.DataFrame:
+    """
+    Visibilité de chaque domaine par groupe, calculée par DuckDB.
+
+    Returns:
+        Même table que concentration_metrics.domain_visibility
+    """
+    group_by = list(group_by)
+    groups = _group_list(group_by)
+    query = f"""
+        WITH cited AS ({_cited(group_by, level)}),
+        responses AS (SELECT {groups}, COUNT(DISTINCT id) AS responses FROM cited GROUP BY {groups}),
+        items AS (
+            SELECT {groups}, item AS "{level}", COUNT(*) AS citations, SUM(weight) AS weighted,
+                AVG(source_rank) AS mean_rank
+            FROM cited GROUP BY {groups}, item
+        )
+        SELECT {groups}, "{level}", citations, mean_rank, responses, weighted / responses AS visibility
+        FROM items JOIN responses USING ({groups})
+        QUALIFY ROW_NUMBER() OVER (PARTITION BY {groups} ORDER BY weighted / responses DESC) <= {int(top)}
+        ORDER BY {groups}, visibility DESC
+    """
+    table = con.execute(query).df()
+    return table.astype({'citations': 'int64', 'responses': 'int64'})
+
+
+def _split_groups(frame: pd.DataFrame, group_by: List[str], last: bool):
+    """Groupes complets d'un bloc trié; le dernier groupe est retenu (sauf au dernier bloc) car il peut continuer."""
+    if frame.empty:
+        return [], frame
+    if last:
+        complete, rest = frame, frame.iloc[:0]
+    else:
+        tail = frame[group_by].iloc[-1]
+        continues = (frame[group_by] == tail).all(axis=1)
+        complete, rest = frame[~continues], frame[continues]
+    return list(complete.groupby(group_by, sort=False)), rest
+
+
+def iter_response_items(con, group_by: Sequence[str] = DEFAULT_GROUP_BY, level: str = 'domain',
+                        batch_size: int = 100000) -> Iterator:
+    """
+    Citations et visibilité de chaque couple (réponse, domaine), un groupe à la fois.
+
+    DuckDB agrège les sources et renvoie les couples triés par groupe, lus
+    par lots: seuls le groupe en cours et un lot sont en mémoire.
+
+    Yields:
+        (clé du groupe, DataFrame id/item/citations/visibility), dans l'ordre de
+        concentration_metrics.response_items
+    """
+    group_by = list(group_by)
+    groups = _group_list(group_by)
+    reader = con.execute(f"""
+        WITH cited AS ({_cited(group_by, level)})
+        SELECT {groups}, id, item, COUNT(*) AS citations, SUM(weight) AS visibility
+        FROM cited GROUP BY {groups}, id, item
+        ORDER BY {groups}, id, item
+    """).fetch_record_batch(batch_size)
+    carry = None
+    for batch in reader:
+        frame = batch.to_pandas()
+        if carry is not None and len(carry):
+            frame = pd.concat([carry, frame], ignore_index=True)
+        complete, carry = _split_groups(frame, group_by, last=False)
+        yield from complete
+    if carry is not None:
+        complete, _ = _split_groups(carry, group_by, last=True)
+        yield from complete
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Miroir analytique DuckDB des résultats")
+    parser.add_argument("--rebuild", action="store_true", help="Reconstruire entièrement le miroir")
+    parser.add_argument("--chunksize", type=int, default=5000, help="Résultats lus et décodés par bloc")
+    args = parser.parse_args()
+
+    try:
+        report = refresh_mirror(chunksize=args.chunksize, rebuild=args.rebuild)
+    except (ImportError, FileNotFoundError) as e:
+        print(f"❌ {e}")
+        return
+    label = "reconstruit" if report['mode'] == 'rebuild' else "mis à jour"
+    print(f"✅ Miroir {report['path']} {label}: {report['rows']} résultats ajoutés (rowid ≤ {report['max_rowid']})")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,35 +3,33 @@
 Script rapide pour examiner le contenu des réponses et comprendre pourquoi GPT-4o n'a pas de sources.
 """
 
-import sqlite3
 import json
 from pathlib import Path
 
+from data_loader import DEFAULT_DB_PATH, count_mentions, load_aggregates, load_results
+
 def peek_responses():
     """Examine quelques réponses pour comprendre les patterns de référencement."""
     
-    db_path = "experiment_results/experiment_data.db"
+    db_path = DEFAULT_DB_PATH
     if not Path(db_path).exists():
         print(f"❌ Base de données {db_path} introuvable")
         return
     
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    
     # Récupère quelques réponses de chaque modèle
-    query = """
-    SELECT model_name, query_text, response_raw, sources_extracted
-    FROM results 
-    WHERE model_name IN ('GPT-4o', 'Google-Search')
-    LIMIT 4
-    """
-    
-    results = cursor.fetchall()
+    sample = load_results(
+        db_path,
+        columns=['model_name', 'query_text', 'response_raw', 'sources_extracted'],
+        model_name=['GPT-4o', 'Google-Search'],
+        order_by="",
+        limit=4,
+        typed=False,
+    )
     
     print("🔍 ÉCHANTILLON DE RÉPONSES")
     print("=" * 80)
     
-    for model, query, response, sources in cursor.execute(query):
+    for model, query, response, sources in sample.itertuples(index=False, name=None):
         print(f"\n📋 MODÈLE: {model}")
         print(f"❓ REQUÊTE: {query[:60]}...")
         
@@ -68,31 +66,33 @@ def peek_responses():
         
         print("-" * 60)
     
-    conn.close()
-    
-    # Statistiques rapides
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    
+    # Statistiques rapides (agrégats tenus à jour à l'écriture, sans lire les réponses)
     print(f"\n📊 STATISTIQUES RAPIDES")
-    stats_query = """
-    SELECT 
-        model_name,
-        COUNT(*) as total_responses,
-        AVG(length(response_raw)) as avg_response_length,
-        SUM(CASE WHEN sources_extracted != '[]' AND sources_extracted IS NOT NULL THEN 1 ELSE 0 END) as responses_with_sources
-    FROM results
-    GROUP BY model_name
-    """
-    
-    print(f"{'Modèle':<15} {'Réponses':<10} {'Long.Moy':<10} {'Avec Sources':<12}")
-    print("-" * 50)
+    try:
+        stats = load_aggregates(db_path, ['model_name'])
+    except LookupError as error:
+        print(f"⚠️  {error}")
+        return
     
-    for row in cursor.execute(stats_query):
-        model, total, avg_len, with_sources = row
-        print(f"{model:<15} {total:<10} {avg_len:<10.0f} {with_sources:<12}")
+    print(f"{'Modèle':<15} {'Réponses':<10} {'Long.Moy':<10} {'Avec Sources':<12} {'Erreurs':<8}")
+    print("-" * 58)
     
-    conn.close()
+    for model, row in stats.iterrows():
+        print(f"{model:<15} {row['results']:<10} {row['response_length_mean']:<10.0f} "
+              f"{row['with_sources']:<12} {row['errors']:<8}")
+
+    # Mentions de sources dans le texte, via l'index plein texte
+    print(f"\n🔎 MENTIONS DANS LES RÉPONSES (nombre de réponses)")
+    patterns = {'selon': 'selon', 'source(s)': 'source*', "d'après": '"d apres"'}
+    try:
+        mentions = {label: count_mentions(db_path, match)['matches'] for label, match in patterns.items()}
+    except LookupError as error:
+        print(f"⚠️  {error}")
+        return
+    print(f"{'Modèle':<24} " + " ".join(f"{label:<10}" for label in patterns))
+    print("-" * (25 + 11 * len(patterns)))
+    for model in stats.index:
+        print(f"{model:<24} " + " ".join(f"{int(mentions[label].get(model, 0)):<10}" for label in patterns))
 
 if __name__ == "__main__":
     peek_responses()
\ No newline at end of file
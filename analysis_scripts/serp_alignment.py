@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Alignement des citations des agents conversationnels sur les SERP des moteurs.
+
+Pour chaque source citée par un LLM, cherche si le même domaine (ou la même
+URL canonique) figure dans la page de résultats d'un moteur de recherche
+(model_type = search_engine) pour la même requête, dans la même session et
+une fenêtre d'itérations [i - window, i + window], et à quel rang.
+
+La jointure est une jointure par hachage (pandas.merge) sur des clés
+entières: les éléments sont factorisés une fois, les SERP sont étendues aux
+itérations de la fenêtre en gardant le meilleur rang, puis chaque citation
+est appariée en une seule passe, sans boucle par requête.
+
+Usage: python serp_alignment.py [--level domain|url|both] [--window 0] [--format csv|parquet]
+"""
+
+import argparse
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from source_overlap import LEVELS, normalise_sources
+
+SEARCH_ENGINE_TYPE = 'search_engine'
+UNIT_COLUMNS = ['experiment_id', 'session_id', 'query_id']
+SOURCE_COLUMNS = UNIT_COLUMNS + ['iteration', 'model_name', 'model_type']
+
+
+def _split(df_sources, level):
+    cited = normalise_sources(df_sources, level, SOURCE_COLUMNS)
+    for column in SOURCE_COLUMNS:
+        cited[column] = cited[column].astype(str) if column != 'iteration' else cited[column].astype('int64')
+    is_serp = cited['model_type'] == SEARCH_ENGINE_TYPE
+    return cited[~is_serp], cited[is_serp]
+
+
+def _expand_window(serp, window):
+    """Duplique chaque SERP sur les itérations cibles de la fenêtre (meilleur rang par élément)."""
+    offsets = np.arange(-window, window + 1)
+    expanded = serp.loc[serp.index.repeat(len(offsets))].copy()
+    expanded['target_iteration'] = expanded['iteration'].to_numpy() + np.tile(offsets, len(serp))
+    expanded = expanded.rename(columns={'model_name': 'engine', 'source_rank': 'serp_rank'})
+    return expanded
+
+
+def align_citations(df_sources, level='domain', window=0):
+    """
+    Apparie chaque citation de LLM aux SERP disponibles pour la même requête.
+
+    Une citation n'est comparée qu'aux moteurs ayant une SERP dans la
+    fenêtre; serp_rank vaut NaN si l'élément n'y figure pas.
+
+    Returns:
+        DataFrame tidy: une ligne par (citation, moteur)
+    """
+    citations, serp = _split(df_sources, level)
+    columns = ['level'] + SOURCE_COLUMNS + ['source_rank', 'item', 'engine', 'serp_rank', 'hit']
+    if citations.empty or serp.empty:
+        return pd.DataFrame(columns=columns)
+
+    # Clés entières communes aux deux côtés de la jointure
+    item_codes, _ = pd.factorize(pd.concat([citations['item'], serp['item']], ignore_index=True))
+    citations = citations.assign(item_code=item_codes[:len(citations)])
+    serp = serp.assign(item_code=item_codes[len(citations):])
+
+    expanded = _expand_window(serp, window)
+    join_keys = UNIT_COLUMNS + ['target_iteration']
+    serp_items = (
+        expanded.groupby(join_keys + ['engine', 'item_code'], sort=False)['serp_rank'].min().reset_index()
+    )
+    serp_units = expanded[join_keys + ['engine']].drop_duplicates()
+
+    citations = citations.rename(columns={'iteration': 'target_iteration'})
+    aligned = citations.merge(serp_units, on=join_keys, how='inner')
+    aligned = aligned.merge(serp_items, on=join_keys + ['engine', 'item_code'], how='left')
+    aligned = aligned.rename(columns={'target_iteration': 'iteration'})
+    aligned['hit'] = aligned['serp_rank'].notna()
+    aligned.insert(0, 'level', level)
+    return aligned[columns].reset_index(drop=True)
+
+
+def summarize_alignment(aligned):
+    """Taux de présence dans la SERP et rang des correspondances, par modèle et moteur."""
+    return aligned.groupby(['level', 'model_name', 'engine'], observed=True).agg(
+        citations=('hit', 'size'),
+        hits=('hit', 'sum'),
+        hit_rate=('hit', 'mean'),
+        mean_hit_rank=('serp_rank', 'mean'),
+        median_hit_rank=('serp_rank', 'median'),
+    ).reset_index()
+
+
+def hit_rank_distribution(aligned):
+    """Nombre de correspondances par rang dans la SERP, par modèle et moteur."""
+    hits = aligned[aligned['hit']]
+    return (
+        hits.groupby(['level', 'model_name', 'engine', 'serp_rank'], observed=True)
+        .size().rename('hits').reset_index()
+        .astype({'serp_rank': 'int64'})
+    )
+
+
+def export_alignment(aligned, output_dir="analysis_exports", data_format="csv"):
+    """
+    Exporte les tables tidy: appariements, synthèse et distribution des rangs.
+
+    Returns:
+        Dict des fichiers écrits
+    """
+    output_path = Path(output_dir)
+    tables = {
+        'serp_alignment': aligned,
+        'serp_alignment_summary': summarize_alignment(aligned),
+        'serp_hit_ranks': hit_rank_distribution(aligned),
+    }
+    if data_format == "parquet":
+        output_path = output_path / "parquet"
+    output_path.mkdir(parents=True, exist_ok=True)
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+
+    exported = {}
+    for name, table in tables.items():
+        if data_format == "parquet":
+            path = output_path / f"{name}.parquet"
+            table.to_parquet(path, index=False)
+        else:
+            path = output_path / f"{name}_{timestamp}.csv"
+            table.to_csv(path, index=False, encoding='utf-8')
+        exported[name] = path
+        print(f"✅ Export {name}: {path} ({len(table)} lignes)")
+    return exported
+
+
+def main():
+    from dataset_cache import load_dataset
+
+    parser = argparse.ArgumentParser(description="Alignement des citations LLM sur les SERP des moteurs")
+    parser.add_argument("--level", choices=["domain", "url", "both"], default="both")
+    parser.add_argument("--window", type=int, default=0,
+                        help="Écart d'itérations toléré entre la citation et la SERP (même session)")
+    parser.add_argument("--format", choices=["csv", "parquet"], default="csv")
+    parser.add_argument("--output-dir", default="analysis_exports")
+    args = parser.parse_args()
+
+    if args.window < 0:
+        parser.error("--window doit être positif")
+
+    sources = load_dataset().sources
+    levels = LEVELS if args.level == "both" else (args.level,)
+    aligned = pd.concat([align_citations(sources, level, args.window) for level in levels], ignore_index=True)
+    if aligned.empty:
+        print("⚠️  Aucune citation de LLM appariable à une SERP (URLs absentes ou pas de moteur)")
+        return
+    export_alignment(aligned, args.output_dir, args.format)
+
+    print(f"\n📊 PRÉSENCE DES CITATIONS DANS LES SERP")
+    print(summarize_alignment(aligned).round(3).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+Recouvrement des sources citées entre modèles (hypothèse 2a).
+
+Pour chaque unité de comparaison (expérience, session, requête, itération),
+compare les sources de chaque paire de modèles au niveau du domaine ou de
+l'URL canonique:
+- Jaccard des ensembles de sources
+- RBO (rank-biased overlap, Webber et al. 2010), tronqué à `depth`, qui
+  pondère davantage l'accord sur les premières sources citées
+
+Les listes de sources sont encodées en matrices creuses résultat × élément
+(valeur = rang); toutes les paires sont évaluées en une seule passe
+d'opérations creuses, sans boucle Python par paire.
+
+Usage: python source_overlap.py [--level domain|url|both] [--p 0.9] [--depth 10] [--format csv|parquet]
+"""
+
+import argparse
+import sys
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from src.url_utils import canonical_url, extract_domain
+
+LEVELS = ('domain', 'url')
+UNIT_COLUMNS = ['experiment_id', 'session_id', 'query_id', 'iteration']
+NORMALISERS = {'domain': extract_domain, 'url': canonical_url}
+
+
+def normalise_sources(df_sources, level='domain', columns=('id',), dedupe=True):
+    """
+    Sources citées avec leur élément normalisé (domaine ou URL canonique).
+
+    Chaque URL distincte n'est normalisée qu'une fois; avec `dedupe`, un
+    élément cité plusieurs fois par un même résultat n'est gardé qu'à sa
+    première position.
+
+    Returns:
+        DataFrame (columns..., source_rank, item) trié par résultat puis position
+    """
+    columns = list(dict.fromkeys(['id', *columns]))
+    cited = df_sources.loc[df_sources['source_rank'] > 0, columns + ['source_rank', 'source_url']]
+    codes, uniques = pd.factorize(cited['source_url'])
+    normalised = np.array([NORMALISERS[level](url) for url in uniques], dtype=object)
+    cited = cited.drop(columns=['source_url']).assign(
+        id=cited['id'].astype(str),
+        item=normalised[codes] if len(codes) else np.array([], dtype=object),
+    )
+    cited = cited[cited['item'] != '']
+    cited = cited.sort_values(['id', 'source_rank'], kind='stable')
+    if dedupe:
+        cited = cited.drop_duplicates(['id', 'item'])
+    return cited.reset_index(drop=True)
+
+
+def ranked_items(df_sources, level='domain'):
+    """
+    Liste classée et dédupliquée des éléments cités par résultat.
+
+    Returns:
+        DataFrame (id, item, rank) avec rank = 1, 2, ... par résultat
+    """
+    ranked = normalise_sources(df_sources, level)
+    ranked['rank'] = ranked.groupby('id').cumcount() + 1
+    return ranked[['id', 'item', 'rank']]
+
+
+def rank_matrix(results, ranked):
+    """Matrice creuse CSR (résultats × éléments) contenant le rang de chaque élément cité."""
+    rows = pd.Index(results['id']).get_indexer(ranked['id'])
+    item_codes, items = pd.factorize(ranked['item'])
+    return sparse.csr_matrix(
+        (ranked['rank'].to_numpy(dtype=np.int64), (rows, item_codes)),
+        shape=(len(results), len(items)),
+    )
+
+
+def model_pairs(results):
+    """Paires (a, b) de résultats d'une même unité de comparaison, modèles distincts (a < b)."""
+    keys = results[UNIT_COLUMNS + ['model_name']].copy()
+    keys['model_name'] = keys['model_name'].astype(str)
+    keys['position'] = np.arange(len(keys))
+    pairs = keys.merge(keys, on=UNIT_COLUMNS, suffixes=('_a', '_b'))
+    pairs = pairs[pairs['model_name_a'] < pairs['model_name_b']]
+    return pairs.reset_index(drop=True)
+
+
+def rbo_weights(p, depth):
+    """
+    W[m] = somme_{d=m..depth} p^(d-1) / d, avec W[0] = W[depth+1] = 0.
+
+    RBO@depth = (1-p) * somme_d p^(d-1) |A_d ∩ B_d| / d; un élément commun
+    de rangs (ra, rb) compte dans toutes les profondeurs d >= max(ra, rb),
+    d'où RBO = (1-p) * somme sur les éléments communs de W[max(ra, rb)].
+    """
+    depths = np.arange(1, depth + 1)
+    terms = p ** (depths - 1) / depths
+    weights = np.zeros(depth + 2)
+    weights[1:depth + 1] = np.cumsum(terms[::-1])[::-1]
+    return weights
+
+
+def compute_overlap(df_sources, level='domain', p=0.9, depth=10):
+    """
+    Calcule Jaccard et RBO pour toutes les paires de modèles d'une même unité.
+
+    Args:
+        df_sources: Sources traitées (voir data_loader.process_sources_data)
+        level: 'domain' ou 'url'
+        p: Persistance du RBO (poids des rangs profonds)
+        depth: Profondeur de troncature du RBO
+
+    Returns:
+        DataFrame tidy: une ligne par paire (unité, model_a, model_b)
+    """
+    results = df_sources.drop_duplicates('id')[UNIT_COLUMNS + ['query_category', 'model_name', 'id']]
+    results = results.assign(id=results['id'].astype(str)).reset_index(drop=True)
+    ranks = rank_matrix(results, ranked_items(df_sources, level))
+    present = (ranks > 0).astype(np.int64).tocsr()
+    sizes = np.diff(present.indptr)
+
+    pairs = model_pairs(results)
+    a = pairs['position_a'].to_numpy()
+    b = pairs['position_b'].to_numpy()
+
+    common = present[a].multiply(present[b]).tocsr()
+    intersection = np.asarray(common.sum(axis=1)).ravel()
+    union = sizes[a] + sizes[b] - intersection
+    jaccard = np.divide(intersection, union, out=np.full(len(pairs), np.nan), where=union > 0)
+
+    # Rang maximal de chaque élément commun, puis poids W correspondant
+    common_ranks = ranks[a].maximum(ranks[b]).multiply(common).tocsr()
+    common_ranks.eliminate_zeros()
+    weights = rbo_weights(p, depth)
+    common_ranks = common_ranks.astype(np.float64)
+    common_ranks.data = weights[np.minimum(common_ranks.data.astype(np.int64), depth + 1)]
+    rbo = (1 - p) * np.asarray(common_ranks.sum(axis=1)).ravel()
+    rbo[union == 0] = np.nan
+
+    overlap = pairs[UNIT_COLUMNS].copy()
+    overlap.insert(0, 'level', level)
+    overlap['query_category'] = results['query_category'].to_numpy()[a]
+    overlap['model_a'] = pairs['model_name_a']
+    overlap['model_b'] = pairs['model_name_b']
+    overlap['size_a'] = sizes[a]
+    overlap['size_b'] = sizes[b]
+    overlap['intersection'] = intersection
+    overlap['jaccard'] = jaccard
+    overlap['rbo'] = rbo
+    return overlap
+
+
+def summarize_overlap(overlap):
+    """Moyennes de Jaccard et RBO par niveau et paire de modèles."""
+    return overlap.groupby(['level', 'model_a', 'model_b'], observed=True).agg(
+        pairs=('jaccard', 'size'),
+        mean_jaccard=('jaccard', 'mean'),
+        mean_rbo=('rbo', 'mean'),
+        mean_intersection=('intersection', 'mean'),
+    ).reset_index()
+
+
+def write_overlap(overlap, output_dir="analysis_exports", data_format="csv"):
+    """
+    Exporte le recouvrement par paire et son agrégat par paire de modèles.
+
+    Returns:
+        Chemin du fichier de recouvrement par paire
+    """
+    output_path = Path(output_dir)
+    output_path.mkdir(parents=True, exist_ok=True)
+    summary = summarize_overlap(overlap)
+
+    if data_format == "parquet":
+        parquet_dir = output_path / "parquet"
+        parquet_dir.mkdir(exist_ok=True)
+        overlap_file = parquet_dir / "source_overlap.parquet"
+        summary_file = parquet_dir / "source_overlap_summary.parquet"
+        overlap.to_parquet(overlap_file, index=False)
+        summary.to_parquet(summary_file, index=False)
+    else:
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        overlap_file = output_path / f"source_overlap_{timestamp}.csv"
+        summary_file = output_path / f"source_overlap_summary_{timestamp}.csv"
+        overlap.to_csv(overlap_file, index=False, encoding='utf-8')
+        summary.to_csv(summary_file, index=False, encoding='utf-8')
+
+    print(f"✅ Export recouvrement des sources: {overlap_file} ({len(overlap)} paires)")
+    print(f"✅ Export recouvrement agrégé: {summary_file}")
+    return overlap_file
+
+
+def export_overlap(df_sources, output_dir="analysis_exports", data_format="csv", levels=LEVELS,
+                   p=0.9, depth=10):
+    """Calcule le recouvrement pour chaque niveau et l'exporte (voir write_overlap)."""
+    overlap = pd.concat([compute_overlap(df_sources, level, p, depth) for level in levels], ignore_index=True)
+    return write_overlap(overlap, output_dir, data_format)
+
+
+def main():
+    from dataset_cache import load_dataset
+
+    parser = argparse.ArgumentParser(description="Recouvrement des sources citées entre modèles")
+    parser.add_argument("--level", choices=["domain", "url", "both"], default="both")
+    parser.add_argument("--p", type=float, default=0.9, help="Persistance du RBO (0 < p < 1)")
+    parser.add_argument("--depth", type=int, default=10, help="Profondeur de troncature du RBO")
+    parser.add_argument("--format", choices=["csv", "parquet"], default="csv")
+    parser.add_argument("--output-dir", default="analysis_exports")
+    args = parser.parse_args()
+
+    if not 0 < args.p < 1:
+        parser.error("--p doit être strictement compris entre 0 et 1")
+
+    dataset = load_dataset()
+    levels = LEVELS if args.level == "both" else (args.level,)
+    overlap = pd.concat(
+        [compute_overlap(dataset.sources, level, args.p, args.depth) for level in levels], ignore_index=True
+    )
+    write_overlap(overlap, args.output_dir, args.format)
+
+    print(f"\n📊 RECOUVREMENT MOYEN PAR PAIRE DE MODÈLES")
+    print(summarize_overlap(overlap).round(3).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
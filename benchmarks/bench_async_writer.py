@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Benchmark de la réactivité de la boucle asyncio pendant l'écriture des résultats.
+
+Des tâches concurrentes simulent les appels API (attente réseau) puis
+persistent chacune leurs résultats (hooks d'ingestion compris), soit par une
+session synchrone dans la boucle (ancien comportement), soit via
+AsyncResultWriter. Une tâche témoin mesure le retard de réveil de la boucle.
+
+Usage: python benchmarks/bench_async_writer.py [--tasks 20] [--rows 50]
+"""
+
+import argparse
+import asyncio
+import gc
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src import database
+from src.async_storage import AsyncResultWriter
+from src.config import StorageProfile
+from src.database import ExperimentResult
+
+TICK_SECONDS = 0.005
+
+
+def _make_result(task: int, i: int) -> ExperimentResult:
+    return ExperimentResult(
+        id=str(uuid.uuid4()),
+        experiment_id="bench",
+        session_id="bench",
+        query_id=f"q{task}",
+        query_text="benchmark",
+        query_category="bench",
+        iteration=i,
+        model_name=f"model-{task % 4}",
+        model_type="llm",
+        response_raw=f"réponse {task}-{i} " + "x" * 4000,
+        sources_extracted=[],
+        chain_of_thought="",
+        response_time_ms=100,
+        extra_metadata={},
+    )
+
+
+async def _ticker(lags: list, stop: asyncio.Event):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(TICK_SECONDS)
+        lags.append(time.perf_counter() - start - TICK_SECONDS)
+
+
+async def _scenario(mode: str, tasks: int, rows: int) -> dict:
+    writer = AsyncResultWriter()
+
+    async def worker(task: int):
+        for i in range(rows):
+            await asyncio.sleep(0.001)  # Attente réseau simulée
+            result = _make_result(task, i)
+            if mode == "writer":
+                await writer.write(result)
+            else:
+                with database.get_db_session() as session:
+                    database.persist_results(session, [result])
+
+    lags: list = []
+    stop = asyncio.Event()
+    ticker = asyncio.create_task(_ticker(lags, stop))
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(t) for t in range(tasks)))
+    await writer.close()
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await ticker
+    return {
+        "elapsed": elapsed,
+        "max_lag_ms": max(lags) * 1000,
+        "p50_lag_ms": statistics.median(lags) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tasks", type=int, default=20, help="Nombre de tâches concurrentes")
+    parser.add_argument("--rows", type=int, default=50, help="Résultats écrits par tâche")
+    parser.add_argument("--synchronous", default="FULL", help="Pragma synchronous (coût du commit)")
+    args = parser.parse_args()
+
+    total = args.tasks * args.rows
+    print(f"📊 {total} écritures, {args.tasks} tâches concurrentes")
+    for mode in ("sync", "writer"):
+        with tempfile.TemporaryDirectory() as tmp:
+            profile = StorageProfile(synchronous=args.synchronous)
+            database.initialize_database(f"sqlite:///{Path(tmp) / 'bench.db'}", profile)
+            gc.freeze()  # Comme ExperimentRunner.run
+            try:
+                stats = asyncio.run(_scenario(mode, args.tasks, args.rows))
+            finally:
+                gc.unfreeze()
+            database.engine.dispose()
+        label = "session synchrone" if mode == "sync" else "AsyncResultWriter"
+        print(
+            f"  {label:<18} {stats['elapsed']:6.2f}s  ({total / stats['elapsed']:7.0f} lignes/s)  "
+            f"retard boucle p50 {stats['p50_lag_ms']:6.2f} ms  max {stats['max_lag_ms']:7.2f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
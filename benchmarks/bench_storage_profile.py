@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Benchmark du profil de stockage SQLite (WAL, pragmas, index composites).
+
+Compare, sur deux copies de la base existante, la configuration SQLite par
+défaut et le profil de `StorageProfile` + migrations :
+- ingestion : un commit par résultat, comme dans ExperimentRunner
+- lecture : requêtes de filtrage/tri utilisées par les scripts d'analyse
+
+Usage: python benchmarks/bench_storage_profile.py [--db chemin.db] [--rows 500]
+"""
+
+import argparse
+import datetime
+import shutil
+import sys
+import tempfile
+import time
+import uuid
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from src.config import StorageProfile
+from src.database import ExperimentResult, create_storage_engine, run_migrations
+
+READ_QUERIES = {
+    "filtre exp/modèle/requête": """
+        SELECT id, iteration, response_time_ms FROM results
+        WHERE experiment_id = :exp AND model_name = :model AND query_id = :query
+        ORDER BY iteration
+    """,
+    "tri chronologique": """
+        SELECT id, model_name, timestamp FROM results
+        WHERE experiment_id = :exp ORDER BY timestamp
+    """,
+    "fenêtre temporelle": """
+        SELECT model_name, COUNT(*) FROM results
+        WHERE timestamp >= :since GROUP BY model_name
+    """,
+}
+
+
+def _make_result(sample: dict, i: int) -> ExperimentResult:
+    return ExperimentResult(
+        id=str(uuid.uuid4()),
+        experiment_id=sample["experiment_id"],
+        session_id="bench",
+        query_id=f"{sample['query_id']}_{i % 50}",
+        query_text=sample["query_text"],
+        query_category=sample["query_category"],
+        iteration=i,
+        model_name=sample["model_name"],
+        model_type="llm",
+        response_raw="x" * 2000,
+        sources_extracted=[],
+        chain_of_thought="",
+        response_time_ms=1000 + i,
+        extra_metadata={},
+    )
+
+
+def bench_ingest(engine, sample: dict, rows: int) -> float:
+    Session = sessionmaker(bind=engine)
+    start = time.perf_counter()
+    for i in range(rows):
+        with Session() as session:
+            session.add(_make_result(sample, i))
+            session.commit()
+    return time.perf_counter() - start
+
+
+def bench_reads(engine, sample: dict, repeat: int) -> dict:
+    params = {
+        "exp": sample["experiment_id"],
+        "model": sample["model_name"],
+        "query": sample["query_id"],
+        "since": (datetime.datetime.utcnow() - datetime.timedelta(days=30)).isoformat(" "),
+    }
+    timings = {}
+    with engine.connect() as connection:
+        for label, sql in READ_QUERIES.items():
+            start = time.perf_counter()
+            for _ in range(repeat):
+                connection.execute(text(sql), params).fetchall()
+            timings[label] = time.perf_counter() - start
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default="experiment_results/experiment_data.db")
+    parser.add_argument("--rows", type=int, default=500, help="Nombre de résultats insérés")
+    parser.add_argument("--repeat", type=int, default=200, help="Répétitions par requête de lecture")
+    args = parser.parse_args()
+
+    source = Path(args.db)
+    if not source.exists():
+        print(f"❌ Base de données {source} introuvable")
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        baseline_path = Path(tmp) / "baseline.db"
+        profiled_path = Path(tmp) / "profiled.db"
+        shutil.copy(source, baseline_path)
+        shutil.copy(source, profiled_path)
+
+        baseline = create_engine(f"sqlite:///{baseline_path}")
+        profiled = create_storage_engine(f"sqlite:///{profiled_path}", StorageProfile())
+        run_migrations(profiled)
+
+        with baseline.connect() as connection:
+            row = connection.execute(text(
+                "SELECT experiment_id, model_name, query_id, query_text, query_category "
+                "FROM results LIMIT 1"
+            )).mappings().first()
+        if row is None:
+            print("❌ Base vide, rien à mesurer")
+            return
+        sample = dict(row)
+
+        results = {}
+        for label, engine in (("défaut", baseline), ("profil", profiled)):
+            ingest = bench_ingest(engine, sample, args.rows)
+            reads = bench_reads(engine, sample, args.repeat)
+            results[label] = (ingest, reads)
+            engine.dispose()
+
+    print(f"\n📊 INGESTION ({args.rows} commits)")
+    for label, (ingest, _) in results.items():
+        print(f"  {label:<8} {ingest:8.3f}s  ({args.rows / ingest:8.0f} lignes/s)")
+    speedup = results["défaut"][0] / results["profil"][0]
+    print(f"  gain     x{speedup:.1f}")
+
+    print(f"\n📊 LECTURES ({args.repeat} répétitions)")
+    for query_label in READ_QUERIES:
+        base = results["défaut"][1][query_label]
+        prof = results["profil"][1][query_label]
+        print(f"  {query_label:<28} défaut {base:7.3f}s  profil {prof:7.3f}s  x{base / prof:.1f}")
+
+
+if __name__ == "__main__":
+    main()
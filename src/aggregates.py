@@ -0,0 +1,163 @@
+import datetime
+import math
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy.orm import Session, joinedload
+
+from src.database import ExperimentResult, ResultAggregate, register_ingest_hook
+from src.result_summary import is_error
+from src.url_utils import parse_sources
+
+GroupKey = Tuple[str, str, str, str]
+GROUP_COLUMNS = ('experiment_id', 'model_name', 'query_category', 'day')
+
+
+def _new_aggregate(key: GroupKey) -> ResultAggregate:
+    return ResultAggregate(
+        **dict(zip(GROUP_COLUMNS, key)),
+        results=0, with_sources=0, sources_total=0, errors=0,
+        latency_count=0, latency_sum=0.0, latency_sum_sq=0.0,
+        response_length_sum=0, response_length_sum_sq=0.0,
+    )
+
+
+def _summary_values(result: ExperimentResult) -> Tuple[int, bool]:
+    """
+    Longueur de la réponse et statut d'erreur, lus dans les colonnes de résumé (src/result_summary.py).
+
+    La réponse n'est décodée que si le résumé manque (base dont les colonnes
+    de résumé ne sont pas encore remplies).
+    """
+    if result.response_length is not None and result.is_error is not None:
+        return result.response_length, result.is_error
+    response = result.response_raw
+    return (len(response) if response else 0), is_error(response, result.extra_metadata)
+
+
+def observe(aggregate: ResultAggregate, result: ExperimentResult):
+    """Ajoute un résultat aux sommes de son groupe."""
+    sources = parse_sources(result.sources_extracted)
+    length, error = _summary_values(result)
+    aggregate.results += 1
+    aggregate.with_sources += bool(sources)
+    aggregate.sources_total += len(sources)
+    aggregate.errors += error
+    aggregate.response_length_sum += length
+    aggregate.response_length_sum_sq += float(length) ** 2
+    if result.response_time_ms is not None:
+        aggregate.latency_count += 1
+        aggregate.latency_sum += result.response_time_ms
+        aggregate.latency_sum_sq += float(result.response_time_ms) ** 2
+    if aggregate.first_timestamp is None or result.timestamp < aggregate.first_timestamp:
+        aggregate.first_timestamp = result.timestamp
+    if aggregate.last_timestamp is None or result.timestamp > aggregate.last_timestamp:
+        aggregate.last_timestamp = result.timestamp
+
+
+def _group_key(result: ExperimentResult) -> GroupKey:
+    return result.experiment_id, result.model_name, result.query_category, result.timestamp.date().isoformat()
+
+
+@register_ingest_hook
+def update_aggregates(session: Session, results: List[ExperimentResult]):
+    """Hook d'ingestion: ajoute les nouveaux résultats aux agrégats de leur groupe."""
+    aggregates: Dict[GroupKey, ResultAggregate] = {}
+    for result in results:
+        # Horodatage fixé ici pour que le jour agrégé soit celui enregistré
+        if result.timestamp is None:
+            result.timestamp = datetime.datetime.utcnow()
+        key = _group_key(result)
+        aggregate = aggregates.get(key)
+        if aggregate is None:
+            aggregate = session.get(ResultAggregate, key)
+            if aggregate is None:
+                aggregate = _new_aggregate(key)
+                session.add(aggregate)
+            aggregates[key] = aggregate
+        observe(aggregate, result)
+
+
+def rebuild_aggregates(session: Session, batch_size: int = 500) -> int:
+    """
+    Recalcule entièrement result_aggregates à partir de la table results.
+
+    Returns:
+        Nombre de résultats agrégés
+    """
+    session.query(ResultAggregate).delete(synchronize_session=False)
+    ids = [row[0] for row in session.query(ExperimentResult.id).order_by(ExperimentResult.id)]
+    query = session.query(ExperimentResult)
+    if session.query(ExperimentResult.id).filter(ExperimentResult.response_length.is_(None)).first() is not None:
+        # Résumés incomplets: les réponses seront décodées, blobs chargés avec les résultats
+        query = query.options(joinedload(ExperimentResult.response_blob))
+    aggregates: Dict[GroupKey, ResultAggregate] = {}
+    for start in range(0, len(ids), batch_size):
+        batch = query.filter(ExperimentResult.id.in_(ids[start:start + batch_size]))
+        for result in batch:
+            key = _group_key(result)
+            if key not in aggregates:
+                aggregates[key] = _new_aggregate(key)
+            observe(aggregates[key], result)
+        session.expunge_all()
+    session.add_all(aggregates.values())
+    session.commit()
+    return len(ids)
+
+
+def _std(count: int, total: float, total_sq: float) -> Optional[float]:
+    if count < 2:
+        return None
+    return math.sqrt(max(total_sq - total * total / count, 0.0) / (count - 1))
+
+
+def summarize(session: Session, group_by: Sequence[str] = ('model_name',),
+              experiment_id: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Synthèse des agrégats regroupés selon `group_by` (sous-ensemble de GROUP_COLUMNS).
+
+    Les sommes sont additionnées par groupe: le coût dépend du nombre de
+    groupes agrégés, pas du nombre de résultats.
+
+    Returns:
+        Liste de dicts: colonnes de groupe, effectifs, part avec sources,
+        sources moyennes, erreurs, latence moyenne / écart-type, longueur moyenne
+    """
+    group_by = list(group_by)
+    unknown = set(group_by) - set(GROUP_COLUMNS)
+    if unknown:
+        raise ValueError(f"Colonnes de regroupement inconnues: {', '.join(sorted(unknown))}")
+    query = session.query(ResultAggregate)
+    if experiment_id:
+        query = query.filter(ResultAggregate.experiment_id == experiment_id)
+
+    sums: Dict[Tuple, Dict[str, Any]] = {}
+    for aggregate in query:
+        key = tuple(getattr(aggregate, column) for column in group_by)
+        total = sums.setdefault(key, {
+            'results': 0, 'with_sources': 0, 'sources_total': 0, 'errors': 0, 'latency_count': 0,
+            'latency_sum': 0.0, 'latency_sum_sq': 0.0, 'response_length_sum': 0,
+            'first_timestamp': aggregate.first_timestamp, 'last_timestamp': aggregate.last_timestamp,
+        })
+        for field in ('results', 'with_sources', 'sources_total', 'errors', 'latency_count',
+                      'latency_sum', 'latency_sum_sq', 'response_length_sum'):
+            total[field] += getattr(aggregate, field)
+        total['first_timestamp'] = min(total['first_timestamp'], aggregate.first_timestamp)
+        total['last_timestamp'] = max(total['last_timestamp'], aggregate.last_timestamp)
+
+    report = []
+    for key, total in sorted(sums.items()):
+        count, latency_count = total['results'], total['latency_count']
+        report.append({
+            **dict(zip(group_by, key)),
+            'results': count,
+            'with_sources': total['with_sources'],
+            'share_with_sources': total['with_sources'] / count,
+            'sources_mean': total['sources_total'] / count,
+            'errors': total['errors'],
+            'latency_mean': total['latency_sum'] / latency_count if latency_count else None,
+            'latency_std': _std(latency_count, total['latency_sum'], total['latency_sum_sq']),
+            'response_length_mean': total['response_length_sum'] / count,
+            'first_timestamp': total['first_timestamp'],
+            'last_timestamp': total['last_timestamp'],
+        })
+    return report
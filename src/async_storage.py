@@ -0,0 +1,115 @@
+import asyncio
+import logging
+import queue
+import threading
+import time
+from typing import Callable, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from src.database import ExperimentResult, get_db_session, persist_results
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class AsyncResultWriter:
+    """
+    Écrit les résultats dans un thread dédié pour ne jamais bloquer la boucle asyncio.
+
+    Les coroutines déposent les résultats dans une file; le thread écrivain les
+    regroupe par lots (une transaction par lot) et résout les futures associées
+    une fois le commit effectué. En cas d'échec d'un lot, les résultats sont
+    réessayés un par un afin qu'une ligne invalide n'entraîne pas les autres.
+
+    Avec max_delay_seconds, le thread attend jusqu'à ce délai après le
+    premier résultat d'un lot pour le compléter: des résultats produits un
+    à un (runner séquentiel) sont tout de même regroupés en une transaction.
+    """
+
+    def __init__(self, session_factory: Callable[[], Session] = get_db_session,
+                 batch_size: int = 50, max_queue_size: int = 10000, max_delay_seconds: float = 0.0):
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.max_delay_seconds = max_delay_seconds
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_queue_size)
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="result-writer", daemon=True)
+            self._thread.start()
+
+    def submit(self, result: ExperimentResult) -> asyncio.Future:
+        """Met un résultat en file et retourne une future résolue après son commit."""
+        self.start()
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._queue.put_nowait((result, future, loop))
+        return future
+
+    async def write(self, result: ExperimentResult):
+        """Persiste un résultat et attend son commit sans bloquer la boucle."""
+        await self.submit(result)
+
+    async def close(self):
+        """Vide la file, attend la fin des écritures et arrête le thread."""
+        if self._thread is None:
+            return
+        self._queue.put(_STOP)
+        await asyncio.to_thread(self._thread.join)
+        self._thread = None
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                return
+            batch = [item]
+            stop = False
+            deadline = time.monotonic() + self.max_delay_seconds
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stop = True
+                    break
+                batch.append(item)
+            self._commit(batch)
+            if stop:
+                return
+
+    def _commit(self, batch: List[Tuple[ExperimentResult, asyncio.Future, asyncio.AbstractEventLoop]]):
+        # Le flush retire le texte en attente (blob résolu dans la session): conservé pour la reprise
+        responses = [result.__dict__.get('_pending_response') for result, _, _ in batch]
+        try:
+            with self.session_factory() as session:
+                persist_results(session, [result for result, _, _ in batch])
+            for _, future, loop in batch:
+                loop.call_soon_threadsafe(_resolve, future, None)
+            return
+        except Exception as e:
+            if len(batch) == 1:
+                result, future, loop = batch[0]
+                logger.error(f"[ERREUR] Écriture du résultat {result.id} impossible: {str(e)[:100]}...")
+                loop.call_soon_threadsafe(_resolve, future, e)
+                return
+        for entry, response in zip(batch, responses):
+            if response is not None:
+                # Blob de la session annulée abandonné: la réponse est de nouveau internée à la reprise
+                entry[0].response_blob = None
+                entry[0].response_raw = response
+            self._commit([entry])
+
+
+def _resolve(future: asyncio.Future, error: Optional[Exception]):
+    if future.done():
+        return
+    if error is None:
+        future.set_result(None)
+    else:
+        future.set_exception(error)
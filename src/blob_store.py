@@ -0,0 +1,118 @@
+import sqlite3
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from src import compression
+from src.database import ExperimentResult, ResponseBlob, CompressionDictionary, intern_response
+
+
+def compact_inline_responses(session: Session, batch_size: int = 500) -> int:
+    """
+    Déplace les réponses encore stockées dans results.response_raw vers response_blobs.
+
+    Le traitement se fait par lots (un commit par lot) pour borner la mémoire.
+
+    Returns:
+        Nombre de résultats migrés
+    """
+    migrated = 0
+    while True:
+        batch = (
+            session.query(ExperimentResult)
+            .filter(ExperimentResult._response_inline.isnot(None))
+            .limit(batch_size)
+            .all()
+        )
+        if not batch:
+            return migrated
+        for result in batch:
+            body = result._response_inline.encode('utf-8')
+            result.response_blob = intern_response(session, body, result.model_name)
+            result._response_inline = None
+        session.commit()
+        migrated += len(batch)
+
+
+def train_provider_dictionary(session: Session, provider: str, sample_size: int = 200,
+                              dict_size: int = 32768) -> Optional[CompressionDictionary]:
+    """
+    Entraîne un dictionnaire zlib sur les dernières réponses d'un fournisseur.
+
+    Les réponses écrites ensuite pour ce fournisseur (model_name) sont
+    compressées avec ce dictionnaire; les blobs existants restent lisibles
+    avec celui qui leur est associé.
+
+    Returns:
+        Le dictionnaire enregistré, ou None si aucun échantillon n'est disponible
+    """
+    results = (
+        session.query(ExperimentResult)
+        .filter(ExperimentResult.model_name == provider)
+        .order_by(ExperimentResult.timestamp.desc())
+        .limit(sample_size)
+        .all()
+    )
+    samples = [r.response_raw.encode('utf-8') for r in results if r.response_raw]
+    if not samples:
+        return None
+
+    dictionary = CompressionDictionary(
+        provider=provider,
+        body=compression.train_dictionary(samples, size=dict_size),
+        sample_count=len(samples),
+    )
+    session.add(dictionary)
+    session.commit()
+    return dictionary
+
+
+def storage_report(session: Session) -> Dict[str, int]:
+    """Volumes bruts et compressés des blobs, et nombre de références."""
+    blobs, raw_size, stored_size = session.query(
+        func.count(ResponseBlob.hash),
+        func.coalesce(func.sum(ResponseBlob.raw_size), 0),
+        func.coalesce(func.sum(ResponseBlob.stored_size), 0),
+    ).one()
+    references = session.query(func.count(ExperimentResult.id)).filter(ExperimentResult.response_hash.isnot(None)).scalar()
+    inline = session.query(func.count(ExperimentResult.id)).filter(ExperimentResult._response_inline.isnot(None)).scalar()
+    return {
+        'blobs': blobs,
+        'references': references,
+        'inline': inline,
+        'raw_bytes': raw_size,
+        'stored_bytes': stored_size,
+    }
+
+
+def prepare_sqlite_connection(conn: sqlite3.Connection, alias: str = "r", schema: str = "main") -> Tuple[str, str]:
+    """
+    Prépare une connexion sqlite3 brute à lire response_raw de façon transparente.
+
+    Enregistre la fonction SQL `geo_inflate(body, codec, dict)` et renvoie
+    l'expression de colonne et les jointures à insérer dans la requête.
+    Sur une base sans table response_blobs, la colonne historique est utilisée telle quelle.
+    `schema` désigne une base attachée (partitions, voir src/partitions.py).
+
+    Returns:
+        (expression SQL de response_raw, clause de jointure)
+    """
+    has_blobs = conn.execute(
+        f"SELECT 1 FROM {schema}.sqlite_master WHERE type = 'table' AND name = 'response_blobs'"
+    ).fetchone()
+    if not has_blobs:
+        return f"{alias}.response_raw", ""
+
+    def geo_inflate(body, codec, zdict):
+        if body is None:
+            return None
+        return compression.decompress(body, codec, zdict).decode('utf-8')
+
+    conn.create_function("geo_inflate", 3, geo_inflate, deterministic=True)
+    expression = f"COALESCE({alias}.response_raw, geo_inflate(rb.body, rb.codec, rd.body))"
+    joins = (
+        f"LEFT JOIN {schema}.response_blobs rb ON rb.hash = {alias}.response_hash "
+        f"LEFT JOIN {schema}.compression_dictionaries rd ON rd.id = rb.dict_id"
+    )
+    return expression, joins
@@ -1,12 +1,11 @@
 import time
-import json
 import os
 from typing import Dict, Any, List
 import aiohttp
 
 from .base_client import BaseClient
 from src.config import ModelConfig
-from src.utils import async_retry, is_retryable_error, APIConnectionError
+from src.utils import async_retry, is_retryable_error, read_raw_json, APIConnectionError
 
 class GoogleSearchClient(BaseClient):
     BASE_URL = "https://www.googleapis.com/customsearch/v1"
@@ -41,14 +40,14 @@ class GoogleSearchClient(BaseClient):
                         raise APIConnectionError(f"Erreur serveur Google ({response.status})")
                     
                     response.raise_for_status()
-                    data = await response.json()
+                    raw = await read_raw_json(response)
                     
                     return {
-                        'response_raw': json.dumps(data, indent=2),
-                        'sources_extracted': self._extract_sources(data),
+                        'response_raw': raw.body,
+                        'sources_extracted': self._extract_sources(raw.data),
                         'chain_of_thought': "",
                         'metadata': {
-                            **data.get("searchInformation", {}),
+                            **raw.get("searchInformation", {}),
                             "session_id": session_id,
                             "query": text
                         }
@@ -124,14 +123,14 @@ class BingSearchClient(BaseClient):
                         raise APIConnectionError(f"Erreur serveur Bing ({response.status})")
                     
                     response.raise_for_status()
-                    data = await response.json()
+                    raw = await read_raw_json(response)
                     
                     return {
-                        'response_raw': json.dumps(data, indent=2),
-                        'sources_extracted': self._extract_sources(data),
+                        'response_raw': raw.body,
+                        'sources_extracted': self._extract_sources(raw.data),
                         'chain_of_thought': "",
                         'metadata': {
-                            "totalEstimatedMatches": data.get("webPages", {}).get("totalEstimatedMatches", 0),
+                            "totalEstimatedMatches": raw.get("webPages", {}).get("totalEstimatedMatches", 0),
                             "session_id": session_id,
                             "query": text
                         }
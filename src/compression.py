@@ -0,0 +1,69 @@
+import hashlib
+import re
+import zlib
+from collections import Counter
+from typing import Iterable, Optional
+
+CODEC_ZLIB = "zlib"
+CODEC_ZLIB_DICT = "zlib+dict"
+
+# Fragments récurrents des réponses: clés JSON, URLs, mots
+_FRAGMENT_PATTERN = re.compile(rb'"[^"\\]{1,48}"\s*:\s*|[A-Za-z0-9_#./:?=&%-]{4,64}')
+
+
+def content_hash(body: bytes) -> str:
+    """Empreinte SHA-256 du contenu non compressé (clé des blobs)."""
+    return hashlib.sha256(body).hexdigest()
+
+
+def compress(body: bytes, zdict: Optional[bytes] = None, level: int = 6) -> bytes:
+    if zdict:
+        compressor = zlib.compressobj(level, zdict=zdict)
+    else:
+        compressor = zlib.compressobj(level)
+    return compressor.compress(body) + compressor.flush()
+
+
+def decompress(payload: bytes, codec: str, zdict: Optional[bytes] = None) -> bytes:
+    if codec == CODEC_ZLIB:
+        return zlib.decompress(payload)
+    if codec == CODEC_ZLIB_DICT:
+        if zdict is None:
+            raise ValueError("Dictionnaire de compression manquant pour un blob 'zlib+dict'.")
+        decompressor = zlib.decompressobj(zdict=zdict)
+        return decompressor.decompress(payload) + decompressor.flush()
+    raise ValueError(f"Codec de compression inconnu '{codec}'.")
+
+
+def train_dictionary(samples: Iterable[bytes], size: int = 32768) -> bytes:
+    """
+    Construit un dictionnaire prédéfini zlib à partir d'échantillons.
+
+    Les fragments présents dans le plus grand nombre d'échantillons sont
+    retenus, pondérés par leur longueur, jusqu'à atteindre `size` octets.
+    Les plus rentables sont placés en fin de dictionnaire, là où zlib les
+    référence au moindre coût.
+
+    Args:
+        samples: Corps de réponses représentatifs d'un fournisseur
+        size: Taille maximale du dictionnaire (zlib n'exploite que 32 Kio)
+
+    Returns:
+        Dictionnaire prêt à passer en `zdict`
+    """
+    document_frequency: Counter = Counter()
+    for sample in samples:
+        document_frequency.update(set(_FRAGMENT_PATTERN.findall(sample)))
+
+    scored = sorted(
+        ((count * len(fragment), fragment) for fragment, count in document_frequency.items() if count > 1),
+        reverse=True,
+    )
+    selected = []
+    total = 0
+    for _, fragment in scored:
+        if total + len(fragment) > size:
+            continue
+        selected.append(fragment)
+        total += len(fragment)
+    return b"".join(reversed(selected))
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field, FilePath
-from typing import List, Dict, Any, Optional, Union
+from typing import List, Dict, Any, Optional, Union, Literal
 from pathlib import Path
 
 
@@ -33,6 +33,28 @@ class ModelConfig(BaseModel):
     search_engine_id_env_var: Optional[str] = None
     parameters: ModelParameters = Field(default_factory=ModelParameters)
 
+class StorageProfile(BaseModel):
+    """Réglages de performance SQLite appliqués à chaque connexion."""
+    journal_mode: Literal["WAL", "DELETE", "TRUNCATE", "PERSIST", "MEMORY", "OFF"] = "WAL"
+    synchronous: Literal["OFF", "NORMAL", "FULL", "EXTRA"] = "NORMAL"
+    mmap_size: int = 268435456  # 256 Mo mappés en mémoire
+    cache_size: int = -65536  # Valeur négative = taille en Kio (64 Mo)
+    busy_timeout_ms: int = 5000
+    temp_store: Literal["DEFAULT", "FILE", "MEMORY"] = "MEMORY"
+    pool_size: int = 5
+    max_overflow: int = 10
+
+class ParameterSweep(BaseModel):
+    """Grille de paramètres croisée avec les modèles visés (tous les modèles actifs si models est vide)."""
+    models: List[str] = Field(default_factory=list)
+    parameters: Dict[str, List[Any]] = Field(..., description="Valeurs essayées par paramètre de ModelParameters")
+
+class PlanSpec(BaseModel):
+    """Plan de travail: balayages de paramètres, échantillonnage et ordre des requêtes (voir plan.py)."""
+    seed: Optional[int] = None  # Graine de l'ordre et de l'échantillon (tirée et journalisée si absente)
+    sample_per_category: Optional[int] = None  # Requêtes tirées par catégorie (toutes si absent)
+    sweeps: List[ParameterSweep] = Field(default_factory=list)
+
 class ExperimentConfig(BaseModel):
     experiment_name: str
     duration_days: int = 14
@@ -41,6 +63,8 @@ class ExperimentConfig(BaseModel):
     randomize_query_order: bool = True
     use_different_sessions: bool = True
     database_url: str = "sqlite:///experiment_results/experiment_data.db"
+    storage: StorageProfile = Field(default_factory=StorageProfile)
+    plan: PlanSpec = Field(default_factory=PlanSpec)
     
     models: List[ModelConfig]
     queries: List[QueryConfig]
@@ -54,7 +78,8 @@ class ExperimentConfig(BaseModel):
             data = yaml.safe_load(f)
         
         # Si un fichier de requêtes externe est spécifié, l'utiliser
+        # (instances déjà validées par le chargeur: transmises telles quelles, sans conversion en dict)
         if queries_file:
-            data['queries'] = [query.dict() for query in QueryLoader.load_queries(path, queries_file)]
+            data['queries'] = QueryLoader.load_queries(path, queries_file)
         
         return cls(**data)
\ No newline at end of file
@@ -1,12 +1,55 @@
 import datetime
-from sqlalchemy import create_engine, Column, String, DateTime, Integer, Text, JSON
-from sqlalchemy.orm import sessionmaker, declarative_base
-from typing import Dict, Any, Optional
+import importlib
+from sqlalchemy import (
+    create_engine, event, inspect, Column, String, DateTime, Integer, Float, Boolean, Text, JSON, LargeBinary,
+    ForeignKey, Index, Table, MetaData, UniqueConstraint
+)
+from sqlalchemy.engine import Engine, Connection, make_url
+from sqlalchemy.orm import sessionmaker, declarative_base, relationship, Session
+from sqlalchemy.pool import QueuePool
+from typing import Dict, Any, Optional, List, Tuple, Callable, Union
+
+from src.config import StorageProfile
+from src import compression
 
 Base = declarative_base()
 
+class CompressionDictionary(Base):
+    __tablename__ = 'compression_dictionaries'
+
+    id: int = Column(Integer, primary_key=True, autoincrement=True)
+    provider: str = Column(String, nullable=False, index=True)
+    body: bytes = Column(LargeBinary, nullable=False)
+    sample_count: int = Column(Integer)
+    created_at: datetime.datetime = Column(DateTime, default=datetime.datetime.utcnow)
+
+class ResponseBlob(Base):
+    __tablename__ = 'response_blobs'
+
+    hash: str = Column(String, primary_key=True)
+    codec: str = Column(String, nullable=False)
+    dict_id: Optional[int] = Column(Integer, ForeignKey('compression_dictionaries.id'))
+    raw_size: int = Column(Integer, nullable=False)
+    stored_size: int = Column(Integer, nullable=False)
+    body: bytes = Column(LargeBinary, nullable=False)
+    created_at: datetime.datetime = Column(DateTime, default=datetime.datetime.utcnow)
+
+    dictionary = relationship(CompressionDictionary, lazy="joined")
+
+    def decode(self) -> bytes:
+        zdict = self.dictionary.body if self.dictionary is not None else None
+        return compression.decompress(self.body, self.codec, zdict)
+
 class ExperimentResult(Base):
     __tablename__ = 'results'
+    __table_args__ = (
+        # Index composites correspondant aux filtres/tris des scripts d'analyse
+        Index('ix_results_exp_model_query_iter', 'experiment_id', 'model_name', 'query_id', 'iteration'),
+        Index('ix_results_exp_timestamp', 'experiment_id', 'timestamp'),
+        Index('ix_results_timestamp', 'timestamp'),
+        Index('ix_results_exp_error', 'experiment_id', 'is_error', 'error_class'),
+        Index('ix_results_exp_sources', 'experiment_id', 'sources_count'),
+    )
 
     id: str = Column(String, primary_key=True)
     experiment_id: str = Column(String, nullable=False, index=True)
@@ -17,23 +60,432 @@ class ExperimentResult(Base):
     iteration: int = Column(Integer, nullable=False)
     model_name: str = Column(String, nullable=False, index=True)
     model_type: str = Column(String, nullable=False)
-    response_raw: str = Column(Text)
+    # Colonne historique: les nouvelles réponses sont stockées dans response_blobs
+    _response_inline: Optional[str] = Column('response_raw', Text)
+    response_hash: Optional[str] = Column(String, ForeignKey('response_blobs.hash'), index=True)
     sources_extracted: Dict[str, Any] = Column(JSON)
     chain_of_thought: Optional[str] = Column(Text)
     response_time_ms: int = Column(Integer)
     timestamp: datetime.datetime = Column(DateTime, default=datetime.datetime.utcnow)
     extra_metadata: Dict[str, Any] = Column(JSON)
+    # Signature MinHash de la réponse (voir src/minhash.py)
+    response_minhash: Optional[bytes] = Column(LargeBinary)
+    # Résumé du résultat calculé à l'écriture (voir src/result_summary.py)
+    sources_count: Optional[int] = Column(Integer)
+    response_length: Optional[int] = Column(Integer)
+    is_error: Optional[bool] = Column(Boolean)
+    error_class: Optional[str] = Column(String)
+    input_tokens: Optional[int] = Column(Integer)
+    output_tokens: Optional[int] = Column(Integer)
+
+    response_blob = relationship(ResponseBlob, lazy="select")
+
+    @property
+    def response_raw(self) -> Optional[str]:
+        pending = getattr(self, '_pending_response', None)
+        if pending is not None:
+            return pending.decode('utf-8') if isinstance(pending, bytes) else pending
+        if self._response_inline is not None:
+            return self._response_inline
+        if self.response_blob is not None:
+            return self.response_blob.decode().decode('utf-8')
+        return None
+
+    @response_raw.setter
+    def response_raw(self, value: Optional[Union[str, bytes]]):
+        # Le blob est résolu au flush (voir _intern_pending_responses)
+        self._pending_response = value
+        self._response_inline = None
+        if value is None:
+            self.response_hash = None
+            self.response_blob = None
+
+class StabilityStat(Base):
+    """
+    Statistiques de stabilité cumulées par (expérience, requête, modèle).
+
+    Tenues à jour à chaque écriture de résultats (voir src/stability.py):
+    moyenne et somme des carrés des écarts (Welford) du nombre de sources,
+    de la latence et du renouvellement des sources d'une itération à l'autre.
+    """
+    __tablename__ = 'stability_stats'
+
+    experiment_id: str = Column(String, primary_key=True)
+    query_id: str = Column(String, primary_key=True)
+    model_name: str = Column(String, primary_key=True)
+    observations: int = Column(Integer, nullable=False, default=0)
+    sources_mean: float = Column(Float, nullable=False, default=0.0)
+    sources_m2: float = Column(Float, nullable=False, default=0.0)
+    latency_count: int = Column(Integer, nullable=False, default=0)
+    latency_mean: float = Column(Float, nullable=False, default=0.0)
+    latency_m2: float = Column(Float, nullable=False, default=0.0)
+    churn_count: int = Column(Integer, nullable=False, default=0)
+    churn_mean: float = Column(Float, nullable=False, default=0.0)
+    churn_m2: float = Column(Float, nullable=False, default=0.0)
+    last_sources: List[str] = Column(JSON)
+    last_iteration: Optional[int] = Column(Integer)
+    updated_at: datetime.datetime = Column(DateTime, default=datetime.datetime.utcnow)
+
+class MinHashBucket(Base):
+    """Index LSH: un seau par bande de la signature MinHash de chaque résultat."""
+    __tablename__ = 'minhash_buckets'
+    __table_args__ = {'sqlite_with_rowid': False}
+
+    band: int = Column(Integer, primary_key=True)
+    bucket: int = Column(Integer, primary_key=True)
+    result_id: str = Column(String, ForeignKey('results.id'), primary_key=True)
+
+class SourceTerm(Base):
+    """Dictionnaire de l'index inversé: URLs canoniques et domaines cités."""
+    __tablename__ = 'source_terms'
+    __table_args__ = (UniqueConstraint('kind', 'value', name='uq_source_terms_kind_value'),)
+
+    id: int = Column(Integer, primary_key=True, autoincrement=True)
+    kind: str = Column(String, nullable=False)  # 'url' ou 'domain'
+    value: str = Column(String, nullable=False)
+
+class SourcePosting(Base):
+    """Listes de postings: résultats citant chaque terme (contiguës par term_id)."""
+    __tablename__ = 'source_postings'
+    __table_args__ = {'sqlite_with_rowid': False}
+
+    term_id: int = Column(Integer, ForeignKey('source_terms.id'), primary_key=True)
+    result_id: str = Column(String, ForeignKey('results.id'), primary_key=True)
+    position: int = Column(Integer, nullable=False)  # Rang de la première citation
+
+    term = relationship(SourceTerm)
+
+class ResultAggregate(Base):
+    """
+    Agrégats des résultats par (expérience, modèle, catégorie, jour).
+
+    Tenus à jour dans la transaction de chaque écriture (voir src/aggregates.py):
+    les vues de synthèse lisent une ligne par groupe au lieu de parcourir results.
+    """
+    __tablename__ = 'result_aggregates'
+
+    experiment_id: str = Column(String, primary_key=True)
+    model_name: str = Column(String, primary_key=True)
+    query_category: str = Column(String, primary_key=True)
+    day: str = Column(String, primary_key=True)  # AAAA-MM-JJ (UTC)
+    results: int = Column(Integer, nullable=False, default=0)
+    with_sources: int = Column(Integer, nullable=False, default=0)
+    sources_total: int = Column(Integer, nullable=False, default=0)
+    errors: int = Column(Integer, nullable=False, default=0)
+    latency_count: int = Column(Integer, nullable=False, default=0)
+    latency_sum: float = Column(Float, nullable=False, default=0.0)
+    latency_sum_sq: float = Column(Float, nullable=False, default=0.0)
+    response_length_sum: int = Column(Integer, nullable=False, default=0)
+    response_length_sum_sq: float = Column(Float, nullable=False, default=0.0)
+    first_timestamp: Optional[datetime.datetime] = Column(DateTime)
+    last_timestamp: Optional[datetime.datetime] = Column(DateTime)
+
+class ResultSketch(Base):
+    """
+    Résumés approximatifs par (expérience, modèle, requête), fusionnables (voir src/sketches.py).
+
+    HyperLogLog des URLs et domaines distincts, DDSketch des latences et
+    count-min des citations par domaine: les vues approximatives lisent une
+    ligne par groupe, quel que soit le nombre de sources.
+    """
+    __tablename__ = 'result_sketches'
+
+    experiment_id: str = Column(String, primary_key=True)
+    model_name: str = Column(String, primary_key=True)
+    query_id: str = Column(String, primary_key=True)
+    results: int = Column(Integer, nullable=False, default=0)
+    hll_urls: bytes = Column(LargeBinary, nullable=False)
+    hll_domains: bytes = Column(LargeBinary, nullable=False)
+    latency: bytes = Column(LargeBinary, nullable=False)
+    domains_cms: bytes = Column(LargeBinary, nullable=False)
+    top_domains: Dict[str, int] = Column(JSON)  # Candidats des domaines les plus cités et leur estimation
+    updated_at: datetime.datetime = Column(DateTime, default=datetime.datetime.utcnow)
+
+# Table de suivi des migrations appliquées (hors ORM, gérée par run_migrations)
+schema_migrations = Table(
+    'schema_migrations', MetaData(),
+    Column('name', String, primary_key=True),
+    Column('applied_at', DateTime, default=datetime.datetime.utcnow),
+)
 
 engine = None
 SessionLocal = None
 
-def initialize_database(db_url: str):
+
+def _install_sqlite_pragmas(target: Engine, profile: StorageProfile):
+    """Applique le profil de stockage à chaque nouvelle connexion SQLite."""
+    @event.listens_for(target, "connect")
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f"PRAGMA journal_mode={profile.journal_mode}")
+        cursor.execute(f"PRAGMA synchronous={profile.synchronous}")
+        cursor.execute(f"PRAGMA mmap_size={int(profile.mmap_size)}")
+        cursor.execute(f"PRAGMA cache_size={int(profile.cache_size)}")
+        cursor.execute(f"PRAGMA busy_timeout={int(profile.busy_timeout_ms)}")
+        cursor.execute(f"PRAGMA temp_store={profile.temp_store}")
+        cursor.close()
+
+
+def create_storage_engine(db_url: str, profile: Optional[StorageProfile] = None) -> Engine:
+    """
+    Crée un moteur SQLAlchemy configuré selon le profil de stockage.
+
+    Pour SQLite fichier, les connexions sont mutualisées (QueuePool) et les
+    pragmas du profil sont appliqués à l'ouverture de chaque connexion.
+
+    Args:
+        db_url: URL SQLAlchemy de la base
+        profile: Profil de performance (défaut: StorageProfile())
+
+    Returns:
+        Moteur SQLAlchemy prêt à l'emploi
+    """
+    profile = profile or StorageProfile()
+    url = make_url(db_url)
+    if url.get_backend_name() != "sqlite":
+        return create_engine(db_url)
+
+    if url.database in (None, "", ":memory:"):
+        return create_engine(db_url, connect_args={"check_same_thread": False})
+
+    new_engine = create_engine(
+        db_url,
+        connect_args={"check_same_thread": False, "timeout": profile.busy_timeout_ms / 1000},
+        poolclass=QueuePool,
+        pool_size=profile.pool_size,
+        max_overflow=profile.max_overflow,
+    )
+    _install_sqlite_pragmas(new_engine, profile)
+    return new_engine
+
+
+def _latest_dictionary(session: Session, provider: str) -> Optional[CompressionDictionary]:
+    cache = session.info.setdefault('compression_dictionaries', {})
+    if provider not in cache:
+        cache[provider] = (
+            session.query(CompressionDictionary)
+            .filter(CompressionDictionary.provider == provider)
+            .order_by(CompressionDictionary.id.desc())
+            .first()
+        )
+    return cache[provider]
+
+
+def intern_response(session: Session, body: bytes, provider: str) -> ResponseBlob:
+    """
+    Retourne le blob correspondant à `body`, en le créant s'il n'existe pas.
+
+    Les blobs sont adressés par le hash du contenu non compressé: une réponse
+    identique à une réponse déjà stockée n'est pas réécrite.
+    """
+    digest = compression.content_hash(body)
+    pending_blobs = session.info.setdefault('pending_blobs', {})
+    blob = pending_blobs.get(digest) or session.get(ResponseBlob, digest)
+    if blob is not None:
+        return blob
+
+    dictionary = _latest_dictionary(session, provider)
+    if dictionary is not None:
+        payload = compression.compress(body, zdict=dictionary.body)
+        codec = compression.CODEC_ZLIB_DICT
+    else:
+        payload = compression.compress(body)
+        codec = compression.CODEC_ZLIB
+    blob = ResponseBlob(
+        hash=digest,
+        codec=codec,
+        dictionary=dictionary,
+        raw_size=len(body),
+        stored_size=len(payload),
+        body=payload,
+    )
+    session.add(blob)
+    pending_blobs[digest] = blob
+    return blob
+
+
+@event.listens_for(Session, "before_flush")
+def _intern_pending_responses(session: Session, flush_context, instances):
+    for obj in list(session.new) + list(session.dirty):
+        if not isinstance(obj, ExperimentResult):
+            continue
+        pending = obj.__dict__.pop('_pending_response', None)
+        if pending is None:
+            continue
+        body = pending if isinstance(pending, bytes) else pending.encode('utf-8')
+        obj.response_blob = intern_response(session, body, obj.model_name)
+
+
+@event.listens_for(Session, "after_flush_postexec")
+def _reset_blob_caches(session: Session, flush_context):
+    session.info.pop('pending_blobs', None)
+    session.info.pop('compression_dictionaries', None)
+
+
+def _add_column_if_missing(connection: Connection, table: Table, column_name: str):
+    existing = {column['name'] for column in inspect(connection).get_columns(table.name)}
+    if column_name in existing:
+        return
+    column = table.c[column_name]
+    column_type = column.type.compile(dialect=connection.dialect)
+    connection.exec_driver_sql(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}")
+
+
+def _add_missing_columns(connection: Connection, table: Table):
+    # Les migrations qui chargent des objets complets ont besoin de toutes les colonnes du modèle
+    for column in table.columns:
+        _add_column_if_missing(connection, table, column.name)
+
+
+def _create_indexes(connection: Connection, table: Table, names: List[str]):
+    for index in table.indexes:
+        if index.name in names:
+            index.create(bind=connection, checkfirst=True)
+
+
+def _migration_composite_indexes(connection: Connection):
+    _create_indexes(connection, ExperimentResult.__table__, [
+        'ix_results_exp_model_query_iter', 'ix_results_exp_timestamp', 'ix_results_timestamp',
+    ])
+    if connection.dialect.name == "sqlite":
+        connection.exec_driver_sql("ANALYZE results")
+
+
+def _migration_response_blobs(connection: Connection):
+    _add_column_if_missing(connection, ExperimentResult.__table__, 'response_hash')
+    _create_indexes(connection, ExperimentResult.__table__, ['ix_results_response_hash'])
+
+
+def _migration_stability_stats(connection: Connection):
+    from src.stability import rebuild_stability
+
+    StabilityStat.__table__.create(bind=connection, checkfirst=True)
+    with Session(bind=connection) as session:
+        rebuild_stability(session)
+
+
+def _migration_minhash(connection: Connection):
+    from src.minhash import rebuild_minhash
+
+    _add_missing_columns(connection, ExperimentResult.__table__)
+    MinHashBucket.__table__.create(bind=connection, checkfirst=True)
+    with Session(bind=connection) as session:
+        rebuild_minhash(session)
+
+
+def _migration_source_index(connection: Connection):
+    from src.source_index import rebuild_source_index
+
+    SourceTerm.__table__.create(bind=connection, checkfirst=True)
+    SourcePosting.__table__.create(bind=connection, checkfirst=True)
+    with Session(bind=connection) as session:
+        rebuild_source_index(session)
+
+
+def _migration_fulltext(connection: Connection):
+    from src.fulltext import create_fulltext_table, fulltext_available, rebuild_fulltext
+
+    if not fulltext_available(connection):
+        return
+    create_fulltext_table(connection)
+    with Session(bind=connection) as session:
+        rebuild_fulltext(session)
+
+
+def _migration_result_aggregates(connection: Connection):
+    from src.aggregates import rebuild_aggregates
+
+    ResultAggregate.__table__.create(bind=connection, checkfirst=True)
+    with Session(bind=connection) as session:
+        rebuild_aggregates(session)
+
+
+def _migration_summary_columns(connection: Connection):
+    from src.result_summary import backfill_summary_columns
+
+    _add_missing_columns(connection, ExperimentResult.__table__)
+    _create_indexes(connection, ExperimentResult.__table__, ['ix_results_exp_error', 'ix_results_exp_sources'])
+    with Session(bind=connection) as session:
+        backfill_summary_columns(session)
+
+
+def _migration_result_sketches(connection: Connection):
+    from src.sketches import rebuild_sketches
+
+    ResultSketch.__table__.create(bind=connection, checkfirst=True)
+    with Session(bind=connection) as session:
+        rebuild_sketches(session)
+
+
+# Migrations idempotentes, appliquées dans l'ordre et enregistrées dans schema_migrations
+MIGRATIONS: List[Tuple[str, Callable[[Connection], None]]] = [
+    ("0001_composite_indexes", _migration_composite_indexes),
+    ("0002_response_blobs", _migration_response_blobs),
+    ("0003_stability_stats", _migration_stability_stats),
+    ("0004_minhash", _migration_minhash),
+    ("0005_source_index", _migration_source_index),
+    ("0006_fulltext", _migration_fulltext),
+    ("0007_result_aggregates", _migration_result_aggregates),
+    ("0008_summary_columns", _migration_summary_columns),
+    ("0009_result_sketches", _migration_result_sketches),
+]
+
+# Fonctions appelées avec (session, résultats) dans la transaction de persist_results
+INGEST_HOOKS: List[Callable[[Session, List[ExperimentResult]], None]] = []
+# Modules qui enregistrent leurs hooks à l'import
+INGEST_MODULES = ["src.result_summary", "src.stability", "src.minhash", "src.source_index", "src.fulltext",
+                  "src.aggregates", "src.sketches"]
+
+
+def register_ingest_hook(hook: Callable[[Session, List[ExperimentResult]], None]):
+    """Enregistre une fonction de mise à jour exécutée à chaque écriture de résultats."""
+    if hook not in INGEST_HOOKS:
+        INGEST_HOOKS.append(hook)
+    return hook
+
+
+def load_ingest_hooks():
+    for module in INGEST_MODULES:
+        importlib.import_module(module)
+
+
+def run_migrations(target: Engine) -> List[str]:
+    """
+    Applique les migrations non encore enregistrées sur la base.
+
+    Returns:
+        Noms des migrations appliquées lors de cet appel
+    """
+    schema_migrations.create(bind=target, checkfirst=True)
+    applied = []
+    with target.begin() as connection:
+        done = {row[0] for row in connection.execute(schema_migrations.select().with_only_columns(schema_migrations.c.name))}
+    for name, migration in MIGRATIONS:
+        if name in done:
+            continue
+        with target.begin() as connection:
+            migration(connection)
+            connection.execute(schema_migrations.insert().values(name=name, applied_at=datetime.datetime.utcnow()))
+        applied.append(name)
+    return applied
+
+
+def initialize_database(db_url: str, profile: Optional[StorageProfile] = None):
     global engine, SessionLocal
-    engine = create_engine(db_url, connect_args={"check_same_thread": False})
+    engine = create_storage_engine(db_url, profile)
     Base.metadata.create_all(bind=engine)
+    load_ingest_hooks()
+    run_migrations(engine)
     SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+def persist_results(session: Session, results: List[ExperimentResult]):
+    """Ajoute et valide des résultats dans une même transaction, hooks d'ingestion compris."""
+    session.add_all(results)
+    for hook in INGEST_HOOKS:
+        hook(session, results)
+    session.commit()
+
 def get_db_session():
     if not SessionLocal:
         raise Exception("Database not initialized.")
-    return SessionLocal()
\ No newline at end of file
+    return SessionLocal()
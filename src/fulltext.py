@@ -0,0 +1,159 @@
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from src.database import ExperimentResult, register_ingest_hook
+
+FTS_TABLE = 'response_fts'
+FTS_COLUMNS = ('response', 'chain_of_thought')
+# Accents ignorés ("sante" trouve "santé"), index de préfixes pour les requêtes "vaccin*"
+FTS_TOKENIZER = "unicode61 remove_diacritics 2"
+FTS_PREFIXES = "2 3 4"
+SNIPPET_TOKENS = 16
+
+
+def fulltext_available(bind) -> bool:
+    """L'index plein texte n'existe que sur SQLite (module FTS5)."""
+    return bind.dialect.name == "sqlite"
+
+
+def create_fulltext_table(connection: Connection):
+    """Crée la table virtuelle FTS5 (le texte y est recopié: les réponses sont stockées compressées)."""
+    connection.exec_driver_sql(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+        f"result_id UNINDEXED, {', '.join(FTS_COLUMNS)}, "
+        f"tokenize='{FTS_TOKENIZER}', prefix='{FTS_PREFIXES}')"
+    )
+
+
+def index_results(session: Session, rows: Iterable[Tuple[str, Optional[str], Optional[str]]]):
+    """Ajoute (result_id, réponse, chaîne de raisonnement) à l'index plein texte."""
+    params = [
+        {'result_id': result_id, 'response': response, 'chain_of_thought': chain_of_thought}
+        for result_id, response, chain_of_thought in rows
+        if response or chain_of_thought
+    ]
+    if params:
+        session.execute(text(
+            f"INSERT INTO {FTS_TABLE} (result_id, response, chain_of_thought) "
+            f"VALUES (:result_id, :response, :chain_of_thought)"
+        ), params)
+
+
+@register_ingest_hook
+def update_fulltext(session: Session, results: List[ExperimentResult]):
+    """Hook d'ingestion: indexe le texte des nouveaux résultats."""
+    if not fulltext_available(session.get_bind()):
+        return
+    index_results(session, [(result.id, result.response_raw, result.chain_of_thought) for result in results])
+
+
+def rebuild_fulltext(session: Session, batch_size: int = 500) -> int:
+    """
+    Reconstruit entièrement l'index plein texte (un commit par lot de résultats).
+
+    Returns:
+        Nombre de résultats indexés
+    """
+    session.execute(text(f"DELETE FROM {FTS_TABLE}"))
+    session.commit()
+    ids = [row[0] for row in session.query(ExperimentResult.id).order_by(ExperimentResult.id)]
+    for start in range(0, len(ids), batch_size):
+        batch = session.query(ExperimentResult).filter(ExperimentResult.id.in_(ids[start:start + batch_size])).all()
+        index_results(session, [(result.id, result.response_raw, result.chain_of_thought) for result in batch])
+        session.commit()
+        session.expunge_all()
+    session.execute(text(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('optimize')"))
+    session.commit()
+    return len(ids)
+
+
+def phrase_query(value: str) -> str:
+    """Expression FTS5 cherchant `value` comme une phrase exacte (guillemets échappés)."""
+    return '"' + value.replace('"', '""') + '"'
+
+
+def _match_expression(match: str, column: Optional[str]) -> str:
+    if column is None:
+        return match
+    if column not in FTS_COLUMNS:
+        raise ValueError(f"Colonne inconnue: {column} (attendu: {', '.join(FTS_COLUMNS)})")
+    return f"{{{column}}} : ({match})"
+
+
+def _filters(experiment_id: Optional[str], model_name: Optional[str]) -> Tuple[str, Dict[str, Any]]:
+    conditions, params = [], {}
+    if experiment_id:
+        conditions.append("r.experiment_id = :experiment_id")
+        params['experiment_id'] = experiment_id
+    if model_name:
+        conditions.append("r.model_name = :model_name")
+        params['model_name'] = model_name
+    return "".join(f" AND {condition}" for condition in conditions), params
+
+
+def search(session: Session, match: str, experiment_id: Optional[str] = None, model_name: Optional[str] = None,
+           column: Optional[str] = None, limit: Optional[int] = 20,
+           snippet_tokens: int = SNIPPET_TOKENS) -> List[Dict[str, Any]]:
+    """
+    Recherche plein texte dans les réponses et chaînes de raisonnement.
+
+    Args:
+        match: Expression FTS5: mots (ET implicite), phrase "selon l'OMS",
+            préfixe vaccin*, opérateurs AND / OR / NOT, NEAR(a b, 5)
+        experiment_id: Limiter à une expérience
+        model_name: Limiter à un modèle
+        column: Limiter à 'response' ou 'chain_of_thought'
+        limit: Nombre maximal de résultats (None = tous)
+        snippet_tokens: Longueur des extraits, en mots
+
+    Returns:
+        Liste de dicts (résultat, requête, modèle, itération, score bm25, extrait),
+        du plus pertinent au moins pertinent
+    """
+    where, params = _filters(experiment_id, model_name)
+    params.update({'match': _match_expression(match, column), 'tokens': snippet_tokens})
+    sql = f"""
+        SELECT r.id, r.experiment_id, r.query_id, r.model_name, r.iteration, r.timestamp, f.rank,
+               snippet({FTS_TABLE}, -1, '[', ']', '…', :tokens)
+        FROM {FTS_TABLE} f
+        JOIN results r ON r.id = f.result_id
+        WHERE {FTS_TABLE} MATCH :match{where}
+        ORDER BY f.rank
+    """
+    if limit is not None:
+        sql += " LIMIT :limit"
+        params['limit'] = limit
+    return [
+        {
+            'result_id': result_id, 'experiment_id': experiment, 'query_id': query_id, 'model_name': model,
+            'iteration': iteration, 'timestamp': timestamp, 'score': -rank, 'snippet': snippet,
+        }
+        for result_id, experiment, query_id, model, iteration, timestamp, rank, snippet
+        in session.execute(text(sql), params)
+    ]
+
+
+def count_matches(session: Session, match: str, experiment_id: Optional[str] = None,
+                  column: Optional[str] = None) -> List[Tuple[str, int, int]]:
+    """
+    Nombre de réponses correspondant à l'expression, par modèle.
+
+    Returns:
+        Liste de tuples (modèle, réponses correspondantes, réponses totales)
+    """
+    where, params = _filters(experiment_id, None)
+    rows = session.execute(text(f"""
+        SELECT r.model_name, COUNT(*)
+        FROM {FTS_TABLE} f
+        JOIN results r ON r.id = f.result_id
+        WHERE {FTS_TABLE} MATCH :match{where}
+        GROUP BY r.model_name
+    """), {**params, 'match': _match_expression(match, column)})
+    matches = dict(rows.all())
+    totals = session.execute(text(
+        f"SELECT r.model_name, COUNT(*) FROM results r WHERE 1 = 1{where} GROUP BY r.model_name"
+    ), params)
+    return [(model, matches.get(model, 0), total) for model, total in sorted(totals)]
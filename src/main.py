@@ -22,7 +22,7 @@ def run(
         config = ExperimentConfig.from_yaml(str(config_path), queries_file=queries_file)
         db_path = Path(config.database_url.replace("sqlite:///", ""))
         db_path.parent.mkdir(parents=True, exist_ok=True)
-        initialize_database(config.database_url)
+        initialize_database(config.database_url, config.storage)
         runner = ExperimentRunner(config)
         asyncio.run(runner.run())
     except Exception as e:
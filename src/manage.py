@@ -0,0 +1,423 @@
+import typer
+from pathlib import Path
+from typing import List
+from dotenv import load_dotenv
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import OperationalError
+
+# Charger les variables d'environnement
+load_dotenv()
+
+from src.config import ExperimentConfig
+from src import database
+from src import blob_store
+from src import stability
+from src import minhash
+from src import source_index
+from src import fulltext
+from src import aggregates
+from src import result_summary
+from src import partitions
+from src import snapshots
+from src import merge
+from src import sketches
+
+app = typer.Typer(help="Commandes de maintenance de la base de résultats.")
+
+
+@app.callback()
+def main():
+    """Commandes de maintenance de la base de résultats."""
+
+
+def _load_config(config_path: Path) -> ExperimentConfig:
+    config = ExperimentConfig.from_yaml(str(config_path))
+    db_path = Path(config.database_url.replace("sqlite:///", ""))
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    return config
+
+
+def _open_session(config_path: Path):
+    config = _load_config(config_path)
+    database.initialize_database(config.database_url, config.storage)
+    return database.get_db_session()
+
+
+def _sqlite_path(config: ExperimentConfig) -> Path:
+    url = make_url(config.database_url)
+    if url.get_backend_name() != "sqlite" or url.database in (None, "", ":memory:"):
+        typer.secho("[ERREUR] Commande réservée aux bases SQLite fichier", fg=typer.colors.RED)
+        raise typer.Exit(code=1)
+    return Path(url.database)
+
+
+def _print_storage_report(report):
+    ratio = report['raw_bytes'] / report['stored_bytes'] if report['stored_bytes'] else 0
+    typer.echo(f"Blobs: {report['blobs']} pour {report['references']} résultats ({report['inline']} encore en ligne)")
+    typer.echo(f"Volume: {report['raw_bytes']} octets bruts -> {report['stored_bytes']} octets stockés (x{ratio:.1f})")
+
+
+@app.command()
+def migrate(
+    config_path: Path = typer.Option("src/config.yaml", "--config", "-c", exists=True)
+):
+    """Crée les tables manquantes et applique les migrations en attente."""
+    config = _load_config(config_path)
+    engine = database.create_storage_engine(config.database_url, config.storage)
+    database.Base.metadata.create_all(bind=engine)
+    applied = database.run_migrations(engine)
+    for name in applied:
+        typer.secho(f"[OK] Migration appliquée: {name}", fg=typer.colors.GREEN)
+    if not applied:
+        typer.echo("Base déjà à jour.")
+
+
+
+@app.command("compact-responses")
+def compact_responses(
+    config_path: Path = typer.Option("src/config.yaml", "--config", "-c", exists=True),
+    batch_size: int = typer.Option(500, help="Nombre de résultats migrés par transaction")
+):
+    """Déplace les réponses historiques vers le stockage compressé et dédupliqué."""
+    with _open_session(config_path) as session:
+        migrated = blob_store.compact_inline_responses(session, batch_size=batch_size)
+        typer.secho(f"[OK] {migrated} réponses migrées vers response_blobs", fg=typer.colors.GREEN)
+        _print_storage_report(blob_store.storage_report(session))
+    typer.echo("Exécutez VACUUM pour restituer l'espace libéré au système de fichiers.")
+
+
+@app.command("train-dictionary")
+def train_dictionary(
+    provider: str = typer.Argument(..., help="Nom du modèle (model_name) ciblé"),
+    config_path: Path = typer.Option("src/config.yaml", "--config", "-c", exists=True),
+    samples: int = typer.Option(200, help="Nombre de réponses récentes utilisées"),
+    size: int = typer.Option(32768, help="Taille maximale du dictionnaire en octets")
+):
+    """Entraîne un dictionnaire de compression pour les prochaines réponses d'un modèle."""
+    with _open_session(config_path) as session:
+        dictionary = blob_store.train_provider_dictionary(session, provider, sample_size=samples, dict_size=size)
+        if dictionary is None:
+            typer.secho(f"Aucune réponse disponible pour '{provider}'.", fg=typer.colors.RED)
+            raise typer.Exit(code=1)
+        typer.secho(
+            f"[OK] Dictionnaire #{dictionary.id} ({len(dictionary.body)} octets, "
+            f"{dictionary.sample_count} échantillons) pour {provider}",
+            fg=typer.colors.GREEN,
+        )
+
+
+@app.command("backfill-summary")
+def backfill_summary(
+    config_path: Path = typer.Option("src/config.yaml", "--config", "-c", exists=True),
+    batch_size: int = typer.Option(500, help="Nombre de résultats traités par transaction"),
+    recompute: bool = typer.Option(False, "--all", help="Recalculer aussi les résultats déjà résumés")
+):
+    """Remplit les colonnes de résumé (sources, longueur, erreurs, jetons) des résultats existants."""
+    with _open_session(config_path) as session:
+        count = result_summary.backfill_summary_columns(session, batch_size=batch_size, only_missing=not recompute)
+        typer.secho(f"[OK] Colonnes de résumé calculées pour {count} résultats", fg=typer.colors.GREEN)
+
+
+@app.command("rebuild-stability")
+def rebuild_stability(
+    config_path: Path = typer.Option("src/config.yaml", "--config", "-c", exists=True)
+):
+    """Recalcule les statistiques de stabilité à partir de tous les résultats."""
+    with _open_session(config_path) as session:
+        count = stability.rebuild_stability(session)
+        typer.secho(f"[OK] Statistiques de stabilité recalculées sur {count} résultats", fg=typer.colors.GREEN)
+
+
+@app.command("stability")
+def stability_report(
+    config_path: Path = typer.Option("src/config.yaml", "--config", "-c", exists=True),
+    experiment: str = typer.Option(None, "--experiment", "-e", help="Filtrer sur une expérience")
+):
+    """Affiche la stabilité temporelle par requête et modèle (lecture de stability_stats)."""
+    def fmt(value, pattern="{:.2f}"):
+        return pattern.format(value) if value is not None else "-"
+
+    with _open_session(config_path) as session:
+        rows = stability.stability_report(session, experiment)
+    typer.echo(f"{'Requête':<24} {'Modèle':<24} {'N':>4} {'Sources':>8} {'CV':>6} {'Latence ms':>11} {'Churn':>6}")
+    for row in rows:
+        typer.echo(
+            f"{row['query_id'][:24]:<24} {row['model_name'][:24]:<24} {row['observations']:>4} "
+            f"{fmt(row['sources_mean']):>8} {fmt(row['sources_cv']):>6} "
+            f"{fmt(row['latency_mean'], '{:.0f}'):>11} {fmt(row['churn_mean']):>6}"
+        )
+
+
+@app.command("rebuild-minhash")
+def rebuild_minhash(
+    config_path: Path = typer.Option("src/config.yaml", "--config", "-c", exists=True),
+    batch_size: int = typer.Option(200, help="Nombre de résultats indexés par transaction")
+):
+    """Recalcule les signatures MinHash des réponses et l'index LSH."""
+    with _open_session(config_path) as session:
+        count = minhash.rebuild_minhash(session, batch_size=batch_size)
+        typer.secho(f"[OK] {count} réponses indexées (MinHash/LSH)", fg=typer.colors.GREEN)
+
+
+@app.command("near-duplicates")
+def near_duplicates(
+    config_path: Path = typer.Option("src/config.yaml", "--config", "-c", exists=True),
+    threshold: float = typer.Option(0.9, help="Similarité de Jaccard estimée minimale"),
+    experiment: str = typer.Option(None, "--experiment", "-e", help="Filtrer sur une expérience"),
+    clusters: bool = typer.Option(False, "--clusters", help="Afficher les groupes de réponses quasi identiques")
+):
+    """Part des itérations ayant une réponse quasi identique, par requête et modèle."""
+    with _open_session(config_path) as session:
+        if clusters:
+            groups = [group for group in minhash.near_duplicate_clusters(session, threshold, experiment) if len(group) > 1]
+            typer.echo(f"{len(groups)} groupes de réponses quasi identiques (>= {threshold})")
+            for group in groups:
+                typer.echo(f"  {len(group):>4} réponses: {', '.join(group[:3])}{', ...' if len(group) > 3 else ''}")
+            return
+        rows = minhash.iteration_stability(session, threshold, experiment)
+    typer.echo(f"{'Requête':<24} {'Modèle':<24} {'Réponses':>8} {'Quasi-copies':>12} {'Part':>6}")
+    for row in rows:
+        typer.echo(
+            f"{row['query_id'][:24]:<24} {row['model_name'][:24]:<24} {row['responses']:>8} "
+            f"{row['near_duplicates']:>12} {row['share']:>6.0%}"
+        )
+
+
+@app.command("rebuild-source-index")
+def rebuild_source_index(
+    config_path: Path = typer.Option("src/config.yaml", "--config", "-c", exists=True),
+    batch_size: int = typer.Option(1000, help="Nombre de résultats indexés par transaction")
+):
+    """Reconstruit l'index inversé des URLs et domaines cités."""
+    with _open_session(config_path) as session:
+        count = source_index.rebuild_source_index(session, batch_size=batch_size)
+        typer.secho(f"[OK] Sources de {count} résultats indexées", fg=typer.colors.GREEN)
+
+
+@app.command("lookup-source")
+def lookup_source(
+    value: str = typer.Argument(..., help="URL ou domaine cité (ex: who.int)"),
+    config_path: Path = typer.Option("src/config.yaml", "--config", "-c", exists=True),
+    kind: str = typer.Option(None, help="'url' ou 'domain' (déduit de la valeur par défaut)"),
+    experiment: str = typer.Option(None, "--experiment", "-e", help="Filtrer sur une expérience"),
+    model: str = typer.Option(None, "--model", "-m", help="Filtrer sur un modèle"),
+    subdomains: bool = typer.Option(False, "--subdomains", help="Inclure les sous-domaines"),
+    by: str = typer.Option("model_name", help="Regroupement: model_name, query_id, day ou none")
+):
+    """Quels modèles citent une URL ou un domaine, pour quelles requêtes et quand."""
+    if kind not in (None, *source_index.KINDS):
+        raise typer.BadParameter("kind doit valoir 'url' ou 'domain'")
+    with _open_session(config_path) as session:
+        occurrences = source_index.lookup(session, value, kind, experiment, model, subdomains)
+    kind, term = source_index.normalise_term(value, kind)
+    typer.echo(f"{len(occurrences)} citations de {kind} '{term}'")
+    if by == "none":
+        for row in occurrences:
+            typer.echo(
+                f"  {row['timestamp']}  {row['model_name']:<24} {row['query_id']:<24} "
+                f"it.{row['iteration']:<3} rang {row['position']:<3} {row['term']}"
+            )
+        return
+    for key, count in source_index.summarize_occurrences(occurrences, by):
+        typer.echo(f"  {str(key):<40} {count:>6}")
+
+
+@app.command("rebuild-fulltext")
+def rebuild_fulltext(
+    config_path: Path = typer.Option("src/config.yaml", "--config", "-c", exists=True),
+    batch_size: int = typer.Option(500, help="Nombre de résultats indexés par transaction")
+):
+    """Reconstruit l'index plein texte des réponses (FTS5)."""
+    with _open_session(config_path) as session:
+        if not fulltext.fulltext_available(session.get_bind()):
+            typer.secho("[ERREUR] L'index plein texte nécessite SQLite (FTS5)", fg=typer.colors.RED)
+            raise typer.Exit(code=1)
+        count = fulltext.rebuild_fulltext(session, batch_size=batch_size)
+        typer.secho(f"[OK] Texte de {count} résultats indexé", fg=typer.colors.GREEN)
+
+
+@app.command("search")
+def search(
+    match: str = typer.Argument(..., help="Expression FTS5 (ex: '\"selon l'OMS\"', 'vaccin*', 'OMS NOT grippe')"),
+    config_path: Path = typer.Option("src/config.yaml", "--config", "-c", exists=True),
+    experiment: str = typer.Option(None, "--experiment", "-e", help="Filtrer sur une expérience"),
+    model: str = typer.Option(None, "--model", "-m", help="Filtrer sur un modèle"),
+    column: str = typer.Option(None, help="Limiter à 'response' ou 'chain_of_thought'"),
+    phrase: bool = typer.Option(False, "--phrase", help="Chercher le texte saisi comme une phrase exacte"),
+    limit: int = typer.Option(20, help="Nombre maximal de réponses affichées"),
+    count: bool = typer.Option(False, "--count", help="Afficher seulement le nombre de réponses par modèle")
+):
+    """Recherche des mentions dans les réponses stockées (phrase, préfixe, booléen)."""
+    if column not in (None, *fulltext.FTS_COLUMNS):
+        raise typer.BadParameter("column doit valoir 'response' ou 'chain_of_thought'")
+    if phrase:
+        match = fulltext.phrase_query(match)
+    with _open_session(config_path) as session:
+        try:
+            if count:
+                for model_name, matches, total in fulltext.count_matches(session, match, experiment, column):
+                    typer.echo(f"  {model_name:<24} {matches:>6} / {total:<6} {matches / total:>6.1%}")
+                return
+            hits = fulltext.search(session, match, experiment, model, column, limit)
+        except OperationalError as error:
+            typer.secho(f"[ERREUR] Expression de recherche invalide: {error.orig}", fg=typer.colors.RED)
+            raise typer.Exit(code=1)
+    typer.echo(f"{len(hits)} réponses (max {limit})")
+    for hit in hits:
+        typer.echo(f"  {hit['model_name']:<24} {hit['query_id']:<24} it.{hit['iteration']:<3} {hit['score']:>6.2f}")
+        typer.echo(f"      {' '.join(hit['snippet'].split())}")
+
+
+@app.command("rebuild-aggregates")
+def rebuild_aggregates(
+    config_path: Path = typer.Option("src/config.yaml", "--config", "-c", exists=True)
+):
+    """Recalcule les agrégats par expérience, modèle, catégorie et jour."""
+    with _open_session(config_path) as session:
+        count = aggregates.rebuild_aggregates(session)
+        typer.secho(f"[OK] {count} résultats agrégés", fg=typer.colors.GREEN)
+
+
+@app.command("rebuild-sketches")
+def rebuild_sketches(
+    config_path: Path = typer.Option("src/config.yaml", "--config", "-c", exists=True)
+):
+    """Recalcule les résumés approximatifs (HyperLogLog, DDSketch, count-min) par expérience, modèle et requête."""
+    with _open_session(config_path) as session:
+        count = sketches.rebuild_sketches(session)
+        typer.secho(f"[OK] {count} résultats résumés", fg=typer.colors.GREEN)
+
+
+def _fmt(value, pattern="{:.0f}"):
+    return pattern.format(value) if value is not None else "-"
+
+
+def _print_approx_summary(report, by: List[str]):
+    label = " / ".join(by)
+    typer.echo(
+        f"{label[:40]:<40} {'réponses':>8} {'~urls':>7} {'~domaines':>9} {'~lat.p50':>9} {'~lat.p90':>9} "
+        f"{'~lat.p99':>9}  domaines les plus cités"
+    )
+    for row in report:
+        key = " / ".join(str(row[column]) for column in by)
+        top = ", ".join(f"{domain} ({count})" for domain, count in row['top_domains'])
+        typer.echo(
+            f"{key[:40]:<40} {row['results']:>8} {row['distinct_urls']:>7} {row['distinct_domains']:>9} "
+            f"{_fmt(row['latency_p50']):>9} {_fmt(row['latency_p90']):>9} {_fmt(row['latency_p99']):>9}  {top}"
+        )
+
+
+@app.command("summary")
+def summary(
+    config_path: Path = typer.Option("src/config.yaml", "--config", "-c", exists=True),
+    by: List[str] = typer.Option(["model_name"], "--by",
+                                 help="experiment_id, model_name, query_category ou day (--approx: query_id)"),
+    experiment: str = typer.Option(None, "--experiment", "-e", help="Filtrer sur une expérience"),
+    approx: bool = typer.Option(False, "--approx",
+                                help="URLs et domaines distincts, percentiles de latence et domaines les plus cités, "
+                                     "estimés à partir des résumés (HyperLogLog, DDSketch, count-min)")
+):
+    """Synthèse par groupe lue dans les agrégats (sans parcourir les résultats)."""
+    try:
+        with _open_session(config_path) as session:
+            if approx:
+                report = sketches.approx_summary(session, by, experiment)
+            else:
+                report = aggregates.summarize(session, by, experiment)
+    except ValueError as error:
+        raise typer.BadParameter(str(error))
+    if approx:
+        _print_approx_summary(report, by)
+        return
+
+    label = " / ".join(by)
+    typer.echo(f"{label[:40]:<40} {'réponses':>8} {'sources':>8} {'erreurs':>8} {'lat.moy':>9} {'lat.σ':>9} {'long.moy':>9}")
+    for row in report:
+        key = " / ".join(str(row[column]) for column in by)
+        typer.echo(
+            f"{key[:40]:<40} {row['results']:>8} {_fmt(row['share_with_sources'], '{:.0%}'):>8} {row['errors']:>8} "
+            f"{_fmt(row['latency_mean']):>9} {_fmt(row['latency_std']):>9} {_fmt(row['response_length_mean']):>9}"
+        )
+
+
+@app.command("archive")
+def archive(
+    config_path: Path = typer.Option("src/config.yaml", "--config", "-c", exists=True),
+    before: str = typer.Option(None, help="Archiver les mois antérieurs à AAAA-MM (défaut: mois courant)"),
+    vacuum: bool = typer.Option(False, "--vacuum", help="Compacter la base active après archivage")
+):
+    """Déplace les mois clos dans des partitions SQLite (une par mois) et met à jour le manifeste."""
+    db_path = _sqlite_path(_load_config(config_path))
+    months = partitions.closed_months(db_path, before)
+    if not months:
+        typer.echo("Aucun mois clos à archiver.")
+        return
+    for month in months:
+        entry = partitions.archive_month(db_path, month)
+        typer.secho(f"[OK] {month}: {entry['rows']} résultats dans {entry['file']}", fg=typer.colors.GREEN)
+    if vacuum:
+        partitions.vacuum_database(db_path)
+        typer.secho("[OK] Base active compactée", fg=typer.colors.GREEN)
+
+
+@app.command("partitions")
+def list_partitions(
+    config_path: Path = typer.Option("src/config.yaml", "--config", "-c", exists=True)
+):
+    """Liste les partitions archivées (manifeste)."""
+    db_path = _sqlite_path(_load_config(config_path))
+    entries = partitions.read_manifest(db_path)['partitions']
+    if not entries:
+        typer.echo("Aucune partition.")
+        return
+    typer.echo(f"{'mois':<8} {'fichier':<22} {'résultats':>9} {'sessions':>8}  période")
+    for month, entry in sorted(entries.items()):
+        typer.echo(
+            f"{month:<8} {entry['file']:<22} {entry['rows']:>9} {entry['sessions']:>8}  "
+            f"{entry['start']} → {entry['end']}"
+        )
+
+
+@app.command("snapshot")
+def snapshot(
+    config_path: Path = typer.Option("src/config.yaml", "--config", "-c", exists=True),
+    output: Path = typer.Option(None, "--output", "-o", help="Fichier de l'instantané (défaut: <base>.snapshot.db)"),
+    full: bool = typer.Option(False, "--full", help="Copie complète (après compact-responses ou backfill-summary --all)")
+):
+    """Met à jour un instantané cohérent de la base, lisible pendant qu'une campagne écrit."""
+    db_path = _sqlite_path(_load_config(config_path))
+    report = snapshots.refresh_snapshot(db_path, output, full=full)
+    added = report['rows'].get('results', 0)
+    label = "copie complète" if report['mode'] == 'full' else "ajout incrémental"
+    typer.secho(
+        f"[OK] {report['path']}: {label}, {added} résultats en {report['seconds']:.2f} s", fg=typer.colors.GREEN
+    )
+
+
+@app.command("merge")
+def merge_sources(
+    sources: List[Path] = typer.Argument(..., exists=True, dir_okay=False, help="Bases de résultats à fusionner"),
+    config_path: Path = typer.Option("src/config.yaml", "--config", "-c", exists=True),
+    batch_size: int = typer.Option(1000, "--batch-size", help="Résultats copiés par transaction")
+):
+    """Fusionne des bases de résultats (autres machines, shards) dans la base configurée."""
+    db_path = _sqlite_path(_load_config(config_path))
+    try:
+        reports = merge.merge_databases(db_path, sources, batch_size)
+    except ValueError as e:
+        typer.secho(f"[ERREUR] {e}", fg=typer.colors.RED)
+        raise typer.Exit(code=1)
+    for report in reports:
+        typer.secho(
+            f"[OK] {report['source']}: {report['inserted']} ajoutés, {report['duplicates']} déjà présents "
+            f"sur {report['rows']} (checksum {report['checksum']})", fg=typer.colors.GREEN
+        )
+        if report['conflicts']:
+            typer.secho(
+                f"[ERREUR] {report['conflicts']} résultats de même id au contenu différent (version cible conservée): "
+                f"{', '.join(report['conflict_ids'])}", fg=typer.colors.RED
+            )
+
+
+if __name__ == "__main__":
+    app()
@@ -0,0 +1,342 @@
+import hashlib
+import json
+import sqlite3
+from pathlib import Path
+from typing import Any, Dict, List, Sequence, Union
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from src.compression import content_hash
+from src.database import MIGRATIONS, Base, run_migrations
+from src.fulltext import FTS_TABLE
+from src.partitions import partition_dir, read_manifest
+from src.sketches import update_sketches_sqlite
+from src.snapshots import BUSY_TIMEOUT_MS, read_only_uri
+from src.stability import rebuild_stability
+
+# Colonnes comparées entre source et cible (la réponse par son empreinte de contenu)
+CHECKSUM_COLUMNS = ('experiment_id', 'session_id', 'query_id', 'iteration', 'model_name', 'timestamp',
+                    'sources_extracted', 'chain_of_thought', 'response_time_ms')
+MAX_REPORTED_CONFLICTS = 20
+ARCHIVED_INSERT_BATCH = 1000
+
+PathLike = Union[str, Path]
+
+
+def _columns(conn: sqlite3.Connection, schema: str, table: str) -> List[str]:
+    return [row[1] for row in conn.execute(f"PRAGMA {schema}.table_info({table})")]
+
+
+def _prepare_target(target_path: PathLike):
+    """Crée ou met à jour le schéma de la base cible (migrations comprises)."""
+    engine = create_engine(f"sqlite:///{target_path}")
+    try:
+        Base.metadata.create_all(bind=engine)
+        run_migrations(engine)
+    finally:
+        engine.dispose()
+
+
+def _check_source(conn: sqlite3.Connection, source_path: PathLike):
+    """Une source doit être au schéma courant: ses index dérivés sont recopiés tels quels."""
+    has_migrations = conn.execute(
+        "SELECT 1 FROM src.sqlite_master WHERE type = 'table' AND name = 'schema_migrations'"
+    ).fetchone()
+    done = {row[0] for row in conn.execute("SELECT name FROM src.schema_migrations")} if has_migrations else set()
+    missing = [name for name, _ in MIGRATIONS if name not in done]
+    if missing:
+        raise ValueError(
+            f"{source_path}: migrations manquantes ({', '.join(missing)}), "
+            f"lancer `python -m src.manage migrate` sur cette base avant la fusion"
+        )
+
+
+def _map_dictionaries(conn: sqlite3.Connection) -> int:
+    """
+    Table temporaire merge_dictionaries (id source -> id cible) des dictionnaires de compression.
+
+    Un dictionnaire identique (même fournisseur, même contenu) est réutilisé,
+    les autres sont ajoutés à la cible sous un nouvel identifiant.
+
+    Returns:
+        Nombre de dictionnaires ajoutés
+    """
+    conn.execute("DELETE FROM temp.merge_dictionaries")
+    added = 0
+    for source_id, provider, body, sample_count, created_at in conn.execute(
+        "SELECT id, provider, body, sample_count, created_at FROM src.compression_dictionaries"
+    ).fetchall():
+        row = conn.execute(
+            "SELECT id FROM main.compression_dictionaries WHERE provider = ? AND body = ?", (provider, body)
+        ).fetchone()
+        if row is None:
+            target_id = conn.execute(
+                "INSERT INTO main.compression_dictionaries (provider, body, sample_count, created_at) "
+                "VALUES (?, ?, ?, ?)", (provider, body, sample_count, created_at)
+            ).lastrowid
+            added += 1
+        else:
+            target_id = row[0]
+        conn.execute("INSERT INTO temp.merge_dictionaries VALUES (?, ?)", (source_id, target_id))
+    return added
+
+
+def _scan_partitions(conn: sqlite3.Connection, target_path: PathLike) -> int:
+    """
+    Table temporaire merge_archived (id, empreinte) des résultats de la source déjà archivés dans la cible.
+
+    Les partitions de la cible (src/partitions.py) sont attachées une à une:
+    le nombre de bases attachées reste borné quel que soit le nombre de mois archivés.
+
+    Returns:
+        Nombre de résultats de la source présents dans les partitions de la cible
+    """
+    conn.execute("DELETE FROM temp.merge_archived")
+    select = ", ".join(f"p.{column}" for column in CHECKSUM_COLUMNS + ('response_hash', 'response_raw'))
+    directory = partition_dir(target_path)
+    for entry in read_manifest(target_path)['partitions'].values():
+        conn.execute("ATTACH DATABASE ? AS merge_part", (read_only_uri(directory / entry['file']),))
+        try:
+            cursor = conn.execute(f"SELECT p.id, {select} FROM merge_part.results p JOIN src.results s ON s.id = p.id")
+            while True:
+                rows = cursor.fetchmany(ARCHIVED_INSERT_BATCH)
+                if not rows:
+                    break
+                conn.executemany(
+                    "INSERT OR IGNORE INTO temp.merge_archived (id, digest) VALUES (?, ?)",
+                    [(row[0], _row_digest(row[1:])) for row in rows],
+                )
+        finally:
+            conn.execute("DETACH DATABASE merge_part")
+    return conn.execute("SELECT COUNT(*) FROM temp.merge_archived").fetchone()[0]
+
+
+def _copy_batch(conn: sqlite3.Connection, columns: Sequence[str], lower: int, upper: int) -> int:
+    """
+    Copie les résultats absents de la cible dont le rowid source est dans (lower, upper].
+
+    Un résultat est présent dans la cible s'il est dans sa base active ou
+    dans l'une de ses partitions (table temporaire merge_archived).
+
+    Les réponses compressées, les seaux MinHash, l'index plein texte et les
+    postings (termes réconciliés par (kind, value)) sont recopiés pour ces
+    seuls résultats; les agrégats sont complétés à partir des colonnes de résumé
+    et les résumés approximatifs (src/sketches.py) à partir des nouveaux résultats.
+
+    Returns:
+        Nombre de résultats ajoutés
+    """
+    new_ids = "SELECT id FROM temp.merge_new"
+    conn.execute("DELETE FROM temp.merge_new")
+    inserted = conn.execute(
+        "INSERT INTO temp.merge_new (id) SELECT s.id FROM src.results s WHERE s.rowid > ? AND s.rowid <= ? "
+        "AND NOT EXISTS (SELECT 1 FROM main.results m WHERE m.id = s.id) "
+        "AND NOT EXISTS (SELECT 1 FROM temp.merge_archived a WHERE a.id = s.id)", (lower, upper)
+    ).rowcount
+    if not inserted:
+        return 0
+
+    conn.execute(
+        "INSERT OR IGNORE INTO main.response_blobs (hash, codec, dict_id, raw_size, stored_size, body, created_at) "
+        "SELECT b.hash, b.codec, d.target_id, b.raw_size, b.stored_size, b.body, b.created_at "
+        "FROM src.response_blobs b LEFT JOIN temp.merge_dictionaries d ON d.source_id = b.dict_id "
+        f"WHERE b.hash IN (SELECT response_hash FROM src.results WHERE id IN ({new_ids}))"
+    )
+    column_list = ", ".join(columns)
+    conn.execute(
+        f"INSERT INTO main.results ({column_list}) SELECT {column_list} FROM src.results WHERE id IN ({new_ids})"
+    )
+    conn.execute(
+        "INSERT OR IGNORE INTO main.minhash_buckets (band, bucket, result_id) "
+        f"SELECT band, bucket, result_id FROM src.minhash_buckets WHERE result_id IN ({new_ids})"
+    )
+    conn.execute(
+        f"INSERT INTO main.{FTS_TABLE} (result_id, response, chain_of_thought) "
+        f"SELECT result_id, response, chain_of_thought FROM src.{FTS_TABLE} WHERE result_id IN ({new_ids})"
+    )
+
+    new_postings = (
+        "FROM src.source_postings p JOIN src.source_terms t ON t.id = p.term_id "
+        f"WHERE p.result_id IN ({new_ids})"
+    )
+    conn.execute(f"INSERT OR IGNORE INTO main.source_terms (kind, value) SELECT DISTINCT t.kind, t.value {new_postings}")
+    conn.execute(
+        "INSERT OR IGNORE INTO main.source_postings (term_id, result_id, position) "
+        "SELECT mt.id, p.result_id, p.position "
+        "FROM src.source_postings p JOIN src.source_terms t ON t.id = p.term_id "
+        "JOIN main.source_terms mt ON mt.kind = t.kind AND mt.value = t.value "
+        f"WHERE p.result_id IN ({new_ids})"
+    )
+
+    # Mêmes sommes que aggregates.observe, calculées sur les colonnes de résumé
+    conn.execute(
+        "INSERT INTO main.result_aggregates (experiment_id, model_name, query_category, day, results, "
+        "with_sources, sources_total, errors, latency_count, latency_sum, latency_sum_sq, "
+        "response_length_sum, response_length_sum_sq, first_timestamp, last_timestamp) "
+        "SELECT experiment_id, model_name, query_category, date(timestamp), COUNT(*), "
+        "SUM(sources_count > 0), SUM(sources_count), SUM(is_error), COUNT(response_time_ms), "
+        "COALESCE(SUM(response_time_ms), 0.0), COALESCE(SUM(1.0 * response_time_ms * response_time_ms), 0.0), "
+        "SUM(response_length), SUM(1.0 * response_length * response_length), MIN(timestamp), MAX(timestamp) "
+        f"FROM main.results WHERE id IN ({new_ids}) GROUP BY 1, 2, 3, 4 "
+        "ON CONFLICT (experiment_id, model_name, query_category, day) DO UPDATE SET "
+        "results = results + excluded.results, with_sources = with_sources + excluded.with_sources, "
+        "sources_total = sources_total + excluded.sources_total, errors = errors + excluded.errors, "
+        "latency_count = latency_count + excluded.latency_count, "
+        "latency_sum = latency_sum + excluded.latency_sum, latency_sum_sq = latency_sum_sq + excluded.latency_sum_sq, "
+        "response_length_sum = response_length_sum + excluded.response_length_sum, "
+        "response_length_sum_sq = response_length_sum_sq + excluded.response_length_sum_sq, "
+        "first_timestamp = MIN(first_timestamp, excluded.first_timestamp), "
+        "last_timestamp = MAX(last_timestamp, excluded.last_timestamp)"
+    )
+    update_sketches_sqlite(conn, conn.execute(
+        "SELECT experiment_id, model_name, query_id, sources_extracted, response_time_ms "
+        f"FROM main.results WHERE id IN ({new_ids})"
+    ).fetchall())
+    return inserted
+
+
+def _row_digest(row: Sequence[Any]) -> str:
+    """Empreinte d'un résultat: CHECKSUM_COLUMNS puis empreinte de la réponse (hash du blob ou du texte en ligne)."""
+    *values, response_hash, response_inline = row
+    if response_hash is None and response_inline is not None:
+        response_hash = content_hash(response_inline.encode('utf-8'))
+    payload = json.dumps([*values, response_hash], default=str, ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def _verify(conn: sqlite3.Connection, batch_size: int) -> Dict[str, Any]:
+    """
+    Compare chaque résultat de la source à celui de la cible (même id), par lots de rowid.
+
+    Les ids du lot passent par la table temporaire merge_verify (pas de
+    paramètres liés en nombre variable); les résultats archivés dans les
+    partitions de la cible sont comparés par l'empreinte relevée à la préparation.
+
+    Returns:
+        Dict (checksum de la source, rows vérifiés, conflicts: ids présents avec un contenu différent)
+    """
+    select = ", ".join(CHECKSUM_COLUMNS + ('response_hash', 'response_raw'))
+    target_select = ", ".join(f"m.{column}" for column in CHECKSUM_COLUMNS + ('response_hash', 'response_raw'))
+    checksum = hashlib.sha256()
+    verified, conflicts, conflict_ids = 0, 0, []
+    last = 0
+    while True:
+        rows = conn.execute(
+            f"SELECT rowid, id, {select} FROM src.results WHERE rowid > ? ORDER BY rowid LIMIT ?", (last, batch_size)
+        ).fetchall()
+        if not rows:
+            break
+        last = rows[-1][0]
+        conn.execute("DELETE FROM temp.merge_verify")
+        conn.executemany("INSERT OR IGNORE INTO temp.merge_verify (id) VALUES (?)", [(row[1],) for row in rows])
+        target = {
+            row[0]: _row_digest(row[1:])
+            for row in conn.execute(
+                f"SELECT m.id, {target_select} FROM main.results m JOIN temp.merge_verify v ON v.id = m.id"
+            )
+        }
+        for result_id, digest in conn.execute(
+            "SELECT a.id, a.digest FROM temp.merge_archived a JOIN temp.merge_verify v ON v.id = a.id"
+        ):
+            target.setdefault(result_id, digest)
+        for row in rows:
+            digest = _row_digest(row[2:])
+            checksum.update(digest.encode('ascii'))
+            if row[1] not in target:
+                raise RuntimeError(f"Résultat {row[1]} absent de la base cible après fusion")
+            if target[row[1]] != digest:
+                conflicts += 1
+                if len(conflict_ids) < MAX_REPORTED_CONFLICTS:
+                    conflict_ids.append(row[1])
+            verified += 1
+    return {'checksum': checksum.hexdigest()[:16], 'verified': verified, 'conflicts': conflicts,
+            'conflict_ids': conflict_ids}
+
+
+def merge_database(target_path: PathLike, source_path: PathLike, batch_size: int = 1000) -> Dict[str, Any]:
+    """
+    Fusionne une base de résultats dans la base cible (schéma cible déjà à jour).
+
+    Les lignes sont recopiées par INSERT ... SELECT entre bases attachées, par
+    lots de rowid (une transaction par lot): la mémoire utilisée ne dépend pas
+    de la taille des bases, et une fusion interrompue se reprend en la relançant.
+    Les résultats déjà présents (même id, dans la base active ou ses
+    partitions) sont ignorés; ceux dont le contenu diffère sont signalés
+    comme conflits (la version de la cible est conservée).
+
+    Returns:
+        Dict (source, rows, inserted, duplicates, conflicts, conflict_ids,
+        dictionaries ajoutés, checksum de la source)
+    """
+    if Path(source_path).resolve() == Path(target_path).resolve():
+        raise ValueError(f"{source_path}: la source est la base cible")
+
+    conn = sqlite3.connect(str(target_path), isolation_level=None, uri=True, timeout=BUSY_TIMEOUT_MS / 1000)
+    try:
+        conn.execute("ATTACH DATABASE ? AS src", (read_only_uri(source_path),))
+        _check_source(conn, source_path)
+        conn.execute("CREATE TEMP TABLE IF NOT EXISTS merge_dictionaries (source_id INTEGER PRIMARY KEY, target_id INTEGER)")
+        conn.execute("CREATE TEMP TABLE IF NOT EXISTS merge_new (id TEXT PRIMARY KEY)")
+        conn.execute("CREATE TEMP TABLE IF NOT EXISTS merge_verify (id TEXT PRIMARY KEY)")
+        conn.execute("CREATE TEMP TABLE IF NOT EXISTS merge_archived (id TEXT PRIMARY KEY, digest TEXT)")
+        columns = [column for column in _columns(conn, 'main', 'results') if column in _columns(conn, 'src', 'results')]
+        before = conn.execute("SELECT COUNT(*) FROM main.results").fetchone()[0]
+
+        _scan_partitions(conn, target_path)
+
+        conn.execute("BEGIN")
+        dictionaries = _map_dictionaries(conn)
+        conn.execute("COMMIT")
+
+        inserted, last = 0, 0
+        while True:
+            upper = conn.execute(
+                "SELECT MAX(rowid) FROM (SELECT rowid FROM src.results WHERE rowid > ? ORDER BY rowid LIMIT ?)",
+                (last, batch_size),
+            ).fetchone()[0]
+            if upper is None:
+                break
+            conn.execute("BEGIN")
+            inserted += _copy_batch(conn, columns, last, upper)
+            conn.execute("COMMIT")
+            last = upper
+
+        after = conn.execute("SELECT COUNT(*) FROM main.results").fetchone()[0]
+        if after != before + inserted:
+            raise RuntimeError(f"{source_path}: {after - before} résultats ajoutés pour {inserted} attendus")
+        verification = _verify(conn, batch_size)
+        conn.execute("DETACH DATABASE src")
+    finally:
+        conn.close()
+
+    return {
+        'source': str(source_path), 'rows': verification['verified'], 'inserted': inserted,
+        'duplicates': verification['verified'] - inserted - verification['conflicts'],
+        'conflicts': verification['conflicts'], 'conflict_ids': verification['conflict_ids'],
+        'dictionaries': dictionaries, 'checksum': verification['checksum'],
+    }
+
+
+def merge_databases(target_path: PathLike, source_paths: Sequence[PathLike], batch_size: int = 1000) -> List[Dict[str, Any]]:
+    """
+    Fusionne plusieurs bases (machines ou shards d'une campagne) dans la base cible.
+
+    Les statistiques de stabilité, qui dépendent de l'ordre chronologique des
+    itérations, sont recalculées une fois toutes les sources fusionnées.
+
+    Returns:
+        Un rapport par source (voir merge_database)
+    """
+    _prepare_target(target_path)
+    reports = [merge_database(target_path, source_path, batch_size) for source_path in source_paths]
+    if any(report['inserted'] for report in reports):
+        engine = create_engine(f"sqlite:///{target_path}")
+        try:
+            with Session(bind=engine) as session:
+                rebuild_stability(session)
+            with engine.begin() as connection:
+                connection.exec_driver_sql(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('optimize')")
+        finally:
+            engine.dispose()
+    return reports
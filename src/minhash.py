@@ -0,0 +1,235 @@
+import hashlib
+import re
+import zlib
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from src.database import ExperimentResult, MinHashBucket, register_ingest_hook
+
+# Paramètres figés: les modifier impose de reconstruire les signatures (rebuild_minhash)
+NUM_PERM = 128
+BANDS = 16
+ROWS_PER_BAND = NUM_PERM // BANDS
+SHINGLE_SIZE = 5
+MERSENNE_PRIME = (1 << 31) - 1
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+
+def _permutation_parameters() -> Tuple[np.ndarray, np.ndarray]:
+    # Dérivés d'un hash et non d'un générateur aléatoire: stables d'une version de numpy à l'autre
+    def draw(label: str, low: int) -> int:
+        digest = hashlib.blake2b(label.encode('ascii'), digest_size=8).digest()
+        return low + int.from_bytes(digest, 'big') % (MERSENNE_PRIME - low)
+
+    a = np.array([draw(f"minhash-a-{i}", 1) for i in range(NUM_PERM)], dtype=np.uint64)
+    b = np.array([draw(f"minhash-b-{i}", 0) for i in range(NUM_PERM)], dtype=np.uint64)
+    return a, b
+
+
+_PERM_A, _PERM_B = _permutation_parameters()
+
+
+def shingle_hashes(text_value: str, size: int = SHINGLE_SIZE) -> np.ndarray:
+    """
+    Hashs (distincts) des k-grammes de mots du texte, normalisé en minuscules.
+
+    Chaque mot est haché une fois (crc32); les k-grammes sont combinés par
+    un hash polynomial vectorisé. Un texte plus court que k mots donne un
+    seul k-gramme.
+    """
+    words = _WORD.findall(text_value.lower())
+    if not words:
+        return np.empty(0, dtype=np.uint64)
+    word_hashes = np.fromiter((zlib.crc32(word.encode('utf-8')) for word in words),
+                              dtype=np.uint64, count=len(words))
+    size = min(size, len(word_hashes))
+    windows = np.lib.stride_tricks.sliding_window_view(word_hashes, size)
+    powers = np.power(np.uint64(1000003), np.arange(size, dtype=np.uint64))
+    combined = (windows * powers).sum(axis=1, dtype=np.uint64)  # modulo 2^64 implicite
+    return np.unique(combined % np.uint64(MERSENNE_PRIME))
+
+
+def minhash_signature(text_value: Optional[str]) -> Optional[np.ndarray]:
+    """Signature MinHash (NUM_PERM valeurs uint32) du texte, None s'il est vide."""
+    if not text_value:
+        return None
+    shingles = shingle_hashes(text_value)
+    if shingles.size == 0:
+        return None
+    hashed = (np.outer(_PERM_A, shingles) + _PERM_B[:, None]) % np.uint64(MERSENNE_PRIME)
+    return hashed.min(axis=1).astype(np.uint32)
+
+
+def encode_signature(signature: np.ndarray) -> bytes:
+    return signature.astype('<u4').tobytes()
+
+
+def decode_signature(payload: bytes) -> np.ndarray:
+    return np.frombuffer(payload, dtype='<u4')
+
+
+def band_buckets(signature: np.ndarray) -> List[int]:
+    """Identifiant (entier signé 64 bits) du seau de chaque bande."""
+    bands = signature.astype('<u4').reshape(BANDS, ROWS_PER_BAND)
+    return [
+        int.from_bytes(hashlib.blake2b(band.tobytes(), digest_size=8).digest(), 'big', signed=True)
+        for band in bands
+    ]
+
+
+def estimated_similarity(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Similarité de Jaccard estimée entre signatures (lignes de a et b appariées)."""
+    return (np.atleast_2d(a) == np.atleast_2d(b)).mean(axis=1)
+
+
+def index_result(session: Session, result: ExperimentResult):
+    """Calcule la signature d'un résultat et enregistre ses seaux LSH."""
+    signature = minhash_signature(result.response_raw)
+    if signature is None:
+        result.response_minhash = None
+        return
+    result.response_minhash = encode_signature(signature)
+    session.add_all([
+        MinHashBucket(band=band, bucket=bucket, result_id=result.id)
+        for band, bucket in enumerate(band_buckets(signature))
+    ])
+
+
+@register_ingest_hook
+def update_minhash(session: Session, results: List[ExperimentResult]):
+    """Hook d'ingestion: signature et seaux LSH des nouveaux résultats."""
+    for result in results:
+        index_result(session, result)
+
+
+def rebuild_minhash(session: Session, batch_size: int = 200) -> int:
+    """
+    Recalcule toutes les signatures et l'index LSH, par lots (un commit par lot).
+
+    Returns:
+        Nombre de résultats indexés
+    """
+    session.query(MinHashBucket).delete(synchronize_session=False)
+    session.commit()
+    ids = [row[0] for row in session.query(ExperimentResult.id).order_by(ExperimentResult.id)]
+    for start in range(0, len(ids), batch_size):
+        batch = session.query(ExperimentResult).filter(ExperimentResult.id.in_(ids[start:start + batch_size])).all()
+        for result in batch:
+            index_result(session, result)
+        session.commit()
+        session.expunge_all()
+    return len(ids)
+
+
+def candidate_pairs(session: Session, experiment_id: Optional[str] = None,
+                    same_group: bool = False) -> List[Tuple[str, str]]:
+    """
+    Paires de résultats partageant au moins un seau LSH (sans comparaison exhaustive).
+
+    Args:
+        experiment_id: Limiter aux résultats d'une expérience
+        same_group: Limiter aux paires de même (expérience, requête, modèle)
+    """
+    conditions = []
+    params: Dict[str, Any] = {}
+    if experiment_id:
+        conditions.append("ra.experiment_id = :experiment_id AND rb.experiment_id = :experiment_id")
+        params['experiment_id'] = experiment_id
+    if same_group:
+        conditions.append(
+            "ra.experiment_id = rb.experiment_id AND ra.query_id = rb.query_id AND ra.model_name = rb.model_name"
+        )
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    rows = session.execute(text(f"""
+        SELECT DISTINCT ba.result_id, bb.result_id
+        FROM minhash_buckets ba
+        JOIN minhash_buckets bb ON bb.band = ba.band AND bb.bucket = ba.bucket AND bb.result_id > ba.result_id
+        JOIN results ra ON ra.id = ba.result_id
+        JOIN results rb ON rb.id = bb.result_id
+        {where}
+    """), params)
+    return [(a, b) for a, b in rows]
+
+
+def _signatures(session: Session, ids: List[str]) -> Dict[str, np.ndarray]:
+    signatures = {}
+    for start in range(0, len(ids), 500):
+        rows = session.query(ExperimentResult.id, ExperimentResult.response_minhash).filter(
+            ExperimentResult.id.in_(ids[start:start + 500])
+        )
+        signatures.update({result_id: decode_signature(payload) for result_id, payload in rows if payload})
+    return signatures
+
+
+def near_duplicate_pairs(session: Session, threshold: float = 0.9, experiment_id: Optional[str] = None,
+                         same_group: bool = False) -> List[Tuple[str, str, float]]:
+    """Paires candidates dont la similarité estimée atteint `threshold`."""
+    pairs = candidate_pairs(session, experiment_id, same_group)
+    if not pairs:
+        return []
+    signatures = _signatures(session, sorted({result_id for pair in pairs for result_id in pair}))
+    pairs = [(a, b) for a, b in pairs if a in signatures and b in signatures]
+    if not pairs:
+        return []
+    left = np.stack([signatures[a] for a, _ in pairs])
+    right = np.stack([signatures[b] for _, b in pairs])
+    similarity = estimated_similarity(left, right)
+    return [(a, b, float(s)) for (a, b), s in zip(pairs, similarity) if s >= threshold]
+
+
+def near_duplicate_clusters(session: Session, threshold: float = 0.9,
+                            experiment_id: Optional[str] = None) -> List[List[str]]:
+    """Groupes de réponses quasi identiques (composantes connexes), tous modèles et itérations confondus."""
+    parent: Dict[str, str] = {}
+
+    def find(node: str) -> str:
+        parent.setdefault(node, node)
+        while parent[node] != node:
+            parent[node] = parent[parent[node]]
+            node = parent[node]
+        return node
+
+    for a, b, _ in near_duplicate_pairs(session, threshold, experiment_id):
+        parent[find(a)] = find(b)
+    clusters = defaultdict(list)
+    for node in list(parent):
+        clusters[find(node)].append(node)
+    return sorted((sorted(members) for members in clusters.values()), key=len, reverse=True)
+
+
+def iteration_stability(session: Session, threshold: float = 0.9,
+                        experiment_id: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Part des itérations d'une (expérience, requête, modèle) ayant une quasi-copie.
+
+    Une réponse compte comme stable si au moins une autre itération du même
+    groupe a une similarité estimée >= threshold.
+
+    Returns:
+        Liste de dicts (experiment_id, query_id, model_name, responses, near_duplicates, share)
+    """
+    near = {result_id for a, b, _ in near_duplicate_pairs(session, threshold, experiment_id, same_group=True)
+            for result_id in (a, b)}
+    query = session.query(
+        ExperimentResult.id, ExperimentResult.experiment_id, ExperimentResult.query_id, ExperimentResult.model_name
+    ).filter(ExperimentResult.response_minhash.isnot(None))
+    if experiment_id:
+        query = query.filter(ExperimentResult.experiment_id == experiment_id)
+
+    groups: Dict[Tuple[str, str, str], List[int]] = defaultdict(lambda: [0, 0])
+    for result_id, experiment, query_id, model_name in query:
+        counts = groups[(experiment, query_id, model_name)]
+        counts[0] += 1
+        counts[1] += result_id in near
+    return [
+        {
+            'experiment_id': experiment, 'query_id': query_id, 'model_name': model_name,
+            'responses': total, 'near_duplicates': duplicates, 'share': duplicates / total,
+        }
+        for (experiment, query_id, model_name), (total, duplicates) in sorted(groups.items())
+    ]
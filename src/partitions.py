@@ -0,0 +1,255 @@
+import datetime
+import hashlib
+import json
+import os
+import sqlite3
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+from sqlalchemy import create_engine
+
+from src.blob_store import prepare_sqlite_connection
+from src.database import Base, CompressionDictionary, ExperimentResult, ResponseBlob
+
+PARTITION_DIR_NAME = "partitions"
+MANIFEST_NAME = "manifest.json"
+MANIFEST_VERSION = 1
+# Tables répliquées dans chaque partition: une partition se lit seule
+PARTITION_TABLES = [CompressionDictionary.__table__, ResponseBlob.__table__, ExperimentResult.__table__]
+# Index dérivés de la base active qui référencent des résultats (supprimés à l'archivage)
+RESULT_REFERENCES = [('minhash_buckets', 'result_id'), ('source_postings', 'result_id'), ('response_fts', 'result_id')]
+
+PathLike = Union[str, Path]
+
+
+def partition_dir(db_path: PathLike) -> Path:
+    """Répertoire des partitions d'une base (à côté du fichier)."""
+    return Path(db_path).resolve().parent / PARTITION_DIR_NAME
+
+
+def read_manifest(db_path: PathLike) -> Dict[str, Any]:
+    """Manifeste des partitions ({'version', 'partitions': {nom: entrée}}), vide s'il n'existe pas."""
+    path = partition_dir(db_path) / MANIFEST_NAME
+    if not path.exists():
+        return {'version': MANIFEST_VERSION, 'partitions': {}}
+    return json.loads(path.read_text(encoding='utf-8'))
+
+
+def write_manifest(db_path: PathLike, manifest: Dict[str, Any]):
+    directory = partition_dir(db_path)
+    directory.mkdir(parents=True, exist_ok=True)
+    staging = directory / f".{MANIFEST_NAME}.tmp"
+    staging.write_text(json.dumps(manifest, indent=2, sort_keys=True), encoding='utf-8')
+    os.replace(staging, directory / MANIFEST_NAME)
+
+
+def manifest_fingerprint(db_path: PathLike) -> str:
+    """Empreinte du manifeste (chaîne vide sans partition), pour invalider les caches."""
+    path = partition_dir(db_path) / MANIFEST_NAME
+    if not path.exists():
+        return ""
+    return hashlib.sha256(path.read_bytes()).hexdigest()[:16]
+
+
+def _month_bounds(month: str) -> Tuple[str, str]:
+    start = datetime.date.fromisoformat(f"{month}-01")
+    end = (start + datetime.timedelta(days=32)).replace(day=1)
+    return start.isoformat(), end.isoformat()
+
+
+def _create_partition(path: Path):
+    engine = create_engine(f"sqlite:///{path}")
+    try:
+        Base.metadata.create_all(bind=engine, tables=PARTITION_TABLES)
+    finally:
+        engine.dispose()
+
+
+def _columns(conn: sqlite3.Connection, schema: str, table: str) -> List[str]:
+    return [row[1] for row in conn.execute(f"PRAGMA {schema}.table_info({table})")]
+
+
+def _copy(conn: sqlite3.Connection, table: str, where: str, params: Sequence[Any] = ()) -> int:
+    columns = [column for column in _columns(conn, 'main', table) if column in _columns(conn, 'part', table)]
+    column_list = ", ".join(columns)
+    cursor = conn.execute(
+        f"INSERT OR IGNORE INTO part.{table} ({column_list}) SELECT {column_list} FROM main.{table} WHERE {where}",
+        params,
+    )
+    return cursor.rowcount
+
+
+def _table_exists(conn: sqlite3.Connection, table: str) -> bool:
+    return conn.execute("SELECT 1 FROM main.sqlite_master WHERE name = ?", (table,)).fetchone() is not None
+
+
+def _partition_entry(conn: sqlite3.Connection, month: str, file_name: str) -> Dict[str, Any]:
+    rows, first, last, sessions = conn.execute(
+        "SELECT COUNT(*), MIN(timestamp), MAX(timestamp), COUNT(DISTINCT session_id) FROM part.results"
+    ).fetchone()
+    experiments = [row[0] for row in conn.execute("SELECT DISTINCT experiment_id FROM part.results ORDER BY 1")]
+    return {
+        'file': file_name, 'month': month, 'rows': rows, 'sessions': sessions, 'experiments': experiments,
+        'start': first, 'end': last, 'updated_at': datetime.datetime.utcnow().isoformat(timespec='seconds'),
+    }
+
+
+def archive_month(db_path: PathLike, month: str) -> Dict[str, Any]:
+    """
+    Déplace les résultats d'un mois (AAAA-MM) de la base active vers sa partition.
+
+    La copie (résultats, blobs et dictionnaires référencés) est validée dans
+    la partition avant la suppression dans la base active; une interruption
+    entre les deux est rattrapée en relançant l'archivage (INSERT OR IGNORE).
+    Les index dérivés (minhash, sources, plein texte) des résultats déplacés
+    sont supprimés; les agrégats et statistiques de stabilité sont conservés.
+
+    Returns:
+        Entrée du manifeste de la partition
+    """
+    start, end = _month_bounds(month)
+    directory = partition_dir(db_path)
+    directory.mkdir(parents=True, exist_ok=True)
+    file_name = f"results_{month}.db"
+    _create_partition(directory / file_name)
+
+    conn = sqlite3.connect(str(db_path), isolation_level=None)
+    try:
+        conn.execute("ATTACH DATABASE ? AS part", (str(directory / file_name),))
+        in_month = "timestamp >= ? AND timestamp < ?"
+        ids_subquery = f"SELECT id FROM main.results WHERE {in_month}"
+        hashes_subquery = f"SELECT response_hash FROM main.results WHERE {in_month} AND response_hash IS NOT NULL"
+
+        conn.execute("BEGIN")
+        _copy(conn, 'compression_dictionaries',
+              f"id IN (SELECT dict_id FROM main.response_blobs WHERE hash IN ({hashes_subquery}))", (start, end))
+        _copy(conn, 'response_blobs', f"hash IN ({hashes_subquery})", (start, end))
+        _copy(conn, 'results', in_month, (start, end))
+        conn.execute("COMMIT")
+
+        missing = conn.execute(
+            f"SELECT COUNT(*) FROM main.results m WHERE {in_month.replace('timestamp', 'm.timestamp')} "
+            f"AND NOT EXISTS (SELECT 1 FROM part.results p WHERE p.id = m.id)", (start, end)
+        ).fetchone()[0]
+        if missing:
+            raise RuntimeError(f"{missing} résultats de {month} absents de la partition, base active conservée")
+
+        conn.execute("BEGIN")
+        for table, column in RESULT_REFERENCES:
+            if _table_exists(conn, table):
+                conn.execute(f"DELETE FROM main.{table} WHERE {column} IN ({ids_subquery})", (start, end))
+        conn.execute(f"DELETE FROM main.results WHERE {in_month}", (start, end))
+        conn.execute(
+            "DELETE FROM main.response_blobs WHERE hash NOT IN "
+            "(SELECT response_hash FROM main.results WHERE response_hash IS NOT NULL)"
+        )
+        conn.execute("COMMIT")
+
+        entry = _partition_entry(conn, month, file_name)
+        conn.execute("DETACH DATABASE part")
+    finally:
+        conn.close()
+
+    manifest = read_manifest(db_path)
+    manifest['partitions'][month] = entry
+    write_manifest(db_path, manifest)
+    return entry
+
+
+def closed_months(db_path: PathLike, before: Optional[str] = None) -> List[str]:
+    """Mois (AAAA-MM) présents dans la base active et antérieurs à `before` (défaut: mois courant)."""
+    before = before or datetime.datetime.utcnow().strftime("%Y-%m")
+    cutoff, _ = _month_bounds(before)
+    conn = sqlite3.connect(str(db_path))
+    try:
+        rows = conn.execute(
+            "SELECT DISTINCT strftime('%Y-%m', timestamp) FROM results WHERE timestamp < ? ORDER BY 1", (cutoff,)
+        )
+        return [row[0] for row in rows if row[0]]
+    finally:
+        conn.close()
+
+
+def archive_closed_months(db_path: PathLike, before: Optional[str] = None, vacuum: bool = False) -> List[Dict[str, Any]]:
+    """
+    Archive chaque mois clos dans sa partition, puis compacte la base active si demandé.
+
+    Returns:
+        Entrées du manifeste des partitions écrites
+    """
+    entries = [archive_month(db_path, month) for month in closed_months(db_path, before)]
+    if vacuum and entries:
+        vacuum_database(db_path)
+    return entries
+
+
+def vacuum_database(db_path: PathLike):
+    """Compacte la base active (libère la place des résultats archivés)."""
+    conn = sqlite3.connect(str(db_path), isolation_level=None)
+    try:
+        conn.execute("VACUUM")
+    finally:
+        conn.close()
+
+
+def select_partitions(manifest: Dict[str, Any], start=None, end=None,
+                      experiment_id: Optional[Union[str, Sequence[str]]] = None) -> List[Dict[str, Any]]:
+    """Partitions pouvant contenir des résultats de la période [start, end) et des expériences demandées."""
+    if isinstance(experiment_id, str):
+        experiment_id = [experiment_id]
+    start = str(start) if start is not None else None
+    end = str(end) if end is not None else None
+    selected = []
+    for name, entry in sorted(manifest.get('partitions', {}).items()):
+        if not entry.get('rows'):
+            continue
+        if start is not None and entry['end'] < start:
+            continue
+        if end is not None and entry['start'] >= end:
+            continue
+        if experiment_id is not None and not set(experiment_id) & set(entry.get('experiments', [])):
+            continue
+        selected.append(entry)
+    return selected
+
+
+def attach_partitions(conn: sqlite3.Connection, db_path: PathLike, start=None, end=None,
+                      experiment_id: Optional[Union[str, Sequence[str]]] = None) -> List[str]:
+    """
+    Attache à une connexion sqlite3 les seules partitions utiles à une requête.
+
+    Une vue temporaire `results` (prioritaire sur main.results) réunit la
+    base active et les partitions attachées: les requêtes existantes sur
+    `results` lisent toute la campagne sans modification. Les réponses des
+    partitions sont décompressées dans la vue; les résultats archivés ont
+    un rowid de 0 (antérieurs à toute ligne de la base active).
+
+    Args:
+        start, end: Bornes de timestamp de la requête (ISO), pour l'élagage
+        experiment_id: Expérience(s) demandée(s), pour l'élagage
+
+    Returns:
+        Fichiers des partitions attachées
+    """
+    selected = select_partitions(read_manifest(db_path), start, end, experiment_id)
+    if not selected:
+        return []
+    directory = partition_dir(db_path)
+    columns = _columns(conn, 'main', 'results')
+    parts = [f"SELECT r.rowid AS rowid, {', '.join(f'r.{column}' for column in columns)} FROM main.results r"]
+    for index, entry in enumerate(selected):
+        schema = f"part{index}"
+        conn.execute(f"ATTACH DATABASE ? AS {schema}", (str(directory / entry['file']),))
+        available = set(_columns(conn, schema, 'results'))
+        response_expr, joins = prepare_sqlite_connection(conn, schema=schema)
+        select = []
+        for column in columns:
+            if column == 'response_raw':
+                select.append(f"{response_expr} AS response_raw")
+            elif column == 'response_hash' or column not in available:
+                select.append(f"NULL AS {column}")
+            else:
+                select.append(f"r.{column}")
+        parts.append(f"SELECT 0 AS rowid, {', '.join(select)} FROM {schema}.results r {joins}")
+    conn.execute(f"CREATE TEMP VIEW results AS {' UNION ALL '.join(parts)}")
+    return [entry['file'] for entry in selected]
@@ -0,0 +1,204 @@
+import bisect
+import math
+import secrets
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from src.config import ExperimentConfig, ModelConfig, ModelParameters, ParameterSweep, PlanSpec, QueryConfig
+
+
+class WorkItem(NamedTuple):
+    index: int  # Rang dans le plan (0 à len(plan) - 1)
+    iteration: int  # Numéro d'itération (à partir de 1)
+    query: QueryConfig
+    model: ModelConfig  # Configuration déclarée (sans les paramètres balayés)
+    overrides: Dict[str, Any]  # Paramètres balayés, vide hors balayage
+    variant: int  # Rang de la variante de modèle pour cette requête
+
+    @property
+    def label(self) -> str:
+        return variant_label(self.model.name, self.overrides)
+
+
+def variant_label(model_name: str, overrides: Dict[str, Any]) -> str:
+    """Nom enregistré pour une variante: 'GPT-4o [temperature=0.2]' (nom du modèle hors balayage)."""
+    if not overrides:
+        return model_name
+    return f"{model_name} [{', '.join(f'{name}={value}' for name, value in overrides.items())}]"
+
+
+def variant_config(model: ModelConfig, overrides: Dict[str, Any]) -> ModelConfig:
+    """Configuration du modèle avec les paramètres balayés (validés par ModelParameters)."""
+    if not overrides:
+        return model
+    parameters = ModelParameters.model_validate({**model.parameters.model_dump(), **overrides})
+    return model.model_copy(update={'name': variant_label(model.name, overrides), 'parameters': parameters})
+
+
+class ParameterGrid:
+    """
+    Produit cartésien de valeurs de paramètres, indexé sans être matérialisé.
+
+    La combinaison de rang i est décodée en base mixte (le dernier
+    paramètre varie le plus vite): la mémoire ne dépend que du nombre de
+    valeurs déclarées, pas du nombre de combinaisons.
+    """
+
+    def __init__(self, parameters: Dict[str, Sequence[Any]]):
+        self.names = list(parameters)
+        self.values = [list(values) for values in parameters.values()]
+        for name, values in zip(self.names, self.values):
+            if not values:
+                raise ValueError(f"Aucune valeur pour le paramètre balayé '{name}'")
+        self.size = math.prod(len(values) for values in self.values)
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __getitem__(self, index: int) -> Dict[str, Any]:
+        if not 0 <= index < self.size:
+            raise IndexError(index)
+        combination = {}
+        for name, values in zip(reversed(self.names), reversed(self.values)):
+            index, position = divmod(index, len(values))
+            combination[name] = values[position]
+        return {name: combination[name] for name in self.names}
+
+
+def _duplicate_values(values: Sequence[Any]) -> List[Any]:
+    return [value for position, value in enumerate(values) if value in values[:position]]
+
+
+def _sweeps_overlap(first: ParameterSweep, second: ParameterSweep) -> bool:
+    """Deux balayages produisent une même combinaison pour un même modèle."""
+    if first.models and second.models and not set(first.models) & set(second.models):
+        return False
+    if set(first.parameters) != set(second.parameters):
+        return False
+    return all(
+        any(value in second.parameters[name] for value in values) for name, values in first.parameters.items()
+    )
+
+
+def _check_sweeps(spec: PlanSpec, models: List[ModelConfig]):
+    """
+    Paramètres et modèles visés par les balayages (un modèle déclaré mais inactif est accepté).
+
+    Une même combinaison produite deux fois pour un modèle (valeur répétée,
+    balayages qui se recouvrent) est refusée: les deux variantes porteraient
+    le même variant_label. Le contrôle porte sur les valeurs déclarées, sans
+    énumérer les combinaisons.
+    """
+    known_parameters = set(ModelParameters.model_fields)
+    known_models = {model.name for model in models}
+    for position, sweep in enumerate(spec.sweeps):
+        unknown = set(sweep.parameters) - known_parameters
+        if unknown:
+            raise ValueError(f"Paramètres balayés inconnus: {', '.join(sorted(unknown))}")
+        missing = set(sweep.models) - known_models
+        if missing:
+            raise ValueError(f"Modèles balayés inconnus: {', '.join(sorted(missing))}")
+        for name, values in sweep.parameters.items():
+            repeated = _duplicate_values(values)
+            if repeated:
+                raise ValueError(f"Valeurs répétées pour le paramètre balayé '{name}': {repeated}")
+        for previous, other in enumerate(spec.sweeps[:position]):
+            if _sweeps_overlap(other, sweep):
+                raise ValueError(
+                    f"Balayages {previous + 1} et {position + 1}: combinaisons de "
+                    f"{', '.join(sorted(sweep.parameters))} en double pour un même modèle"
+                )
+
+
+def stratified_sample(queries: List[QueryConfig], per_category: Optional[int], seed: int) -> np.ndarray:
+    """
+    Positions des requêtes retenues: au plus per_category tirées sans remise dans chaque catégorie.
+
+    Les positions sont renvoyées dans l'ordre du fichier; toutes les requêtes si per_category est None.
+    """
+    if per_category is None:
+        return np.arange(len(queries))
+    if per_category < 1:
+        raise ValueError("sample_per_category doit être au moins 1")
+    by_category: Dict[str, List[int]] = {}
+    for position, query in enumerate(queries):
+        by_category.setdefault(query.category, []).append(position)
+    rng = np.random.default_rng([seed, 0])
+    chosen = [
+        rng.choice(positions, size=per_category, replace=False) if len(positions) > per_category else positions
+        for _, positions in sorted(by_category.items())
+    ]
+    return np.sort(np.concatenate(chosen)) if chosen else np.arange(0)
+
+
+class ExperimentPlan:
+    """
+    Plan de travail itérations × requêtes × variantes de modèles, produit à la demande.
+
+    Chaque modèle actif donne une variante par combinaison des balayages
+    qui le visent (une seule, sa configuration déclarée, s'il n'est visé
+    par aucun). Le produit complet n'est jamais construit: l'itération
+    ne conserve que l'ordre des requêtes de l'itération en cours, et
+    len(plan) est calculé.
+
+    L'ordre des requêtes de l'itération i est une permutation tirée d'un
+    générateur initialisé par (graine, i): il est reproductible et ne
+    dépend pas des itérations précédentes. Sans graine configurée, une
+    graine est tirée et exposée (plan.seed) pour être journalisée.
+    """
+
+    def __init__(self, config: ExperimentConfig, models: List[ModelConfig],
+                 queries: Optional[List[QueryConfig]] = None):
+        spec = config.plan
+        _check_sweeps(spec, config.models)
+        self.seed = spec.seed if spec.seed is not None else secrets.randbits(32)
+        self.iterations = config.iterations_per_query
+        self.shuffle = config.randomize_query_order
+        self.queries = config.queries if queries is None else queries
+        self.positions = stratified_sample(self.queries, spec.sample_per_category, self.seed)
+
+        # Variantes de chaque modèle: (modèle, grille); rangs cumulés pour le décodage
+        self.blocks: List[Tuple[ModelConfig, ParameterGrid]] = []
+        for model in models:
+            grids = [
+                ParameterGrid(sweep.parameters) for sweep in spec.sweeps
+                if not sweep.models or model.name in sweep.models
+            ]
+            self.blocks.extend((model, grid) for grid in (grids or [ParameterGrid({})]))
+        self.offsets = [0]
+        for _, grid in self.blocks:
+            self.offsets.append(self.offsets[-1] + len(grid))
+
+    @property
+    def variant_count(self) -> int:
+        return self.offsets[-1]
+
+    @property
+    def query_count(self) -> int:
+        return len(self.positions)
+
+    def __len__(self) -> int:
+        return self.iterations * self.query_count * self.variant_count
+
+    def variant(self, index: int) -> Tuple[ModelConfig, Dict[str, Any]]:
+        """Modèle et paramètres balayés de la variante de rang index."""
+        block = bisect.bisect_right(self.offsets, index) - 1
+        model, grid = self.blocks[block]
+        return model, grid[index - self.offsets[block]]
+
+    def query_order(self, iteration: int) -> np.ndarray:
+        """Positions des requêtes dans l'ordre de l'itération (à partir de 1)."""
+        if not self.shuffle:
+            return self.positions
+        return np.random.default_rng([self.seed, iteration]).permutation(self.positions)
+
+    def __iter__(self) -> Iterator[WorkItem]:
+        index = 0
+        for iteration in range(1, self.iterations + 1):
+            for position in self.query_order(iteration):
+                query = self.queries[position]
+                for variant in range(self.variant_count):
+                    model, overrides = self.variant(variant)
+                    yield WorkItem(index, iteration, query, model, overrides, variant)
+                    index += 1
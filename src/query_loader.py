@@ -1,15 +1,170 @@
-from typing import List, Optional, Union
+import hashlib
+import json
+import os
+from typing import Any, Dict, Iterator, List, Optional, Union
 from pathlib import Path
+import numpy as np
 import pandas as pd
+import pyarrow as pa
 import yaml
 from .config import QueryConfig
 
+try:
+    import python_calamine  # noqa: F401
+    CALAMINE_AVAILABLE = True
+except ImportError:
+    CALAMINE_AVAILABLE = False
+
+REQUIRED_COLUMNS = ('id', 'text', 'category')
+# Colonnes requises lues comme texte: pas d'inférence de type différente d'un bloc CSV à l'autre
+REQUIRED_DTYPES = {column: str for column in REQUIRED_COLUMNS}
+CSV_CHUNKSIZE = 50000
+# Fichier compagnon: contenu lu au format Arrow IPC, à côté du fichier de requêtes
+SIDECAR_SUFFIX = ".queries.arrow"
+SIDECAR_KEY = b'gemqt.query_source'
+# À incrémenter si le contenu du fichier compagnon change
+SIDECAR_VERSION = 1
+
+
+def sidecar_path(file_path: Union[str, Path]) -> Path:
+    """Emplacement du fichier compagnon (caché) d'un fichier de requêtes."""
+    path = Path(file_path)
+    return path.with_name(f".{path.name}{SIDECAR_SUFFIX}")
+
+
+def _file_hash(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _source_key(path: Path) -> Dict[str, Any]:
+    """Clé du fichier compagnon: taille, date de modification et empreinte du fichier source."""
+    stat = path.stat()
+    return {'version': SIDECAR_VERSION, 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns,
+            'sha256': _file_hash(path)}
+
+
+def _open_sidecar(path: Path) -> Optional[pa.ipc.RecordBatchFileReader]:
+    """
+    Ouvre le fichier compagnon s'il correspond au fichier source, sinon None.
+
+    La date de modification suffit si elle est inchangée; sinon l'empreinte
+    du contenu est recalculée (copie ou touch sans modification).
+    """
+    sidecar = sidecar_path(path)
+    if not sidecar.exists():
+        return None
+    try:
+        reader = pa.ipc.open_file(pa.memory_map(str(sidecar), 'r'))
+        key = json.loads(reader.schema.metadata[SIDECAR_KEY])
+    except (OSError, pa.ArrowException, KeyError, TypeError, ValueError):
+        return None
+    stat = path.stat()
+    if key.get('version') != SIDECAR_VERSION or key.get('size') != stat.st_size:
+        return None
+    if key.get('mtime_ns') != stat.st_mtime_ns and key.get('sha256') != _file_hash(path):
+        return None
+    return reader
+
+
+class _SidecarWriter:
+    """Écrit les blocs lus dans le fichier compagnon; abandonne sans erreur si un bloc n'est pas convertible."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.target = sidecar_path(path)
+        self.staging = self.target.with_name(f"{self.target.name}.tmp")
+        self.key = _source_key(path)
+        self.sink = None
+        self.writer = None
+        self.schema = None
+        self.failed = False
+
+    def write(self, df: pd.DataFrame):
+        if self.failed:
+            return
+        try:
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            if self.writer is None:
+                self.schema = table.schema.with_metadata({
+                    **(table.schema.metadata or {}), SIDECAR_KEY: json.dumps(self.key).encode('utf-8'),
+                })
+                self.sink = pa.OSFile(str(self.staging), 'wb')
+                self.writer = pa.ipc.new_file(self.sink, self.schema)
+            # Types inférés d'un bloc à l'autre: alignés sur le premier (colonne entière devenue décimale, etc.)
+            self.writer.write_table(table.cast(self.schema))
+        except (OSError, pa.ArrowException):
+            self.abort()
+
+    def close(self):
+        if self.failed or self.writer is None:
+            return
+        try:
+            self.writer.close()
+            self.sink.close()
+            # Fichier source modifié pendant la lecture: le contenu écrit ne correspond plus à la clé
+            stat = self.path.stat()
+            if (stat.st_size, stat.st_mtime_ns) != (self.key['size'], self.key['mtime_ns']):
+                self.abort()
+                return
+            os.replace(self.staging, self.target)
+        except (OSError, pa.ArrowException):
+            self.abort()
+
+    def abort(self):
+        self.failed = True
+        for handle in (self.writer, self.sink):
+            try:
+                if handle is not None:
+                    handle.close()
+            except (OSError, pa.ArrowException):
+                pass
+        self.staging.unlink(missing_ok=True)
+
+
+def _check_columns(columns, label: str):
+    if not set(REQUIRED_COLUMNS).issubset(columns):
+        missing = set(REQUIRED_COLUMNS) - set(columns)
+        raise ValueError(f"Colonnes manquantes dans le fichier {label}: {missing}")
+
+
+def frame_to_queries(df: pd.DataFrame) -> List[QueryConfig]:
+    """
+    Convertit un DataFrame de requêtes en configurations, colonne par colonne.
+
+    Les colonnes autres que id, text et category sont ajoutées aux
+    métadonnées de chaque requête lorsqu'elles sont renseignées (valeurs
+    Python natives, sérialisables en JSON).
+
+    Args:
+        df: DataFrame contenant au moins les colonnes id, text et category
+
+    Returns:
+        Liste des configurations de requêtes, dans l'ordre des lignes
+    """
+    metadata = [{} for _ in range(len(df))]
+    for column in df.columns:
+        if column in REQUIRED_COLUMNS:
+            continue
+        key, values = str(column), df[column].tolist()
+        for position in np.flatnonzero(df[column].notna().to_numpy()):
+            metadata[position][key] = values[position]
+
+    ids, texts, categories = (df[column].astype(str).tolist() for column in REQUIRED_COLUMNS)
+    return [
+        QueryConfig(id=query_id, text=text, category=category, metadata=query_metadata)
+        for query_id, text, category, query_metadata in zip(ids, texts, categories, metadata)
+    ]
+
 
 class QueryLoader:
     """Classe pour charger les requêtes depuis différentes sources."""
     
     @staticmethod
-    def load_from_excel(file_path: Union[str, Path]) -> List[QueryConfig]:
+    def load_from_excel(file_path: Union[str, Path], use_cache: bool = True) -> List[QueryConfig]:
         """
         Charge les requêtes depuis un fichier Excel.
         
@@ -19,40 +174,72 @@ class QueryLoader:
         - category: Catégorie de la requête
         - Colonnes optionnelles pour les métadonnées (seront ajoutées au dict metadata)
         
+        Le contenu lu est conservé dans un fichier compagnon Arrow: les
+        chargements suivants du même fichier évitent l'analyse du classeur.
+        Le moteur calamine est utilisé s'il est installé (pip install python-calamine).
+        
         Args:
             file_path: Chemin vers le fichier Excel
+            use_cache: Lire et écrire le fichier compagnon
             
         Returns:
             Liste des configurations de requêtes
         """
-        df = pd.read_excel(file_path)
+        path = Path(file_path)
+        reader = _open_sidecar(path) if use_cache else None
+        if reader is not None:
+            return frame_to_queries(reader.read_all().to_pandas())
         
-        required_columns = {'id', 'text', 'category'}
-        if not required_columns.issubset(df.columns):
-            missing = required_columns - set(df.columns)
-            raise ValueError(f"Colonnes manquantes dans le fichier Excel: {missing}")
+        sidecar = _SidecarWriter(path) if use_cache else None
+        engine = 'calamine' if CALAMINE_AVAILABLE else None
+        df = pd.read_excel(path, dtype=REQUIRED_DTYPES, engine=engine)
+        _check_columns(df.columns, "Excel")
+        if sidecar is not None:
+            sidecar.write(df)
+            sidecar.close()
+        return frame_to_queries(df)
+    
+    @staticmethod
+    def iter_csv(file_path: Union[str, Path], chunksize: int = CSV_CHUNKSIZE,
+                 use_cache: bool = True) -> Iterator[List[QueryConfig]]:
+        """
+        Lit un fichier CSV de requêtes par blocs.
         
-        queries = []
-        metadata_columns = [col for col in df.columns if col not in required_columns]
+        Seul le bloc courant est en mémoire sous forme de DataFrame. Le
+        fichier compagnon est écrit au fil de la lecture et n'est publié
+        qu'une fois le fichier lu en entier.
         
-        for _, row in df.iterrows():
-            metadata = {}
-            for col in metadata_columns:
-                if pd.notna(row[col]):
-                    metadata[col] = row[col]
-            
-            query = QueryConfig(
-                id=str(row['id']),
-                text=str(row['text']),
-                category=str(row['category']),
-                metadata=metadata
-            )
-            queries.append(query)
+        Args:
+            file_path: Chemin vers le fichier CSV
+            chunksize: Nombre de lignes par bloc
+            use_cache: Lire et écrire le fichier compagnon
         
-        return queries
+        Yields:
+            Listes de configurations de requêtes (un bloc à la fois)
+        """
+        path = Path(file_path)
+        reader = _open_sidecar(path) if use_cache else None
+        if reader is not None:
+            for index in range(reader.num_record_batches):
+                yield frame_to_queries(reader.get_batch(index).to_pandas())
+            return
+        
+        sidecar = _SidecarWriter(path) if use_cache else None
+        try:
+            for chunk in pd.read_csv(path, dtype=REQUIRED_DTYPES, chunksize=chunksize):
+                _check_columns(chunk.columns, "CSV")
+                if sidecar is not None:
+                    sidecar.write(chunk)
+                yield frame_to_queries(chunk)
+        except BaseException:
+            if sidecar is not None:
+                sidecar.abort()
+            raise
+        if sidecar is not None:
+            sidecar.close()
     
     @staticmethod
-    def load_from_csv(file_path: Union[str, Path]) -> List[QueryConfig]:
+    def load_from_csv(file_path: Union[str, Path], use_cache: bool = True) -> List[QueryConfig]:
         """
         Charge les requêtes depuis un fichier CSV.
         
@@ -64,35 +251,12 @@ class QueryLoader:
         
         Args:
             file_path: Chemin vers le fichier CSV
+            use_cache: Lire et écrire le fichier compagnon
             
         Returns:
             Liste des configurations de requêtes
         """
-        df = pd.read_csv(file_path)
-        
-        required_columns = {'id', 'text', 'category'}
-        if not required_columns.issubset(df.columns):
-            missing = required_columns - set(df.columns)
-            raise ValueError(f"Colonnes manquantes dans le fichier CSV: {missing}")
-        
-        queries = []
-        metadata_columns = [col for col in df.columns if col not in required_columns]
-        
-        for _, row in df.iterrows():
-            metadata = {}
-            for col in metadata_columns:
-                if pd.notna(row[col]):
-                    metadata[col] = row[col]
-            
-            query = QueryConfig(
-                id=str(row['id']),
-                text=str(row['text']),
-                category=str(row['category']),
-                metadata=metadata
-            )
-            queries.append(query)
-        
-        return queries
+        return [query for chunk in QueryLoader.iter_csv(file_path, use_cache=use_cache) for query in chunk]
     
     @staticmethod
     def load_from_yaml(config_data: dict) -> List[QueryConfig]:
@@ -112,7 +276,8 @@ class QueryLoader:
         return queries
     
     @staticmethod
-    def load_queries(config_path: Union[str, Path], external_file: Optional[Union[str, Path]] = None) -> List[QueryConfig]:
+    def load_queries(config_path: Union[str, Path], external_file: Optional[Union[str, Path]] = None,
+                     use_cache: bool = True) -> List[QueryConfig]:
         """
         Charge les requêtes depuis la source appropriée.
         
@@ -122,6 +287,7 @@ class QueryLoader:
         Args:
             config_path: Chemin vers le fichier de configuration YAML
             external_file: Chemin optionnel vers un fichier externe (Excel ou CSV)
+            use_cache: Utiliser le fichier compagnon des fichiers externes
             
         Returns:
             Liste des configurations de requêtes
@@ -132,9 +298,9 @@ class QueryLoader:
                 raise FileNotFoundError(f"Fichier de requêtes non trouvé: {external_file}")
             
             if file_path.suffix.lower() in ['.xlsx', '.xls']:
-                return QueryLoader.load_from_excel(file_path)
+                return QueryLoader.load_from_excel(file_path, use_cache=use_cache)
             elif file_path.suffix.lower() == '.csv':
-                return QueryLoader.load_from_csv(file_path)
+                return QueryLoader.load_from_csv(file_path, use_cache=use_cache)
             else:
                 raise ValueError(f"Format de fichier non supporté: {file_path.suffix}")
         else:
@@ -0,0 +1,122 @@
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session, joinedload
+
+from src.database import ExperimentResult, register_ingest_hook
+from src.url_utils import parse_sources
+
+ERROR_PREFIX = "ERROR:"
+SUMMARY_COLUMNS = ('sources_count', 'response_length', 'is_error', 'error_class', 'input_tokens', 'output_tokens')
+
+# Classes d'erreur, testées dans l'ordre sur le message (première correspondance)
+ERROR_CLASSES: List[Tuple[str, re.Pattern]] = [
+    ('auth', re.compile(r"\b(401|403)\b|api key|clé api|unauthori[sz]ed|forbidden|permission", re.I)),
+    ('rate_limit', re.compile(r"\b429\b|rate.?limit|quota|too many requests|resource.?exhausted", re.I)),
+    ('timeout', re.compile(r"time.?out|timed out|délai", re.I)),
+    ('network', re.compile(r"connection|connexion|network|réseau|dns|ssl", re.I)),
+    ('server', re.compile(r"\b5\d\d\b|server error|internal error|unavailable|overloaded", re.I)),
+    ('request', re.compile(r"\b4\d\d\b|invalid|bad request|not found", re.I)),
+    ('config', re.compile(r"not configured|not available|non configur", re.I)),
+]
+OTHER_ERROR = 'other'
+
+# Noms des compteurs de jetons selon les API (OpenAI/Perplexity, Anthropic, Gemini)
+INPUT_TOKEN_KEYS = ('prompt_tokens', 'input_tokens', 'promptTokenCount')
+OUTPUT_TOKEN_KEYS = ('completion_tokens', 'output_tokens', 'candidatesTokenCount')
+
+
+def _api_metadata(extra_metadata: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    api_metadata = (extra_metadata or {}).get('api_metadata')
+    return api_metadata if isinstance(api_metadata, dict) else {}
+
+
+def error_message(response_raw: Optional[str], extra_metadata: Optional[Dict[str, Any]]) -> Optional[str]:
+    """Message d'erreur enregistré par un client (metadata 'error' ou texte 'ERROR: ...'), sinon None."""
+    api_metadata = _api_metadata(extra_metadata)
+    if api_metadata.get('error'):
+        return str(api_metadata['error'])
+    if api_metadata.get('status') == 'error':
+        return response_raw or 'error'
+    if response_raw and response_raw.startswith(ERROR_PREFIX):
+        return response_raw[len(ERROR_PREFIX):].strip()
+    return None
+
+
+def is_error(response_raw: Optional[str], extra_metadata: Optional[Dict[str, Any]]) -> bool:
+    """Réponse d'erreur enregistrée par un client."""
+    return error_message(response_raw, extra_metadata) is not None
+
+
+def error_class(message: str) -> str:
+    """Classe d'une erreur d'après son message (auth, rate_limit, timeout, network, server, request, config, other)."""
+    for name, pattern in ERROR_CLASSES:
+        if pattern.search(message):
+            return name
+    return OTHER_ERROR
+
+
+def _first_int(mapping: Dict[str, Any], keys: Tuple[str, ...]) -> Optional[int]:
+    for key in keys:
+        value = mapping.get(key)
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return int(value)
+    return None
+
+
+def token_usage(extra_metadata: Optional[Dict[str, Any]]) -> Tuple[Optional[int], Optional[int]]:
+    """Jetons (entrée, sortie) déclarés par l'API, None si absents."""
+    api_metadata = _api_metadata(extra_metadata)
+    for field in ('usage', 'cost'):
+        usage = api_metadata.get(field)
+        if isinstance(usage, dict):
+            tokens = (_first_int(usage, INPUT_TOKEN_KEYS), _first_int(usage, OUTPUT_TOKEN_KEYS))
+            if tokens != (None, None):
+                return tokens
+    return None, None
+
+
+def summarize_result(result: ExperimentResult):
+    """Remplit les colonnes de résumé d'un résultat (SUMMARY_COLUMNS)."""
+    response = result.response_raw
+    message = error_message(response, result.extra_metadata)
+    result.sources_count = len(parse_sources(result.sources_extracted))
+    result.response_length = len(response) if response else 0
+    result.is_error = message is not None
+    result.error_class = error_class(message) if message is not None else None
+    result.input_tokens, result.output_tokens = token_usage(result.extra_metadata)
+
+
+@register_ingest_hook
+def update_summary_columns(session: Session, results: List[ExperimentResult]):
+    """Hook d'ingestion: colonnes de résumé des nouveaux résultats."""
+    for result in results:
+        summarize_result(result)
+
+
+def backfill_summary_columns(session: Session, batch_size: int = 500, only_missing: bool = True) -> int:
+    """
+    Calcule les colonnes de résumé des résultats existants, par lots (un commit par lot).
+
+    Args:
+        batch_size: Nombre de résultats par transaction
+        only_missing: Ne traiter que les résultats sans résumé (reprise possible après interruption)
+
+    Returns:
+        Nombre de résultats traités
+    """
+    query = session.query(ExperimentResult.id)
+    if only_missing:
+        query = query.filter(ExperimentResult.response_length.is_(None))
+    ids = [row[0] for row in query.order_by(ExperimentResult.id)]
+    for start in range(0, len(ids), batch_size):
+        batch = (
+            session.query(ExperimentResult)
+            .options(joinedload(ExperimentResult.response_blob))
+            .filter(ExperimentResult.id.in_(ids[start:start + batch_size]))
+        )
+        for result in batch:
+            summarize_result(result)
+        session.commit()
+        session.expunge_all()
+    return len(ids)
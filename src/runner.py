@@ -1,12 +1,15 @@
 import asyncio
+import gc
 import os
 import uuid
 import time
 import logging
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 
 from src.config import ExperimentConfig, ModelConfig, QueryConfig
-from src.database import get_db_session, ExperimentResult
+from src.database import ExperimentResult
+from src.async_storage import AsyncResultWriter
+from src.plan import ExperimentPlan, WorkItem, variant_config
 from . import get_client
 
 # Configuration du logging
@@ -20,11 +23,19 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Délai de regroupement des écritures: les résultats produits pendant ce délai sont validés en un seul lot
+WRITE_BATCH_DELAY_SECONDS = 1.0
+# Écritures non attendues au plus avant de patienter (mémoire bornée si la base ralentit)
+MAX_PENDING_WRITES = 500
+
 class ExperimentRunner:
     def __init__(self, config: ExperimentConfig):
         self.config = config
         self.session_id = str(uuid.uuid4())
         self.clients = self._initialize_clients()
+        self.variant_clients: Dict[str, Any] = {}  # Clients des variantes balayées, créés à la demande
+        self.writer = AsyncResultWriter(max_delay_seconds=WRITE_BATCH_DELAY_SECONDS)
+        self.pending_writes: List[asyncio.Future] = []
 
     def _initialize_clients(self) -> Dict[str, Any]:
         clients = {}
@@ -40,70 +51,117 @@ class ExperimentRunner:
         return clients
 
     async def run(self):
+        # Objets chargés au démarrage (modules, mappers, clients, configuration) exclus du ramasse-miettes
+        # le temps de l'expérimentation: une collecte complète dans le thread écrivain garderait le GIL plus de 100 ms
+        gc.freeze()
+        self.writer.start()
+        try:
+            await self._run_iterations()
+        finally:
+            await self.writer.close()
+            gc.unfreeze()
+
+    def _client_for(self, item: WorkItem) -> Optional[Any]:
+        """Client de la variante: celui du modèle déclaré, ou créé à la première utilisation d'un balayage."""
+        if not item.overrides:
+            return self.clients.get(item.model.name)
+        label = item.label
+        if label not in self.variant_clients:
+            try:
+                self.variant_clients[label] = get_client(variant_config(item.model, item.overrides))
+            except Exception as e:
+                logger.error(f"[ERREUR] Erreur lors de l'initialisation du client {label}: {e}")
+                self.variant_clients[label] = None
+        return self.variant_clients[label]
+
+    async def _wait_writes(self):
+        """Attend les écritures en attente (les échecs sont journalisés par l'écrivain)."""
+        pending, self.pending_writes = self.pending_writes, []
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    async def _run_item(self, item: WorkItem, client: Any) -> bool:
+        """
+        Exécute une requête du plan et transmet le résultat à l'écrivain. False si la réponse est vide.
+
+        Le commit n'est pas attendu: l'écrivain regroupe les résultats en lots,
+        attendus à la fin de chaque itération (voir _wait_writes).
+        """
+        query, model_name = item.query, item.label
+        try:
+            start_time = time.time()
+            response_data = await client.query(query.text, self.session_id)
+            end_time = time.time()
+            response_time_ms = int((end_time - start_time) * 1000)
+
+            # Validation de la réponse
+            if not response_data:
+                logger.warning(f"[ATTENTION] Réponse vide pour {model_name} et {query.id}")
+                return False
+
+            extra_metadata = {
+                **query.metadata,
+                "api_metadata": response_data.get("metadata", {})
+            }
+            if item.overrides:
+                extra_metadata["parameters"] = item.overrides
+            result = ExperimentResult(
+                id=str(uuid.uuid4()),
+                experiment_id=self.config.experiment_name,
+                session_id=self.session_id,
+                query_id=query.id,
+                query_text=query.text,
+                query_category=query.category,
+                iteration=item.iteration,
+                model_name=model_name,
+                model_type=item.model.type,
+                response_raw=response_data.get("response_raw"),
+                sources_extracted=response_data.get("sources_extracted", []),
+                chain_of_thought=response_data.get("chain_of_thought"),
+                response_time_ms=response_time_ms,
+                extra_metadata=extra_metadata
+            )
+
+            sources_count = len(response_data.get("sources_extracted", []))
+
+            def saved(future: asyncio.Future):
+                if not future.cancelled() and future.exception() is None:
+                    logger.info(f"[SAVED] Sauvegardé: {model_name}/{query.id} ({response_time_ms}ms, {sources_count} sources)")
+
+            future = self.writer.submit(result)
+            future.add_done_callback(saved)
+            self.pending_writes.append(future)
+            if len(self.pending_writes) >= MAX_PENDING_WRITES:
+                await self._wait_writes()
+
+        except Exception as e:
+            logger.error(f"[ERREUR] Erreur {query.id} avec {model_name}: {str(e)[:100]}...")
+        return True
+
+    async def _run_iterations(self):
         logger.info(f"[START] Démarrage de l'expérimentation '{self.config.experiment_name}' avec la session {self.session_id}")
-        total_queries = len(self.config.queries)
-        total_models = len([m for m in self.config.models if m.enabled and m.name in self.clients])
-        total_operations = self.config.iterations_per_query * total_queries * total_models
+        models = [m for m in self.config.models if m.enabled and m.name in self.clients]
+        plan = ExperimentPlan(self.config, models)
+        total_operations = len(plan)
         completed_operations = 0
-        
-        for iteration in range(self.config.iterations_per_query):
-            logger.info(f"[ITER] Itération {iteration + 1}/{self.config.iterations_per_query}")
-            queries_to_run = self.config.queries.copy()
-            if self.config.randomize_query_order:
-                import random
-                random.shuffle(queries_to_run)
-
-            for query in queries_to_run:
-                for model_config in self.config.models:
-                    if model_config.enabled and model_config.name in self.clients:
-                        client = self.clients[model_config.name]
-                        logger.info(f"[QUERY] [{completed_operations+1}/{total_operations}] Requête '{query.text[:50]}...' -> {model_config.name}")
-                        
-                        try:
-                            start_time = time.time()
-                            response_data = await client.query(query.text, self.session_id)
-                            end_time = time.time()
-                            response_time_ms = int((end_time - start_time) * 1000)
-
-                            # Validation de la réponse
-                            if not response_data:
-                                logger.warning(f"[ATTENTION] Réponse vide pour {model_config.name} et {query.id}")
-                                continue
-
-                            result = ExperimentResult(
-                                id=str(uuid.uuid4()),
-                                experiment_id=self.config.experiment_name,
-                                session_id=self.session_id,
-                                query_id=query.id,
-                                query_text=query.text,
-                                query_category=query.category,
-                                iteration=iteration + 1,
-                                model_name=model_config.name,
-                                model_type=model_config.type,
-                                response_raw=response_data.get("response_raw"),
-                                sources_extracted=response_data.get("sources_extracted", []),
-                                chain_of_thought=response_data.get("chain_of_thought"),
-                                response_time_ms=response_time_ms,
-                                extra_metadata={
-                                    **query.metadata,
-                                    "api_metadata": response_data.get("metadata", {})
-                                }
-                            )
-                            
-                            with get_db_session() as session:
-                                session.add(result)
-                                session.commit()
-                            
-                            sources_count = len(response_data.get("sources_extracted", []))
-                            logger.info(f"[SAVED] Sauvegardé: {model_config.name}/{query.id} ({response_time_ms}ms, {sources_count} sources)")
-
-                        except Exception as e:
-                            logger.error(f"[ERREUR] Erreur {query.id} avec {model_config.name}: {str(e)[:100]}...")
-                        
-                        completed_operations += 1
-                
-                if self.config.delay_between_iterations_seconds > 0:
-                    await asyncio.sleep(self.config.delay_between_iterations_seconds)
+        logger.info(f"[PLAN] {plan.iterations} itérations x {plan.query_count} requêtes x {plan.variant_count} variantes de modèles (graine {plan.seed})")
 
-        logger.info(f"[DONE] Expérimentation '{self.config.experiment_name}' terminée. {completed_operations}/{total_operations} opérations réalisées.")
+        iteration = 0
+        for item in plan:
+            if item.iteration != iteration:
+                await self._wait_writes()
+                iteration = item.iteration
+                logger.info(f"[ITER] Itération {iteration}/{plan.iterations}")
+
+            client = self._client_for(item)
+            if client is not None:
+                logger.info(f"[QUERY] [{completed_operations+1}/{total_operations}] Requête '{item.query.text[:50]}...' -> {item.label}")
+                if await self._run_item(item, client):
+                    completed_operations += 1
 
+            # Pause après la dernière variante de chaque requête
+            if item.variant == plan.variant_count - 1 and self.config.delay_between_iterations_seconds > 0:
+                await asyncio.sleep(self.config.delay_between_iterations_seconds)
+
+        await self._wait_writes()
+        logger.info(f"[DONE] Expérimentation '{self.config.experiment_name}' terminée. {completed_operations}/{total_operations} opérations réalisées.")
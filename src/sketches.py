@@ -0,0 +1,426 @@
+import datetime
+import hashlib
+import json
+import math
+import sqlite3
+import struct
+import zlib
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import tuple_
+from sqlalchemy.orm import Session
+
+from src.database import ExperimentResult, ResultSketch, register_ingest_hook
+from src.url_utils import canonical_url, extract_domain, parse_sources, source_url
+
+SketchKey = Tuple[str, str, str]
+GROUP_COLUMNS = ('experiment_id', 'model_name', 'query_id')
+SKETCH_COLUMNS = ('results', 'hll_urls', 'hll_domains', 'latency', 'domains_cms', 'top_domains')
+
+HLL_PRECISION = 11           # 2048 registres: erreur relative ~2,3 %
+DDSKETCH_ACCURACY = 0.01     # Quantiles de latence à 1 % près (erreur relative)
+CMS_WIDTH, CMS_DEPTH = 1024, 4
+TOP_CANDIDATES = 50          # Domaines candidats conservés pour le top des citations
+QUANTILES = (0.5, 0.9, 0.99)
+# Compression rapide: les résumés sont réécrits à chaque lot de résultats (niveau 6: ~8 fois plus lent)
+PACK_LEVEL = 1
+
+
+def _hash64(value: str) -> int:
+    """Empreinte 64 bits stable d'une chaîne (indépendante du processus, contrairement à hash())."""
+    return int.from_bytes(hashlib.blake2b(value.encode('utf-8'), digest_size=8).digest(), 'big')
+
+
+def _pack(payload: bytes) -> bytes:
+    return zlib.compress(payload, PACK_LEVEL)
+
+
+def _unpack(blob: Optional[bytes]) -> Optional[bytes]:
+    return zlib.decompress(blob) if blob else None
+
+
+class HyperLogLog:
+    """Cardinalité approximative d'un ensemble (Flajolet et al. 2007); fusion = maximum des registres."""
+
+    def __init__(self, precision: int = HLL_PRECISION, registers: Optional[np.ndarray] = None):
+        self.precision = precision
+        self.registers = registers if registers is not None else np.zeros(1 << precision, dtype=np.uint8)
+
+    def add(self, value: str):
+        hashed = _hash64(value)
+        index = hashed >> (64 - self.precision)
+        remainder = (hashed << self.precision) & 0xFFFFFFFFFFFFFFFF
+        rank = min(64 - remainder.bit_length() + 1, 64 - self.precision + 1)
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, other: 'HyperLogLog'):
+        np.maximum(self.registers, other.registers, out=self.registers)
+
+    def estimate(self) -> int:
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / np.sum(np.ldexp(1.0, -self.registers.astype(np.int32)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if raw <= 2.5 * m and zeros:
+            return int(round(m * math.log(m / zeros)))  # Petites cardinalités: comptage linéaire
+        return int(round(raw))
+
+    def to_bytes(self) -> bytes:
+        return _pack(bytes([self.precision]) + self.registers.tobytes())
+
+    @classmethod
+    def from_bytes(cls, blob: Optional[bytes]) -> 'HyperLogLog':
+        payload = _unpack(blob)
+        if not payload:
+            return cls()
+        return cls(payload[0], np.frombuffer(payload[1:], dtype=np.uint8).copy())
+
+
+class DDSketch:
+    """
+    Quantiles à erreur relative bornée (Masson et al. 2019): compteurs par intervalle logarithmique.
+
+    Fusion = somme des compteurs; la taille dépend de l'étendue des valeurs, pas de leur nombre.
+    """
+
+    def __init__(self, accuracy: float = DDSKETCH_ACCURACY, bins: Optional[Dict[int, int]] = None,
+                 zero_count: int = 0):
+        self.accuracy = accuracy
+        self.gamma = (1 + accuracy) / (1 - accuracy)
+        self.bins = bins or {}
+        self.zero_count = zero_count
+
+    @property
+    def count(self) -> int:
+        return self.zero_count + sum(self.bins.values())
+
+    def add(self, value: float):
+        if value <= 0:
+            self.zero_count += 1
+            return
+        key = math.ceil(math.log(value, self.gamma))
+        self.bins[key] = self.bins.get(key, 0) + 1
+
+    def merge(self, other: 'DDSketch'):
+        self.zero_count += other.zero_count
+        for key, count in other.bins.items():
+            self.bins[key] = self.bins.get(key, 0) + count
+
+    def quantile(self, q: float) -> Optional[float]:
+        count = self.count
+        if not count:
+            return None
+        rank = q * (count - 1)
+        seen = self.zero_count
+        if seen > rank:
+            return 0.0
+        for key in sorted(self.bins):
+            seen += self.bins[key]
+            if seen > rank:
+                return 2 * self.gamma ** key / (self.gamma + 1)
+        return 2 * self.gamma ** max(self.bins) / (self.gamma + 1)
+
+    def to_bytes(self) -> bytes:
+        keys = np.array(sorted(self.bins), dtype=np.int32)
+        counts = np.array([self.bins[key] for key in keys], dtype=np.uint32)
+        header = struct.pack('<dII', self.accuracy, self.zero_count, len(keys))
+        return _pack(header + keys.tobytes() + counts.tobytes())
+
+    @classmethod
+    def from_bytes(cls, blob: Optional[bytes]) -> 'DDSketch':
+        payload = _unpack(blob)
+        if not payload:
+            return cls()
+        accuracy, zero_count, size = struct.unpack_from('<dII', payload)
+        offset = struct.calcsize('<dII')
+        keys = np.frombuffer(payload, dtype=np.int32, count=size, offset=offset)
+        counts = np.frombuffer(payload, dtype=np.uint32, count=size, offset=offset + 4 * size)
+        return cls(accuracy, dict(zip(keys.tolist(), counts.tolist())), zero_count)
+
+
+class CountMinSketch:
+    """
+    Fréquences approximatives (Cormode et Muthukrishnan 2005), surestimées au plus de e/largeur du total.
+
+    Les éléments les plus fréquents sont suivis dans `candidates` (estimation
+    à l'insertion), ré-estimés après chaque fusion.
+    """
+
+    def __init__(self, width: int = CMS_WIDTH, depth: int = CMS_DEPTH, table: Optional[np.ndarray] = None,
+                 candidates: Optional[Dict[str, int]] = None):
+        self.width, self.depth = width, depth
+        self.table = table if table is not None else np.zeros((depth, width), dtype=np.uint32)
+        self.candidates = dict(candidates or {})
+
+    def _cells(self, value: str) -> Tuple[np.ndarray, np.ndarray]:
+        digest = hashlib.blake2b(value.encode('utf-8'), digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8], 'big'), int.from_bytes(digest[8:], 'big') | 1
+        rows = np.arange(self.depth)
+        return rows, np.array([(first + row * second) % self.width for row in range(self.depth)])
+
+    def add(self, value: str, count: int = 1):
+        rows, columns = self._cells(value)
+        self.table[rows, columns] += count
+        self.candidates[value] = int(self.table[rows, columns].min())
+        if len(self.candidates) > 2 * TOP_CANDIDATES:
+            self._prune()
+
+    def estimate(self, value: str) -> int:
+        rows, columns = self._cells(value)
+        return int(self.table[rows, columns].min())
+
+    def _prune(self):
+        top = sorted(self.candidates.items(), key=lambda item: (-item[1], item[0]))[:TOP_CANDIDATES]
+        self.candidates = dict(top)
+
+    def merge(self, other: 'CountMinSketch'):
+        self.table += other.table
+        keys = set(self.candidates) | set(other.candidates)
+        self.candidates = {key: self.estimate(key) for key in keys}
+        self._prune()
+
+    def top(self, n: int = 10) -> List[Tuple[str, int]]:
+        return sorted(self.candidates.items(), key=lambda item: (-item[1], item[0]))[:n]
+
+    def to_bytes(self) -> bytes:
+        return _pack(struct.pack('<II', self.depth, self.width) + self.table.tobytes())
+
+    @classmethod
+    def from_bytes(cls, blob: Optional[bytes], candidates: Optional[Dict[str, int]] = None) -> 'CountMinSketch':
+        payload = _unpack(blob)
+        if not payload:
+            return cls(candidates=candidates)
+        depth, width = struct.unpack_from('<II', payload)
+        table = np.frombuffer(payload, dtype=np.uint32, offset=8).reshape(depth, width).copy()
+        return cls(width, depth, table, candidates)
+
+
+class SketchSet:
+    """Résumés d'un groupe de résultats: URLs et domaines distincts, latences, citations par domaine."""
+
+    def __init__(self, results: int = 0, urls: Optional[HyperLogLog] = None, domains: Optional[HyperLogLog] = None,
+                 latency: Optional[DDSketch] = None, citations: Optional[CountMinSketch] = None):
+        self.results = results
+        self.urls = urls or HyperLogLog()
+        self.domains = domains or HyperLogLog()
+        self.latency = latency or DDSketch()
+        self.citations = citations or CountMinSketch()
+
+    def observe(self, sources_extracted: Any, response_time_ms: Optional[int]):
+        self.results += 1
+        for source in parse_sources(sources_extracted):
+            url = source_url(source)
+            if not url:
+                continue
+            canonical, domain = canonical_url(url), extract_domain(url)
+            if canonical:
+                self.urls.add(canonical)
+            if domain:
+                self.domains.add(domain)
+                self.citations.add(domain)
+        if response_time_ms is not None:
+            self.latency.add(response_time_ms)
+
+    def merge(self, other: 'SketchSet'):
+        self.results += other.results
+        self.urls.merge(other.urls)
+        self.domains.merge(other.domains)
+        self.latency.merge(other.latency)
+        self.citations.merge(other.citations)
+
+    def to_columns(self) -> Dict[str, Any]:
+        self.citations._prune()
+        return {
+            'results': self.results, 'hll_urls': self.urls.to_bytes(), 'hll_domains': self.domains.to_bytes(),
+            'latency': self.latency.to_bytes(), 'domains_cms': self.citations.to_bytes(),
+            'top_domains': self.citations.candidates,
+        }
+
+    @classmethod
+    def from_columns(cls, columns: Dict[str, Any]) -> 'SketchSet':
+        candidates = columns.get('top_domains') or {}
+        if isinstance(candidates, str):
+            candidates = json.loads(candidates)
+        return cls(
+            columns.get('results') or 0,
+            HyperLogLog.from_bytes(columns.get('hll_urls')), HyperLogLog.from_bytes(columns.get('hll_domains')),
+            DDSketch.from_bytes(columns.get('latency')), CountMinSketch.from_bytes(columns.get('domains_cms'), candidates),
+        )
+
+
+def _sketch_key(result: ExperimentResult) -> SketchKey:
+    return result.experiment_id, result.model_name, result.query_id
+
+
+def _store(row: ResultSketch, sketch: SketchSet):
+    for column, value in sketch.to_columns().items():
+        setattr(row, column, value)
+    row.updated_at = datetime.datetime.utcnow()
+
+
+def _merge_row(row: ResultSketch, delta: SketchSet):
+    """
+    Ajoute les résumés d'un lot à une ligne existante.
+
+    Seules les colonnes touchées par le lot sont décompressées et réécrites:
+    un lot sans source ne recompresse ni les HyperLogLog ni le Count-Min.
+    """
+    row.results = (row.results or 0) + delta.results
+    if delta.latency.count:
+        latency = DDSketch.from_bytes(row.latency)
+        latency.merge(delta.latency)
+        row.latency = latency.to_bytes()
+    if delta.urls.registers.any():
+        urls = HyperLogLog.from_bytes(row.hll_urls)
+        urls.merge(delta.urls)
+        row.hll_urls = urls.to_bytes()
+    if delta.citations.candidates:
+        domains = HyperLogLog.from_bytes(row.hll_domains)
+        domains.merge(delta.domains)
+        row.hll_domains = domains.to_bytes()
+        candidates = row.top_domains or {}
+        if isinstance(candidates, str):
+            candidates = json.loads(candidates)
+        citations = CountMinSketch.from_bytes(row.domains_cms, candidates)
+        citations.merge(delta.citations)
+        row.domains_cms = citations.to_bytes()
+        row.top_domains = citations.candidates
+    row.updated_at = datetime.datetime.utcnow()
+
+
+@register_ingest_hook
+def update_sketches(session: Session, results: List[ExperimentResult]):
+    """
+    Hook d'ingestion: ajoute les nouveaux résultats aux résumés de leur groupe.
+
+    Les résultats du lot sont résumés en mémoire, puis chaque groupe est lu
+    (une requête pour le lot) et réécrit une seule fois par appel de persist_results.
+    """
+    deltas: Dict[SketchKey, SketchSet] = {}
+    for result in results:
+        deltas.setdefault(_sketch_key(result), SketchSet()).observe(result.sources_extracted, result.response_time_ms)
+    key_columns = tuple_(ResultSketch.experiment_id, ResultSketch.model_name, ResultSketch.query_id)
+    rows = {
+        _sketch_key(row): row
+        for row in session.query(ResultSketch).filter(key_columns.in_(list(deltas)))
+    }
+    for key, delta in deltas.items():
+        row = rows.get(key)
+        if row is None:
+            row = ResultSketch(**dict(zip(GROUP_COLUMNS, key)))
+            session.add(row)
+            _store(row, delta)
+        else:
+            _merge_row(row, delta)
+
+
+def rebuild_sketches(session: Session, batch_size: int = 1000) -> int:
+    """
+    Recalcule entièrement result_sketches à partir de la table results.
+
+    Returns:
+        Nombre de résultats résumés
+    """
+    session.query(ResultSketch).delete(synchronize_session=False)
+    rows = session.query(
+        ExperimentResult.experiment_id, ExperimentResult.model_name, ExperimentResult.query_id,
+        ExperimentResult.sources_extracted, ExperimentResult.response_time_ms,
+    ).yield_per(batch_size)
+    sketches: Dict[SketchKey, SketchSet] = {}
+    count = 0
+    for row in rows:
+        key = (row.experiment_id, row.model_name, row.query_id)
+        sketches.setdefault(key, SketchSet()).observe(row.sources_extracted, row.response_time_ms)
+        count += 1
+    for key, sketch in sketches.items():
+        stored = ResultSketch(**dict(zip(GROUP_COLUMNS, key)))
+        _store(stored, sketch)
+        session.add(stored)
+    session.commit()
+    return count
+
+
+def update_sketches_sqlite(conn: sqlite3.Connection, rows: Iterable[Tuple[str, str, str, Any, Optional[int]]]):
+    """
+    Ajoute des résultats (experiment_id, model_name, query_id, sources_extracted, response_time_ms)
+    aux résumés d'une connexion sqlite3 brute (fusion de bases, voir src/merge.py).
+    """
+    groups: Dict[SketchKey, List[Tuple[Any, Optional[int]]]] = {}
+    for experiment_id, model_name, query_id, sources, latency in rows:
+        groups.setdefault((experiment_id, model_name, query_id), []).append((sources, latency))
+    select = ", ".join(SKETCH_COLUMNS)
+    for key, members in groups.items():
+        row = conn.execute(
+            f"SELECT {select} FROM main.result_sketches WHERE experiment_id = ? AND model_name = ? AND query_id = ?",
+            key,
+        ).fetchone()
+        sketch = SketchSet.from_columns(dict(zip(SKETCH_COLUMNS, row))) if row else SketchSet()
+        for sources, latency in members:
+            sketch.observe(sources, latency)
+        columns = sketch.to_columns()
+        columns['top_domains'] = json.dumps(columns['top_domains'])
+        names = GROUP_COLUMNS + SKETCH_COLUMNS + ('updated_at',)
+        conn.execute(
+            f"INSERT OR REPLACE INTO main.result_sketches ({', '.join(names)}) VALUES ({', '.join('?' for _ in names)})",
+            (*key, *(columns[column] for column in SKETCH_COLUMNS), str(datetime.datetime.utcnow())),
+        )
+
+
+def merge_summaries(rows: Iterable[Dict[str, Any]], group_by: Sequence[str] = ('model_name',),
+                    top: int = 5) -> List[Dict[str, Any]]:
+    """
+    Fusionne des lignes de result_sketches (dicts: GROUP_COLUMNS + SKETCH_COLUMNS) par groupe.
+
+    Returns:
+        Liste de dicts: colonnes de groupe, results, distinct_urls,
+        distinct_domains, latency_p50/p90/p99, top_domains [(domaine, citations)]
+    """
+    group_by = list(group_by)
+    unknown = set(group_by) - set(GROUP_COLUMNS)
+    if unknown:
+        raise ValueError(f"Colonnes de regroupement inconnues: {', '.join(sorted(unknown))}")
+    merged: Dict[Tuple, SketchSet] = {}
+    for row in rows:
+        key = tuple(row[column] for column in group_by)
+        sketch = SketchSet.from_columns(row)
+        if key in merged:
+            merged[key].merge(sketch)
+        else:
+            merged[key] = sketch
+
+    report = []
+    for key, sketch in sorted(merged.items()):
+        entry = {
+            **dict(zip(group_by, key)),
+            'results': sketch.results,
+            'distinct_urls': sketch.urls.estimate(),
+            'distinct_domains': sketch.domains.estimate(),
+        }
+        for q in QUANTILES:
+            entry[f'latency_p{int(q * 100)}'] = sketch.latency.quantile(q)
+        entry['top_domains'] = sketch.citations.top(top)
+        report.append(entry)
+    return report
+
+
+def approx_summary(session: Session, group_by: Sequence[str] = ('model_name',), experiment_id: Optional[str] = None,
+                   top: int = 5) -> List[Dict[str, Any]]:
+    """
+    Synthèse approximative par groupe (sous-ensemble de GROUP_COLUMNS), par fusion des résumés.
+
+    Le coût dépend du nombre de résumés fusionnés (un par expérience,
+    modèle et requête), pas du nombre de résultats ni de sources.
+
+    Returns:
+        Voir merge_summaries
+    """
+    query = session.query(ResultSketch)
+    if experiment_id:
+        query = query.filter(ResultSketch.experiment_id == experiment_id)
+    rows = (
+        {column: getattr(row, column) for column in GROUP_COLUMNS + SKETCH_COLUMNS}
+        for row in query.yield_per(200)
+    )
+    return merge_summaries(rows, group_by, top)
@@ -0,0 +1,191 @@
+import os
+import sqlite3
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Union
+
+SNAPSHOT_SUFFIX = ".snapshot.db"
+# Tables où l'ingestion ne fait qu'ajouter des lignes (rowid croissant): copiées par rowid
+APPEND_ONLY_TABLES = ['compression_dictionaries', 'response_blobs', 'results', 'source_terms', 'response_fts']
+# Index WITHOUT ROWID rattachés aux résultats: copiés pour les nouveaux résultats
+RESULT_KEYED_TABLES = ['minhash_buckets', 'source_postings']
+# Les autres tables (agrégats, statistiques, migrations) sont petites et recopiées entièrement
+BUSY_TIMEOUT_MS = 5000
+
+PathLike = Union[str, Path]
+
+
+def snapshot_path(db_path: PathLike) -> Path:
+    """Emplacement par défaut de l'instantané, à côté de la base (les partitions restent partagées)."""
+    path = Path(db_path).resolve()
+    return path.with_name(path.stem + SNAPSHOT_SUFFIX)
+
+
+def read_only_uri(db_path: PathLike) -> str:
+    """URI SQLite ouvrant la base en lecture seule."""
+    return f"{Path(db_path).resolve().as_uri()}?mode=ro"
+
+
+def _tables(conn: sqlite3.Connection, schema: str) -> Dict[str, str]:
+    """Tables utilisateur (hors tables internes SQLite et FTS5) et leur définition."""
+    rows = conn.execute(f"SELECT name, sql FROM {schema}.sqlite_master WHERE type = 'table'").fetchall()
+    virtual = [name for name, sql in rows if sql and sql.upper().startswith("CREATE VIRTUAL TABLE")]
+    return {
+        name: sql for name, sql in rows
+        if not name.startswith('sqlite_') and not any(name.startswith(f"{table}_") for table in virtual)
+    }
+
+
+def _columns(conn: sqlite3.Connection, schema: str, table: str) -> List[str]:
+    return [row[1] for row in conn.execute(f"PRAGMA {schema}.table_info({table})")]
+
+
+def _has_rowid_alias(conn: sqlite3.Connection, schema: str, table: str) -> bool:
+    keys = [row for row in conn.execute(f"PRAGMA {schema}.table_info({table})") if row[5]]
+    return len(keys) == 1 and keys[0][2].upper() == 'INTEGER'
+
+
+def _max_rowid(conn: sqlite3.Connection, schema: str, table: str) -> int:
+    return conn.execute(f"SELECT COALESCE(MAX(rowid), 0) FROM {schema}.{table}").fetchone()[0]
+
+
+def full_snapshot(db_path: PathLike, output: Optional[PathLike] = None) -> Dict[str, Any]:
+    """
+    Copie cohérente de la base par l'API de sauvegarde en ligne de SQLite.
+
+    La copie est faite en une seule étape, dans une transaction de lecture:
+    en mode WAL, le runner continue d'écrire pendant la copie. Elle est
+    écrite à côté puis renommée, les lecteurs de l'instantané précédent
+    ne sont pas interrompus.
+
+    Returns:
+        Dict (mode, path, rows par table, seconds)
+    """
+    started = time.perf_counter()
+    output = Path(output) if output else snapshot_path(db_path)
+    staging = output.with_name(f".{output.name}.tmp")
+    staging.unlink(missing_ok=True)
+
+    source = sqlite3.connect(read_only_uri(db_path), uri=True, timeout=BUSY_TIMEOUT_MS / 1000)
+    target = sqlite3.connect(str(staging))
+    try:
+        source.backup(target)
+        # L'instantané n'a qu'un lecteur à la fois et pas d'écrivain: journal classique, sans -wal
+        target.execute("PRAGMA journal_mode=DELETE")
+        rows = {'results': target.execute("SELECT COUNT(*) FROM results").fetchone()[0]}
+    finally:
+        target.close()
+        source.close()
+    os.replace(staging, output)
+    return {'mode': 'full', 'path': output, 'rows': rows, 'seconds': time.perf_counter() - started}
+
+
+def _keyed_checksum(conn: sqlite3.Connection, schema: str, table: str, condition: str = "1",
+                    params: Sequence[Any] = ()) -> tuple:
+    """Nombre de lignes et sommes (modulo 2^31 - 1) des colonnes entières d'une table rattachée aux résultats."""
+    columns = [row[1] for row in conn.execute(f"PRAGMA {schema}.table_info({table})") if row[2].upper() == 'INTEGER']
+    sums = "".join(f", SUM({column} % 2147483647)" for column in columns)
+    return conn.execute(f"SELECT COUNT(*){sums} FROM {schema}.{table} WHERE {condition}", params).fetchone()
+
+
+def _incremental_plan(conn: sqlite3.Connection) -> Optional[Dict[str, int]]:
+    """
+    Rowid maximal déjà copié de chaque table à ajout seul, ou None si une copie complète est nécessaire.
+
+    L'instantané n'est complété que si le schéma est identique et si les lignes
+    déjà copiées sont toujours présentes (pas de suppression ni de reconstruction).
+    Les index rattachés aux résultats (RESULT_KEYED_TABLES), réécrits en entier
+    par rebuild-minhash ou la reconstruction de l'index des sources, sont
+    comparés par une somme de contrôle sur les résultats déjà copiés.
+    """
+    live_tables, snapshot_tables = _tables(conn, 'live'), _tables(conn, 'main')
+    if live_tables != snapshot_tables:
+        return None
+    plan = {}
+    for table in APPEND_ONLY_TABLES:
+        if table not in live_tables:
+            continue
+        copied = _max_rowid(conn, 'main', table)
+        snapshot_count = conn.execute(f"SELECT COUNT(*) FROM main.{table}").fetchone()[0]
+        # Comptes sans parcourir les lignes déjà copiées: total (plus petit index) moins les ajouts
+        live_total = conn.execute(f"SELECT COUNT(*) FROM live.{table}").fetchone()[0]
+        live_new = conn.execute(f"SELECT COUNT(*) FROM live.{table} WHERE rowid > ?", (copied,)).fetchone()[0]
+        if live_total - live_new != snapshot_count:
+            return None
+        plan[table] = copied
+
+    new_results = "result_id NOT IN (SELECT id FROM live.results WHERE rowid > ?)"
+    for table in RESULT_KEYED_TABLES:
+        if table not in live_tables:
+            continue
+        live_checksum = _keyed_checksum(conn, 'live', table, new_results, (plan.get('results', 0),))
+        if live_checksum != _keyed_checksum(conn, 'main', table):
+            return None
+    return plan
+
+
+def _copy_new_rows(conn: sqlite3.Connection, plan: Dict[str, int]) -> Dict[str, int]:
+    live_tables = _tables(conn, 'live')
+    rows = {}
+    for table, copied in plan.items():
+        columns = _columns(conn, 'live', table)
+        if not _has_rowid_alias(conn, 'live', table):
+            columns = ['rowid'] + columns  # Rowids identiques à la base: les prochains ajouts restent repérables
+        column_list = ", ".join(columns)
+        rows[table] = conn.execute(
+            f"INSERT INTO main.{table} ({column_list}) SELECT {column_list} FROM live.{table} WHERE rowid > ?",
+            (copied,),
+        ).rowcount
+
+    new_results = "SELECT id FROM live.results WHERE rowid > ?"
+    for table in RESULT_KEYED_TABLES:
+        if table not in live_tables:
+            continue
+        rows[table] = conn.execute(
+            f"INSERT OR IGNORE INTO main.{table} SELECT * FROM live.{table} WHERE result_id IN ({new_results})",
+            (plan.get('results', 0),),
+        ).rowcount
+
+    for table in sorted(set(live_tables) - set(plan) - set(RESULT_KEYED_TABLES)):
+        conn.execute(f"DELETE FROM main.{table}")
+        rows[table] = conn.execute(f"INSERT INTO main.{table} SELECT * FROM live.{table}").rowcount
+    return rows
+
+
+def refresh_snapshot(db_path: PathLike, output: Optional[PathLike] = None, full: bool = False) -> Dict[str, Any]:
+    """
+    Met à jour l'instantané de la base: ajout des seules nouvelles lignes si possible.
+
+    La lecture de la base active se fait dans une seule transaction de
+    lecture (vue cohérente, sans bloquer le runner en mode WAL). Une copie
+    complète est faite si l'instantané n'existe pas, si le schéma a changé
+    si des lignes ont été supprimées (archivage, reconstruction d'index) ou si
+    les index rattachés aux résultats ont été réécrits (rebuild-minhash).
+    Les modifications en place (compact-responses, backfill-summary --all)
+    ne sont pas détectées: utiliser full=True après ces commandes.
+
+    Returns:
+        Dict (mode, path, rows ajoutées par table, seconds)
+    """
+    output = Path(output) if output else snapshot_path(db_path)
+    if full or not output.exists():
+        return full_snapshot(db_path, output)
+
+    started = time.perf_counter()
+    conn = sqlite3.connect(str(output), isolation_level=None, uri=True, timeout=BUSY_TIMEOUT_MS / 1000)
+    try:
+        conn.execute("ATTACH DATABASE ? AS live", (read_only_uri(db_path),))
+        # Transaction différée: lecture cohérente de la base active, écriture dans l'instantané seul
+        conn.execute("BEGIN")
+        plan = _incremental_plan(conn)
+        if plan is None:
+            conn.execute("ROLLBACK")
+            rows = None
+        else:
+            rows = _copy_new_rows(conn, plan)
+            conn.execute("COMMIT")
+    finally:
+        conn.close()
+    if rows is None:
+        return full_snapshot(db_path, output)
+    return {'mode': 'incremental', 'path': output, 'rows': rows, 'seconds': time.perf_counter() - started}
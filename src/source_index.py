@@ -0,0 +1,151 @@
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from src.database import ExperimentResult, SourcePosting, SourceTerm, register_ingest_hook
+from src.url_utils import canonical_url, extract_domain, parse_sources, source_url
+
+KINDS = ('url', 'domain')
+TermKey = Tuple[str, str]
+
+
+def result_terms(sources_extracted: Any) -> Dict[TermKey, int]:
+    """Termes (URL canonique et domaine) cités par un résultat, avec leur première position (1 = premier)."""
+    terms: Dict[TermKey, int] = {}
+    for position, source in enumerate(parse_sources(sources_extracted), start=1):
+        url = source_url(source)
+        if not url:
+            continue
+        for kind, value in (('url', canonical_url(url)), ('domain', extract_domain(url))):
+            if value and (kind, value) not in terms:
+                terms[(kind, value)] = position
+    return terms
+
+
+def _resolve_terms(session: Session, keys: Iterable[TermKey]) -> Dict[TermKey, SourceTerm]:
+    """Retourne les termes du dictionnaire, en créant ceux qui manquent."""
+    keys = set(keys)
+    resolved: Dict[TermKey, SourceTerm] = {}
+    for kind in KINDS:
+        values = sorted(value for key_kind, value in keys if key_kind == kind)
+        for start in range(0, len(values), 500):
+            existing = session.query(SourceTerm).filter(
+                SourceTerm.kind == kind, SourceTerm.value.in_(values[start:start + 500])
+            )
+            resolved.update({(term.kind, term.value): term for term in existing})
+    for kind, value in keys - set(resolved):
+        term = SourceTerm(kind=kind, value=value)
+        session.add(term)
+        resolved[(kind, value)] = term
+    return resolved
+
+
+def index_results(session: Session, rows: Iterable[Tuple[str, Any]]):
+    """Ajoute les postings de (result_id, sources_extracted) à l'index inversé."""
+    per_result = [(result_id, result_terms(sources)) for result_id, sources in rows]
+    terms = _resolve_terms(session, (key for _, found in per_result for key in found))
+    session.add_all([
+        SourcePosting(term=terms[key], result_id=result_id, position=position)
+        for result_id, found in per_result
+        for key, position in found.items()
+    ])
+
+
+@register_ingest_hook
+def update_source_index(session: Session, results: List[ExperimentResult]):
+    """Hook d'ingestion: indexe les sources des nouveaux résultats."""
+    index_results(session, [(result.id, result.sources_extracted) for result in results])
+
+
+def rebuild_source_index(session: Session, batch_size: int = 1000) -> int:
+    """
+    Reconstruit entièrement l'index inversé (un commit par lot de résultats).
+
+    Returns:
+        Nombre de résultats indexés
+    """
+    session.query(SourcePosting).delete(synchronize_session=False)
+    session.query(SourceTerm).delete(synchronize_session=False)
+    session.commit()
+    ids = [row[0] for row in session.query(ExperimentResult.id).order_by(ExperimentResult.id)]
+    for start in range(0, len(ids), batch_size):
+        rows = session.query(ExperimentResult.id, ExperimentResult.sources_extracted).filter(
+            ExperimentResult.id.in_(ids[start:start + batch_size])
+        ).all()
+        index_results(session, rows)
+        session.commit()
+        session.expunge_all()
+    return len(ids)
+
+
+def normalise_term(value: str, kind: Optional[str] = None) -> TermKey:
+    """
+    Forme indexée d'une URL ou d'un domaine saisi par l'utilisateur.
+
+    Sans `kind`, une valeur avec un chemin est traitée comme une URL,
+    sinon comme un domaine.
+    """
+    if kind is None:
+        kind = 'url' if '/' in canonical_url(value) else 'domain'
+    return kind, canonical_url(value) if kind == 'url' else extract_domain(value)
+
+
+def escape_like(value: str) -> str:
+    """Échappe les jokers de LIKE (% et _) et le caractère d'échappement `\\` d'une valeur saisie."""
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def lookup(session: Session, value: str, kind: Optional[str] = None, experiment_id: Optional[str] = None,
+           model_name: Optional[str] = None, include_subdomains: bool = False) -> List[Dict[str, Any]]:
+    """
+    Occurrences d'une URL ou d'un domaine cité, lues dans les listes de postings.
+
+    Args:
+        value: URL ou domaine (normalisé comme à l'indexation)
+        kind: 'url' ou 'domain' (déduit de la valeur si absent)
+        experiment_id: Limiter à une expérience
+        model_name: Limiter à un modèle
+        include_subdomains: Pour un domaine, inclure ses sous-domaines (*.domaine)
+
+    Returns:
+        Liste de dicts (terme, résultat, requête, modèle, itération, horodatage, position)
+    """
+    kind, term_value = normalise_term(value, kind)
+    term_filter = SourceTerm.value == term_value
+    if include_subdomains and kind == 'domain':
+        term_filter = term_filter | SourceTerm.value.like(f"%.{escape_like(term_value)}", escape='\\')
+
+    query = (
+        session.query(
+            SourceTerm.value, SourcePosting.position, ExperimentResult.id, ExperimentResult.experiment_id,
+            ExperimentResult.session_id, ExperimentResult.query_id, ExperimentResult.model_name,
+            ExperimentResult.iteration, ExperimentResult.timestamp,
+        )
+        .join(SourcePosting, SourcePosting.term_id == SourceTerm.id)
+        .join(ExperimentResult, ExperimentResult.id == SourcePosting.result_id)
+        .filter(SourceTerm.kind == kind, term_filter)
+    )
+    if experiment_id:
+        query = query.filter(ExperimentResult.experiment_id == experiment_id)
+    if model_name:
+        query = query.filter(ExperimentResult.model_name == model_name)
+
+    return [
+        {
+            'term': term, 'position': position, 'result_id': result_id, 'experiment_id': experiment,
+            'session_id': session_id, 'query_id': query_id, 'model_name': model, 'iteration': iteration,
+            'timestamp': timestamp,
+        }
+        for term, position, result_id, experiment, session_id, query_id, model, iteration, timestamp
+        in query.order_by(ExperimentResult.timestamp)
+    ]
+
+
+def summarize_occurrences(occurrences: List[Dict[str, Any]], by: str = 'model_name') -> List[Tuple[Any, int]]:
+    """Nombre d'occurrences par modèle, requête ou jour ('day'), par effectif décroissant."""
+    if by == 'day':
+        counts = Counter(row['timestamp'].date().isoformat() if row['timestamp'] else None for row in occurrences)
+        return sorted(counts.items(), key=lambda item: item[0] or '')
+    counts = Counter(row[by] for row in occurrences)
+    return counts.most_common()
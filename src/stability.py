@@ -0,0 +1,151 @@
+import datetime
+import math
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from src.database import ExperimentResult, StabilityStat, register_ingest_hook
+from src.url_utils import canonical_url, parse_sources, source_urls
+
+StatKey = Tuple[str, str, str]
+
+
+def welford_update(count: int, mean: float, m2: float, value: float) -> Tuple[int, float, float]:
+    """Ajoute une observation à (effectif, moyenne, somme des carrés des écarts)."""
+    count += 1
+    delta = value - mean
+    mean += delta / count
+    m2 += delta * (value - mean)
+    return count, mean, m2
+
+
+def variance(count: int, m2: float) -> Optional[float]:
+    """Variance d'échantillon, None en dessous de deux observations."""
+    return m2 / (count - 1) if count > 1 else None
+
+
+def source_set(sources: Any) -> List[str]:
+    """Ensemble trié des URLs canoniques citées."""
+    return sorted({url for url in map(canonical_url, source_urls(sources)) if url})
+
+
+def jaccard_distance(a: List[str], b: List[str]) -> float:
+    union = set(a) | set(b)
+    if not union:
+        return 0.0
+    return 1.0 - len(set(a) & set(b)) / len(union)
+
+
+def _new_stat(key: StatKey) -> StabilityStat:
+    experiment_id, query_id, model_name = key
+    return StabilityStat(
+        experiment_id=experiment_id, query_id=query_id, model_name=model_name,
+        observations=0, sources_mean=0.0, sources_m2=0.0,
+        latency_count=0, latency_mean=0.0, latency_m2=0.0,
+        churn_count=0, churn_mean=0.0, churn_m2=0.0,
+    )
+
+
+def observe(stat: StabilityStat, sources_extracted: Any, response_time_ms: Optional[int],
+            iteration: Optional[int]):
+    """
+    Met à jour les statistiques d'une clé avec un nouveau résultat.
+
+    Le nombre de sources compte toutes les citations (comme total_sources
+    dans les exports); le renouvellement compare les ensembles d'URLs
+    canoniques de deux résultats consécutifs (distance de Jaccard).
+    """
+    extracted = parse_sources(sources_extracted)
+    sources = source_set(extracted)
+    stat.observations, stat.sources_mean, stat.sources_m2 = welford_update(
+        stat.observations, stat.sources_mean, stat.sources_m2, len(extracted)
+    )
+    if response_time_ms is not None:
+        stat.latency_count, stat.latency_mean, stat.latency_m2 = welford_update(
+            stat.latency_count, stat.latency_mean, stat.latency_m2, response_time_ms
+        )
+    if stat.last_sources is not None:
+        stat.churn_count, stat.churn_mean, stat.churn_m2 = welford_update(
+            stat.churn_count, stat.churn_mean, stat.churn_m2, jaccard_distance(stat.last_sources, sources)
+        )
+    stat.last_sources = sources
+    stat.last_iteration = iteration
+    stat.updated_at = datetime.datetime.utcnow()
+
+
+@register_ingest_hook
+def update_stability(session: Session, results: List[ExperimentResult]):
+    """Hook d'ingestion: intègre les résultats écrits aux statistiques de stabilité."""
+    stats: Dict[StatKey, StabilityStat] = {}
+    for result in results:
+        key = (result.experiment_id, result.query_id, result.model_name)
+        stat = stats.get(key)
+        if stat is None:
+            stat = session.get(StabilityStat, key)
+            if stat is None:
+                stat = _new_stat(key)
+                session.add(stat)
+            stats[key] = stat
+        observe(stat, result.sources_extracted, result.response_time_ms, result.iteration)
+
+
+def rebuild_stability(session: Session, batch_size: int = 1000) -> int:
+    """
+    Recalcule entièrement stability_stats à partir de la table results.
+
+    Les résultats sont parcourus par ordre chronologique, comme à l'ingestion.
+
+    Returns:
+        Nombre de résultats intégrés
+    """
+    session.query(StabilityStat).delete(synchronize_session=False)
+    rows = (
+        session.query(
+            ExperimentResult.experiment_id, ExperimentResult.query_id, ExperimentResult.model_name,
+            ExperimentResult.iteration, ExperimentResult.sources_extracted, ExperimentResult.response_time_ms,
+        )
+        .order_by(ExperimentResult.timestamp, ExperimentResult.iteration)
+        .yield_per(batch_size)
+    )
+    stats: Dict[StatKey, StabilityStat] = {}
+    count = 0
+    for row in rows:
+        key = (row.experiment_id, row.query_id, row.model_name)
+        if key not in stats:
+            stats[key] = _new_stat(key)
+        observe(stats[key], row.sources_extracted, row.response_time_ms, row.iteration)
+        count += 1
+    session.add_all(stats.values())
+    session.commit()
+    return count
+
+
+def stability_report(session: Session, experiment_id: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Indicateurs de stabilité par (expérience, requête, modèle).
+
+    Returns:
+        Liste de dicts: effectif, moyenne/écart-type/CV du nombre de sources,
+        latence moyenne et écart-type, renouvellement moyen des sources
+    """
+    query = session.query(StabilityStat)
+    if experiment_id:
+        query = query.filter(StabilityStat.experiment_id == experiment_id)
+    report = []
+    for stat in query.order_by(StabilityStat.experiment_id, StabilityStat.query_id, StabilityStat.model_name):
+        sources_var = variance(stat.observations, stat.sources_m2)
+        latency_var = variance(stat.latency_count, stat.latency_m2)
+        sources_std = math.sqrt(sources_var) if sources_var is not None else None
+        report.append({
+            'experiment_id': stat.experiment_id,
+            'query_id': stat.query_id,
+            'model_name': stat.model_name,
+            'observations': stat.observations,
+            'sources_mean': stat.sources_mean,
+            'sources_std': sources_std,
+            'sources_cv': sources_std / stat.sources_mean if sources_std is not None and stat.sources_mean else None,
+            'latency_mean': stat.latency_mean if stat.latency_count else None,
+            'latency_std': math.sqrt(latency_var) if latency_var is not None else None,
+            'churn_mean': stat.churn_mean if stat.churn_count else None,
+        })
+    return report
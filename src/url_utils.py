@@ -0,0 +1,77 @@
+import json
+from typing import Iterable, List, Optional, Union
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+# Paramètres de suivi sans effet sur le document cité
+TRACKING_PARAMS = {'gclid', 'fbclid', 'msclkid', 'dclid', 'yclid', 'mc_cid', 'mc_eid', 'ref', 'ref_src'}
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+
+def _is_tracking_param(name: str) -> bool:
+    name = name.lower()
+    return name.startswith('utm_') or name in TRACKING_PARAMS
+
+
+def _host(parts) -> str:
+    host = (parts.hostname or '').lower().rstrip('.')
+    return host[4:] if host.startswith('www.') else host
+
+
+def canonical_url(url: Optional[str]) -> str:
+    """
+    Forme canonique d'une URL citée, pour comparer les sources entre modèles.
+
+    Schéma http/https unifié, hôte en minuscules sans `www.`, port par défaut,
+    fragment et paramètres de suivi (utm_*, gclid...) supprimés, paramètres
+    restants triés et `/` final retiré. Retourne '' pour une valeur vide.
+    """
+    if not url:
+        return ''
+    url = url.strip()
+    if '://' not in url:
+        url = f"http://{url}"
+    parts = urlsplit(url)
+    host = _host(parts)
+    if not host:
+        return url.lower()
+    try:
+        port = parts.port
+    except ValueError:
+        port = None
+    if port and port != DEFAULT_PORTS.get(parts.scheme.lower()):
+        host = f"{host}:{port}"
+    query = urlencode(sorted((k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+                             if not _is_tracking_param(k)))
+    path = parts.path.rstrip('/')
+    return urlunsplit(('', host, path, query, '')).lstrip('/')
+
+
+def extract_domain(url: Optional[str]) -> str:
+    """Nom d'hôte d'une URL, en minuscules et sans `www.` ('' si absent)."""
+    if not url:
+        return ''
+    url = url.strip()
+    if '://' not in url:
+        url = f"http://{url}"
+    return _host(urlsplit(url))
+
+
+def parse_sources(sources: Union[str, Iterable, None]) -> List:
+    """Liste des sources extraites, depuis la liste décodée ou sa forme JSON ([] si invalide)."""
+    if isinstance(sources, str):
+        try:
+            sources = json.loads(sources) if sources else []
+        except json.JSONDecodeError:
+            return []
+    return list(sources) if isinstance(sources, (list, tuple)) else []
+
+
+def source_url(source) -> Optional[str]:
+    """URL d'une source: dict (clés `url` ou `link`) ou directement une URL."""
+    url = (source.get('url') or source.get('link')) if isinstance(source, dict) else source
+    return str(url) if url else None
+
+
+def source_urls(sources: Union[str, Iterable, None]) -> List[str]:
+    """URLs brutes d'une liste de sources extraites (champ `sources_extracted`)."""
+    return [url for url in map(source_url, parse_sources(sources)) if url]
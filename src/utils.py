@@ -1,4 +1,5 @@
 import asyncio
+import json
 import random
 from functools import wraps
 from typing import Callable, Any, Tuple, Type
@@ -86,6 +87,35 @@ def async_retry(
     return decorator
 
 
+class RawJSONBody:
+    """
+    Corps de réponse HTTP conservé tel que reçu, décodé en JSON à la demande.
+
+    Les octets reçus sont stockés directement (pas de re-sérialisation) et le
+    décodage n'a lieu qu'au premier accès à `data`, une seule fois.
+    """
+    __slots__ = ('body', '_data')
+
+    def __init__(self, body: bytes):
+        self.body = body
+        self._data = None
+
+    @property
+    def data(self) -> Any:
+        if self._data is None:
+            self._data = json.loads(self.body)
+        return self._data
+
+    def get(self, key: str, default: Any = None) -> Any:
+        data = self.data
+        return data.get(key, default) if isinstance(data, dict) else default
+
+
+async def read_raw_json(response) -> RawJSONBody:
+    """Lit le corps brut d'une réponse aiohttp sans le décoder."""
+    return RawJSONBody(await response.read())
+
+
 class RateLimitError(Exception):
     """Exception levée lors d'un dépassement de limite de taux."""
     pass
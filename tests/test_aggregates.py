@@ -0,0 +1,53 @@
+import uuid
+
+import pytest
+
+from src import database
+from src.aggregates import rebuild_aggregates, summarize
+from src.config import StorageProfile
+from src.database import ExperimentResult, ResponseBlob
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    database.initialize_database(f"sqlite:///{tmp_path / 'aggregates.db'}", StorageProfile())
+    yield database.SessionLocal
+    database.engine.dispose()
+
+
+def _make_result(i: int) -> ExperimentResult:
+    return ExperimentResult(
+        id=str(uuid.uuid4()),
+        experiment_id="test",
+        session_id="test",
+        query_id=f"q{i % 3}",
+        query_text="test",
+        query_category="test",
+        iteration=i,
+        model_name=f"model-{i % 2}",
+        model_type="llm",
+        response_raw="ERROR: 429 rate limit" if i % 5 == 0 else "réponse " + "é" * i,
+        sources_extracted=[{"url": f"https://example.org/{i}"}] if i % 2 else [],
+        chain_of_thought="",
+        response_time_ms=100 + i,
+        extra_metadata={},
+    )
+
+
+def test_rebuild_reads_summary_columns_without_decoding(session_factory, monkeypatch):
+    with session_factory() as session:
+        database.persist_results(session, [_make_result(i) for i in range(20)])
+        incremental = summarize(session)
+
+        def decode(blob):
+            raise AssertionError("réponse décodée pendant la reconstruction des agrégats")
+
+        monkeypatch.setattr(ResponseBlob, "decode", decode)
+        rebuild_aggregates(session)
+        rebuilt = summarize(session)
+
+    assert rebuilt == incremental
+    assert sum(row['errors'] for row in rebuilt) == 4
+    assert sum(row['response_length_mean'] * row['results'] for row in rebuilt) == sum(
+        len("réponse " + "é" * i) for i in range(20) if i % 5
+    ) + 4 * len("ERROR: 429 rate limit")
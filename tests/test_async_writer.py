@@ -0,0 +1,133 @@
+import asyncio
+import statistics
+import time
+import uuid
+
+import pytest
+
+from src import database
+from src.async_storage import AsyncResultWriter
+from src.config import StorageProfile
+from src.database import ExperimentResult
+
+TICK_SECONDS = 0.005
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    database.initialize_database(f"sqlite:///{tmp_path / 'writer.db'}", StorageProfile())
+    yield database.SessionLocal
+    database.engine.dispose()
+
+
+def _make_result(task: int, i: int, result_id: str = None) -> ExperimentResult:
+    return ExperimentResult(
+        id=result_id or str(uuid.uuid4()),
+        experiment_id="test",
+        session_id="test",
+        query_id=f"q{task}",
+        query_text="test",
+        query_category="test",
+        iteration=i,
+        model_name=f"model-{task % 4}",
+        model_type="llm",
+        response_raw=f"réponse {task}-{i} " + "é" * 2000,
+        sources_extracted=[{"url": f"https://example{task}.org/{i}"}],
+        chain_of_thought="",
+        response_time_ms=100,
+        extra_metadata={},
+    )
+
+
+def _loop_lags(session_factory, mode: str) -> list:
+    """Retards de réveil de la boucle pendant 800 écritures, dans la boucle ('sync') ou via l'écrivain."""
+    lags = []
+
+    async def ticker(stop: asyncio.Event):
+        while not stop.is_set():
+            start = time.perf_counter()
+            await asyncio.sleep(TICK_SECONDS)
+            lags.append(time.perf_counter() - start - TICK_SECONDS)
+
+    async def scenario():
+        writer = AsyncResultWriter(session_factory)
+
+        async def worker(task: int):
+            for i in range(40):
+                await asyncio.sleep(0.001)
+                result = _make_result(task, i)
+                if mode == "writer":
+                    await writer.write(result)
+                else:
+                    with session_factory() as session:
+                        database.persist_results(session, [result])
+
+        stop = asyncio.Event()
+        watcher = asyncio.create_task(ticker(stop))
+        await asyncio.gather(*(worker(task) for task in range(20)))
+        await writer.close()
+        stop.set()
+        await watcher
+
+    asyncio.run(scenario())
+    return lags
+
+
+def test_loop_stays_responsive_while_writing(session_factory):
+    baseline = _loop_lags(session_factory, "sync")
+    lags = _loop_lags(session_factory, "writer")
+
+    with session_factory() as session:
+        assert session.query(ExperimentResult).count() == 1600
+    # Comparaison relative à l'écriture dans la boucle (mesures absolues: voir benchmarks/bench_async_writer.py)
+    p90, baseline_p90 = (statistics.quantiles(values, n=10)[-1] for values in (lags, baseline))
+    assert p90 < baseline_p90 / 2, f"p90 {p90 * 1000:.1f} ms, écriture dans la boucle {baseline_p90 * 1000:.1f} ms"
+
+
+def test_batch_retry_keeps_responses(session_factory):
+    duplicate_id = str(uuid.uuid4())
+    with session_factory() as session:
+        database.persist_results(session, [_make_result(0, 0, duplicate_id)])
+
+    batch_results = [_make_result(1, 1), _make_result(2, 2, duplicate_id), _make_result(3, 3)]
+    # Même texte qu'une réponse déjà stockée: blob existant réutilisé
+    batch_results[2].response_raw = _make_result(0, 0).response_raw
+    expected = {result.id: result.response_raw for result in batch_results if result.id != duplicate_id}
+
+    async def scenario():
+        writer = AsyncResultWriter(session_factory)
+        loop = asyncio.get_running_loop()
+        batch = [(result, loop.create_future(), loop) for result in batch_results]
+        # Un seul lot: l'échec du doublon déclenche la reprise ligne par ligne
+        await asyncio.to_thread(writer._commit, batch)
+        return await asyncio.gather(*(future for _, future, _ in batch), return_exceptions=True)
+
+    outcomes = asyncio.run(scenario())
+
+    assert outcomes[0] is None and outcomes[2] is None
+    assert isinstance(outcomes[1], Exception)
+    with session_factory() as session:
+        for result_id, response in expected.items():
+            stored = session.get(ExperimentResult, result_id)
+            assert stored.response_hash is not None
+            assert stored.response_raw == response
+
+
+def test_delayed_writer_groups_sequential_results(session_factory):
+    batch_sizes = []
+
+    async def scenario():
+        writer = AsyncResultWriter(session_factory, max_delay_seconds=0.5)
+        commit = writer._commit
+        writer._commit = lambda batch: batch_sizes.append(len(batch)) or commit(batch)
+        # Résultats soumis un à un sans attendre leur commit (comme le runner)
+        futures = []
+        for i in range(10):
+            await asyncio.sleep(0.005)
+            futures.append(writer.submit(_make_result(0, i)))
+        await asyncio.gather(*futures)
+        await writer.close()
+
+    asyncio.run(scenario())
+
+    assert batch_sizes == [10]
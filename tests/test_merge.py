@@ -0,0 +1,72 @@
+import datetime
+import sqlite3
+import uuid
+
+from src import database
+from src.config import StorageProfile
+from src.database import ExperimentResult
+from src.merge import merge_databases
+from src.partitions import archive_month
+
+ARCHIVED_MONTH = "2025-01"
+
+
+def _create_database(path, results):
+    database.initialize_database(f"sqlite:///{path}", StorageProfile())
+    try:
+        with database.SessionLocal() as session:
+            database.persist_results(session, results)
+    finally:
+        database.engine.dispose()
+
+
+def _make_result(result_id: str, timestamp: datetime.datetime, text: str = "réponse") -> ExperimentResult:
+    return ExperimentResult(
+        id=result_id,
+        experiment_id="test",
+        session_id="test",
+        query_id="q1",
+        query_text="test",
+        query_category="test",
+        iteration=1,
+        model_name="model",
+        model_type="llm",
+        response_raw=f"{text} {result_id}",
+        sources_extracted=[],
+        chain_of_thought="",
+        response_time_ms=100,
+        extra_metadata={},
+        timestamp=timestamp,
+    )
+
+
+def _result_ids(path):
+    conn = sqlite3.connect(str(path))
+    try:
+        return {row[0] for row in conn.execute("SELECT id FROM results")}
+    finally:
+        conn.close()
+
+
+def test_merge_skips_results_archived_in_target(tmp_path):
+    archived_at = datetime.datetime(2025, 1, 15)
+    recent_at = datetime.datetime(2025, 3, 1)
+    archived_id, conflict_id = str(uuid.uuid4()), str(uuid.uuid4())
+    target, source = tmp_path / "target.db", tmp_path / "source.db"
+
+    _create_database(target, [_make_result(archived_id, archived_at), _make_result(conflict_id, archived_at)])
+    archive_month(target, ARCHIVED_MONTH)
+    # Plus de 999 résultats nouveaux dans un seul lot: aucun paramètre lié par id
+    new_ids = [str(uuid.uuid4()) for _ in range(1200)]
+    _create_database(source, [
+        _make_result(archived_id, archived_at),
+        _make_result(conflict_id, archived_at, text="autre réponse"),
+        *(_make_result(result_id, recent_at) for result_id in new_ids),
+    ])
+
+    [report] = merge_databases(target, [source], batch_size=2000)
+
+    assert report['inserted'] == len(new_ids)
+    assert report['duplicates'] == 1
+    assert report['conflict_ids'] == [conflict_id]
+    assert _result_ids(target) == set(new_ids)
@@ -0,0 +1,42 @@
+import pytest
+
+from src.config import ExperimentConfig, ModelConfig, QueryConfig
+from src.plan import ExperimentPlan
+
+
+def _config(sweeps) -> ExperimentConfig:
+    models = [
+        ModelConfig(name=name, type="llm", client="openai", api_key_env_var="OPENAI_API_KEY")
+        for name in ("GPT-4o", "Claude")
+    ]
+    return ExperimentConfig(
+        experiment_name="test",
+        iterations_per_query=1,
+        models=models,
+        queries=[QueryConfig(id="q1", text="test", category="test")],
+        plan={'seed': 1, 'sweeps': sweeps},
+    )
+
+
+@pytest.mark.parametrize("sweeps", [
+    [{'parameters': {'temperature': [0.2, 0.2]}}],
+    [{'parameters': {'temperature': [0.2, 0.7]}}, {'models': ["GPT-4o"], 'parameters': {'temperature': [0.7]}}],
+    [{'parameters': {'temperature': [0.2], 'max_tokens': [100]}},
+     {'parameters': {'max_tokens': [100, 200], 'temperature': [0.2]}}],
+])
+def test_duplicate_combinations_are_rejected(sweeps):
+    config = _config(sweeps)
+    with pytest.raises(ValueError):
+        ExperimentPlan(config, config.models)
+
+
+def test_disjoint_sweeps_keep_unique_labels():
+    config = _config([
+        {'models': ["GPT-4o"], 'parameters': {'temperature': [0.2, 0.7]}},
+        {'models': ["Claude"], 'parameters': {'temperature': [0.2, 0.7]}},
+        {'parameters': {'max_tokens': [100, 200]}},
+    ])
+    plan = ExperimentPlan(config, config.models)
+
+    labels = [item.label for item in plan]
+    assert len(labels) == len(set(labels)) == 8
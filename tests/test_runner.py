@@ -0,0 +1,54 @@
+import asyncio
+import importlib
+
+import pytest
+
+from src import database
+from src.config import ExperimentConfig, ModelConfig, QueryConfig, StorageProfile
+from src.database import ExperimentResult
+
+
+class FakeClient:
+    def __init__(self, config: ModelConfig):
+        self.config = config
+
+    async def query(self, text: str, session_id: str):
+        await asyncio.sleep(0.001)
+        return {"response_raw": f"réponse de {self.config.name} à {text}", "sources_extracted": []}
+
+
+@pytest.fixture
+def runner_module(tmp_path, monkeypatch):
+    # Le module journalise dans experiment.log (répertoire courant)
+    monkeypatch.chdir(tmp_path)
+    module = importlib.import_module("src.runner")
+    monkeypatch.setattr(module, "get_client", FakeClient)
+    monkeypatch.setattr(module, "WRITE_BATCH_DELAY_SECONDS", 0.2)
+    database.initialize_database(f"sqlite:///{tmp_path / 'runner.db'}", StorageProfile())
+    yield module
+    database.engine.dispose()
+
+
+def test_runner_writes_results_in_batches(runner_module):
+    config = ExperimentConfig(
+        experiment_name="test",
+        iterations_per_query=2,
+        delay_between_iterations_seconds=0,
+        models=[
+            ModelConfig(name=name, type="llm", client="fake", api_key_env_var="NONE")
+            for name in ("model-a", "model-b")
+        ],
+        queries=[QueryConfig(id=f"q{i}", text=f"question {i}", category="test") for i in range(3)],
+        plan={'seed': 1},
+    )
+    runner = runner_module.ExperimentRunner(config)
+    batch_sizes = []
+    commit = runner.writer._commit
+    runner.writer._commit = lambda batch: batch_sizes.append(len(batch)) or commit(batch)
+
+    asyncio.run(runner.run())
+
+    with database.SessionLocal() as session:
+        assert session.query(ExperimentResult).count() == 12
+    # Un lot par itération: le runner n'attend pas chaque commit
+    assert batch_sizes == [6, 6]
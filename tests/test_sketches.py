@@ -0,0 +1,82 @@
+import random
+import uuid
+
+import pytest
+
+from src import database
+from src.config import StorageProfile
+from src.database import ExperimentResult, ResultSketch
+from src.sketches import GROUP_COLUMNS, SKETCH_COLUMNS, SketchSet, rebuild_sketches
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    database.initialize_database(f"sqlite:///{tmp_path / 'sketches.db'}", StorageProfile())
+    yield database.SessionLocal
+    database.engine.dispose()
+
+
+def _make_result(rng: random.Random, sources: bool = True) -> ExperimentResult:
+    return ExperimentResult(
+        id=str(uuid.uuid4()),
+        experiment_id="test",
+        session_id="test",
+        query_id=f"q{rng.randrange(3)}",
+        query_text="test",
+        query_category="test",
+        iteration=1,
+        model_name=f"model-{rng.randrange(2)}",
+        model_type="llm",
+        response_raw="réponse",
+        sources_extracted=[
+            {"url": f"https://site{rng.randrange(20)}.org/page{rng.randrange(100)}"} for _ in range(rng.randrange(4))
+        ] if sources else [],
+        chain_of_thought="",
+        response_time_ms=rng.randrange(100, 5000),
+        extra_metadata={},
+    )
+
+
+def _summaries(session):
+    return {
+        tuple(getattr(row, column) for column in GROUP_COLUMNS):
+            SketchSet.from_columns({column: getattr(row, column) for column in SKETCH_COLUMNS})
+        for row in session.query(ResultSketch)
+    }
+
+
+def test_batched_updates_match_rebuild(session_factory):
+    rng = random.Random(0)
+    with session_factory() as session:
+        for size in (1, 7, 1, 30, 2, 50):
+            database.persist_results(session, [_make_result(rng) for _ in range(size)])
+        incremental = _summaries(session)
+        rebuild_sketches(session)
+        rebuilt = _summaries(session)
+
+    assert incremental.keys() == rebuilt.keys()
+    for key, sketch in rebuilt.items():
+        other = incremental[key]
+        assert other.results == sketch.results
+        assert (other.urls.registers == sketch.urls.registers).all()
+        assert (other.domains.registers == sketch.domains.registers).all()
+        assert other.latency.bins == sketch.latency.bins
+        assert (other.citations.table == sketch.citations.table).all()
+        assert other.citations.top(10) == sketch.citations.top(10)
+
+
+def test_batch_without_sources_keeps_citation_sketch(session_factory):
+    rng = random.Random(1)
+    with session_factory() as session:
+        first = _make_result(rng)
+        database.persist_results(session, [first])
+        row = session.get(ResultSketch, (first.experiment_id, first.model_name, first.query_id))
+        citations = row.domains_cms
+
+        later = _make_result(rng, sources=False)
+        later.model_name, later.query_id = first.model_name, first.query_id
+        database.persist_results(session, [later])
+        session.refresh(row)
+
+    assert row.results == 2
+    assert row.domains_cms == citations
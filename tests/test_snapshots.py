@@ -0,0 +1,73 @@
+import sqlite3
+import uuid
+
+import pytest
+
+from src import database
+from src.config import StorageProfile
+from src.database import ExperimentResult
+from src.snapshots import refresh_snapshot
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = tmp_path / "live.db"
+    database.initialize_database(f"sqlite:///{path}", StorageProfile())
+    yield path
+    database.engine.dispose()
+
+
+def _add_results(count: int):
+    with database.SessionLocal() as session:
+        database.persist_results(session, [
+            ExperimentResult(
+                id=str(uuid.uuid4()),
+                experiment_id="test",
+                session_id="test",
+                query_id=f"q{i}",
+                query_text="test",
+                query_category="test",
+                iteration=1,
+                model_name="model",
+                model_type="llm",
+                response_raw=f"réponse numéro {i} avec quelques mots de plus pour les signatures",
+                sources_extracted=[{"url": f"https://example.org/{i}"}],
+                chain_of_thought="",
+                response_time_ms=100,
+                extra_metadata={},
+            )
+            for i in range(count)
+        ])
+
+
+def _buckets(path):
+    conn = sqlite3.connect(str(path))
+    try:
+        return conn.execute("SELECT band, bucket, result_id FROM minhash_buckets ORDER BY 1, 2, 3").fetchall()
+    finally:
+        conn.close()
+
+
+def test_new_results_are_added_incrementally(db_path):
+    _add_results(5)
+    refresh_snapshot(db_path)
+    _add_results(3)
+
+    report = refresh_snapshot(db_path)
+
+    assert report['mode'] == 'incremental'
+    assert report['rows']['results'] == 3
+    assert _buckets(report['path']) == _buckets(db_path)
+
+
+def test_rewritten_minhash_index_forces_full_copy(db_path):
+    _add_results(5)
+    refresh_snapshot(db_path)
+    # Réécriture de l'index (rebuild-minhash avec d'autres paramètres): mêmes résultats, autres seaux
+    with database.engine.begin() as connection:
+        connection.exec_driver_sql("UPDATE minhash_buckets SET bucket = bucket + 1")
+
+    report = refresh_snapshot(db_path)
+
+    assert report['mode'] == 'full'
+    assert _buckets(report['path']) == _buckets(db_path)
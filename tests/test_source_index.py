@@ -0,0 +1,47 @@
+import uuid
+
+import pytest
+
+from src import database
+from src.config import StorageProfile
+from src.database import ExperimentResult
+from src.source_index import lookup
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    database.initialize_database(f"sqlite:///{tmp_path / 'sources.db'}", StorageProfile())
+    yield database.SessionLocal
+    database.engine.dispose()
+
+
+def _make_result(url: str) -> ExperimentResult:
+    return ExperimentResult(
+        id=str(uuid.uuid4()),
+        experiment_id="test",
+        session_id="test",
+        query_id="q1",
+        query_text="test",
+        query_category="test",
+        iteration=1,
+        model_name="model",
+        model_type="llm",
+        response_raw="réponse",
+        sources_extracted=[{"url": url}],
+        chain_of_thought="",
+        response_time_ms=100,
+        extra_metadata={},
+    )
+
+
+def test_subdomain_lookup_escapes_like_wildcards(session_factory):
+    with session_factory() as session:
+        database.persist_results(session, [
+            _make_result("https://a_b.org/page"),
+            _make_result("https://news.a_b.org/page"),
+            _make_result("https://news.axb.org/page"),
+            _make_result("https://news.a%b.org/page"),
+        ])
+        occurrences = lookup(session, "a_b.org", kind='domain', include_subdomains=True)
+
+    assert sorted(row['term'] for row in occurrences) == ["a_b.org", "news.a_b.org"]